@@ -0,0 +1,33 @@
+import secrets
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
+
+from app.core.config import settings
+from app.core.database import db_metrics, engine, replicas
+from app.services.access_control import membership_cache
+from app.services.user_cache import user_cache
+
+
+# Function to let only operators holding METRICS_TOKEN read the pool and cache internals
+async def verify_metrics_token(authorization: Optional[str] = Header(None)):
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if authorization is None or not secrets.compare_digest(authorization, f"Bearer {settings.METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token.", headers={"WWW-Authenticate": "Bearer"})
+
+
+router = APIRouter(prefix="/metrics", tags=["Metrics routes"], dependencies=[Depends(verify_metrics_token)])
+
+
+@router.get("/")
+async def get_metrics():
+    """ Returns live database pool and statement cache counters together with the in-process cache statistics. """
+    return {
+        "database": db_metrics.stats(engine.pool),
+        "replicas": replicas.stats(),
+        "caches": {
+            "users": user_cache.stats(),
+            "room_members": membership_cache.stats(),
+        },
+    }
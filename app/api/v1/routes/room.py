@@ -1,14 +1,17 @@
-from typing import List
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.database import get_db
-from app.core.dependencies import get_current_user
+from app.core.dependencies import get_current_user, get_read_db
 from app.models.models import User
-from app.repositories.room import create_room, get_user_rooms, update_room, join_room, leave_room
-from app.schemas.room import RoomResponse, RoomCreate, RoomUpdate
-from app.services.room_service import get_room_members, add_user_to_room, remove_user_from_room
+from app.repositories import room as room_repository
+from app.repositories.room import create_room, get_user_rooms, join_room, leave_room
+from app.schemas.room import RoomResponse, RoomCreate, RoomUpdate, RoomListResponse, RoomSnapshot
+from app.services.room_service import get_room_members, get_room_snapshot, add_user_to_room, remove_user_from_room
+from app.services.versioning import etag_matches, room_versions, user_rooms_key
 
 router = APIRouter(prefix="/rooms", tags=["Room routes"])
 
@@ -19,24 +22,30 @@ async def create_new_room(room_data: RoomCreate, db: AsyncSession = Depends(get_
     return await create_room(db, name=room_data.name, owner_id=current_user.id)
 
 
-@router.get("/", response_model=List[RoomResponse])
-async def get_my_rooms(db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
-    rooms = await get_user_rooms(db, user_id=current_user.id)
-    return rooms
+@router.get("/", response_model=RoomListResponse)
+async def get_my_rooms(response: Response, limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+                       cursor: Optional[str] = None, if_none_match: Optional[str] = Header(None),
+                       db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    etag = await room_versions.etag(user_rooms_key(current_user.id), limit, cursor)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
+    return await get_user_rooms(db, user_id=current_user.id, limit=limit, cursor=cursor)
 
 
 @router.put("/{room_id}", response_model=RoomResponse)
 async def update_room(room_id: int, room_data: RoomUpdate, db: AsyncSession = Depends(get_db),
                       current_user: User = Depends(get_current_user)):
-    room = await update_room(db, room_id=room_id, new_name=room_data.name, user_id=current_user.id)
+    room = await room_repository.update_room(db, room_id=room_id, new_name=room_data.name, user_id=current_user.id)
     if not room:
         raise HTTPException(status_code=403, detail="You are not authorized to update this room")
     return room
 
 
-@router.delete("/{room_id}", response_model=RoomResponse)
+@router.delete("/{room_id}")
 async def delete_room(room_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
-    result = await delete_room(db, room_id=room_id, user_id=current_user.id)
+    result = await room_repository.delete_room(db, room_id=room_id, user_id=current_user.id)
     if isinstance(result, dict) and "error" in result:
         raise HTTPException(status_code=403, detail=result["error"])
     return result
@@ -54,12 +63,24 @@ async def join_room_endpoint(invite_code: str, db: AsyncSession = Depends(get_db
 
 # Get all members of a room
 @router.get("/{room_id}/members")
-async def list_room_members(room_id: int, db: AsyncSession = Depends(get_db),
+async def list_room_members(room_id: int, db: AsyncSession = Depends(get_read_db),
                             current_user: User = Depends(get_current_user)):
-    members = await get_room_members(db, room_id)
+    members = await get_room_members(db, room_id, current_user.id)
+    if isinstance(members, dict) and "error" in members:
+        raise HTTPException(status_code=403, detail=members["error"])
     return members
 
 
+# Get the room, its members and the first page of items in one response
+@router.get("/{room_id}/snapshot", response_model=RoomSnapshot)
+async def get_snapshot(room_id: int, limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+                       db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    snapshot = await get_room_snapshot(db, room_id, current_user.id, limit)
+    if "error" in snapshot:
+        raise HTTPException(status_code=403, detail=snapshot["error"])
+    return snapshot
+
+
 # Add a user to a room
 @router.post("/{room_id}/add_user")
 async def add_user(room_id: int, user_id: int, db: AsyncSession = Depends(get_db),
@@ -1,13 +1,21 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Header, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.dependencies import get_current_user
+from app.core.dependencies import get_current_user, get_read_db
+from app.core.config import settings
 from app.core.database import get_db
 from app.models.models import User
-from app.repositories.shopping import add_item, get_items, update_item, delete_item
-from app.schemas.shopping import ShoppingItemCreate, ShoppingItemUpdate, ShoppingItemResponse
+from app.repositories.shopping import (
+    add_item, get_items, update_item, delete_item, add_items, update_items, delete_items, get_changes,
+)
+from app.services.access_control import has_access_to_room
+from app.services.versioning import etag_matches, room_key, room_versions
+from app.schemas.shopping import (
+    ShoppingItemCreate, ShoppingItemUpdate, ShoppingItemResponse, ShoppingItemPage, ShoppingItemChanges,
+    ShoppingItemBulkCreateRequest, ShoppingItemBulkUpdateRequest, ShoppingItemBulkDeleteRequest,
+)
 
 router = APIRouter(prefix="/shopping", tags=["Shopping routes"])
 
@@ -20,14 +28,60 @@ async def create_item(item_data: ShoppingItemCreate, db: AsyncSession = Depends(
     return result
 
 
-@router.get("/{room_id}", response_model=List[ShoppingItemResponse])
-async def read_items(room_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
-    result = await get_items(db, room_id, current_user.id)
+# Bulk routes are registered before the /{item_id} routes so "bulk" is not parsed as an id
+@router.post("/bulk", response_model=List[ShoppingItemResponse])
+async def create_items(request: ShoppingItemBulkCreateRequest, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    result = await add_items(db, request.items, current_user.id)
     if isinstance(result, dict) and "error" in result:
         raise HTTPException(status_code=403, detail=result["error"])
     return result
 
 
+@router.put("/bulk", response_model=List[ShoppingItemResponse])
+async def modify_items(request: ShoppingItemBulkUpdateRequest, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    result = await update_items(db, request.items, current_user.id)
+    if isinstance(result, dict) and "error" in result:
+        raise HTTPException(status_code=403, detail=result["error"])
+    return result
+
+
+@router.post("/bulk/delete")
+async def remove_items(request: ShoppingItemBulkDeleteRequest, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    result = await delete_items(db, request.ids, current_user.id)
+    if isinstance(result, dict) and "error" in result:
+        raise HTTPException(status_code=403, detail=result["error"])
+    return result
+
+
+@router.get("/{room_id}", response_model=ShoppingItemPage)
+async def read_items(room_id: int, response: Response,
+                     limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+                     cursor: Optional[str] = None, if_none_match: Optional[str] = Header(None),
+                     db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    etag = await room_versions.etag(room_key(room_id), limit, cursor)
+    # Only members may learn that the list is unchanged; the check is normally answered from cache
+    if etag_matches(if_none_match, etag) and await has_access_to_room(db, current_user.id, room_id):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    result = await get_items(db, room_id, current_user.id, limit, cursor)
+    if isinstance(result, dict) and "error" in result:
+        raise HTTPException(status_code=403, detail=result["error"])
+    response.headers["ETag"] = etag
+    return result
+
+
+@router.get("/{room_id}/changes", response_model=ShoppingItemChanges)
+async def read_changes(room_id: int, since: int = Query(0, ge=0), after_id: Optional[int] = Query(None, ge=0),
+                       limit: int = Query(settings.PAGE_SIZE, ge=1, le=settings.MAX_PAGE_SIZE),
+                       db: AsyncSession = Depends(get_read_db), current_user: User = Depends(get_current_user)):
+    result = await get_changes(db, room_id, current_user.id, since, after_id, limit)
+    if isinstance(result, dict) and "error" in result:
+        raise HTTPException(status_code=403, detail=result["error"])
+    if isinstance(result, dict) and "resync" in result:
+        raise HTTPException(status_code=410, detail="Resync required.")
+    return result
+
+
 @router.put("/{item_id}", response_model=ShoppingItemResponse)
 async def modify_item(item_id: int, item_data: ShoppingItemUpdate, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     result = await update_item(db, item_id, item_data, current_user.id)
@@ -1,17 +1,37 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from typing import Optional
 
+from fastapi import APIRouter, Header, Query, WebSocket, WebSocketDisconnect, status
+
+from app.core.database import async_session
+from app.core.dependencies import find_user
+from app.services.access_control import has_access_to_room
 from app.websockets.manager import websocket_manager
 
 router = APIRouter()
 
 
+# Function to check that the caller is a member of the room, in a short session rather than one held by the socket
+async def is_room_member(telegram_id: Optional[int], room_id: int) -> bool:
+    if telegram_id is None:
+        return False
+    async with async_session() as db:
+        user = await find_user(db, telegram_id)
+        return user is not None and await has_access_to_room(db, user.id, room_id)
+
+
 @router.websocket("/ws/{room_id}")
-async def websocket_endpoint(websocket: WebSocket, room_id: int):
-    """Handles WebSocket connections for real-time updates in a room."""
-    await websocket_manager.connect(websocket, room_id)
+async def websocket_endpoint(websocket: WebSocket, room_id: int, since: Optional[int] = Query(None, ge=0),
+                             telegram_id: Optional[int] = Header(None)):
+    """Handles WebSocket connections for real-time updates in a room, resuming after `since` if given."""
+    # Only members may receive the room's events, including the replayed ones
+    if not await is_room_member(telegram_id, room_id):
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket_manager.connect(room_id, websocket, since=since)
 
     try:
         while True:
             await websocket.receive_text()  # Keep connection open
     except WebSocketDisconnect:
-        await websocket_manager.disconnect(websocket, room_id)
+        await websocket_manager.disconnect(room_id, websocket)
@@ -0,0 +1,187 @@
+import asyncio
+import logging
+from typing import Optional
+
+import httpx
+from fastapi import HTTPException
+
+from app.core.cache import invalidation_bus
+from app.core.config import settings
+from app.core.database import async_session, engine
+from app.core.dependencies import find_user
+from app.models.models import User
+from app.repositories import room as room_repository
+from app.repositories import shopping as shopping_repository
+from app.schemas.room import RoomListResponse, RoomResponse
+from app.schemas.shopping import ShoppingItemPage
+from app.services.outbox import outbox_dispatcher
+
+logger = logging.getLogger(__name__)
+
+# Methods that can be safely repeated after a failure. DELETE is left out: when a delete succeeded but its
+# response was lost, the retry fails with 404 (e.g. leaving a room twice) and the user would see an error
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "OPTIONS"}
+RETRY_STATUS_CODES = {502, 503, 504}
+
+
+class ApiError(Exception):
+    """ Error response of the shopping list API. """
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+class HttpApi:
+    """ Shopping list API client sharing one pooled keep-alive connection set across all handlers. """
+
+    def __init__(self, base_url: str, max_connections: int = 100, max_keepalive: int = 20,
+                 timeout: float = 10.0, retries: int = 2, backoff: float = 0.2):
+        self.retries = retries
+        self.backoff = backoff
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive),
+            timeout=httpx.Timeout(timeout),
+        )
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def _request(self, method: str, path: str, telegram_id: int, **kwargs):
+        """ Sends a request as the given user, retrying idempotent ones with exponential backoff. """
+        attempts = self.retries + 1 if method in IDEMPOTENT_METHODS else 1
+        for attempt in range(attempts):
+            try:
+                response = await self.client.request(
+                    method, path, headers={"telegram-id": str(telegram_id)}, **kwargs
+                )
+                if response.status_code not in RETRY_STATUS_CODES or attempt == attempts - 1:
+                    break
+            except httpx.TransportError as e:
+                if attempt == attempts - 1:
+                    raise
+                logger.warning(f"{method} {path} failed ({e!r}), retrying")
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            raise ApiError(response.status_code, str(detail))
+        return response.json()
+
+    async def list_rooms(self, telegram_id: int, limit: Optional[int] = None, cursor: Optional[str] = None):
+        params = {key: value for key, value in (("limit", limit), ("cursor", cursor)) if value is not None}
+        return await self._request("GET", "/rooms/", telegram_id, params=params)
+
+    async def create_room(self, telegram_id: int, name: str):
+        return await self._request("POST", "/rooms/", telegram_id, json={"name": name})
+
+    async def join_room(self, telegram_id: int, invite_code: str):
+        return await self._request("POST", f"/rooms/join/{invite_code}", telegram_id)
+
+    async def leave_room(self, telegram_id: int, room_id: int):
+        return await self._request("DELETE", f"/rooms/{room_id}/leave", telegram_id)
+
+    async def list_items(self, telegram_id: int, room_id: int, limit: Optional[int] = None,
+                         cursor: Optional[str] = None):
+        params = {key: value for key, value in (("limit", limit), ("cursor", cursor)) if value is not None}
+        return await self._request("GET", f"/shopping/{room_id}", telegram_id, params=params)
+
+
+class EmbeddedApi:
+    """
+    Same interface as HttpApi, but calls the repositories in-process over the shared session pool.
+    Used when the bot runs on the same host as the database, saving the HTTP hop and the re-authentication.
+    """
+
+    async def start(self):
+        # Keep the user and membership caches of this process coherent with the API workers
+        await invalidation_bus.start()
+        # Broadcast the events of changes made here without waiting for an API worker to poll the outbox.
+        # Only over Redis: an in-memory backend would deliver them to this process instead of the API's clients
+        if settings.STATE_BACKEND == "redis":
+            await outbox_dispatcher.start()
+
+    async def close(self):
+        await outbox_dispatcher.stop()
+        await invalidation_bus.stop()
+        await engine.dispose()
+
+    @staticmethod
+    async def _user(db, telegram_id: int) -> User:
+        """ Resolves the acting user the same way get_current_user does. """
+        user = await find_user(db, telegram_id)
+        if user is None:
+            raise ApiError(404, "User not found.")
+        return user
+
+    @staticmethod
+    async def _call(call, error_status: int = 403):
+        """ Runs a repository call, turning its HTTP errors and error dicts into ApiError. """
+        try:
+            result = await call
+        except HTTPException as e:
+            raise ApiError(e.status_code, str(e.detail))
+        if isinstance(result, dict) and "error" in result:
+            raise ApiError(error_status, result["error"])
+        return result
+
+    async def list_rooms(self, telegram_id: int, limit: Optional[int] = None, cursor: Optional[str] = None):
+        async with async_session() as db:
+            user = await self._user(db, telegram_id)
+            page = await self._call(room_repository.get_user_rooms(
+                db, user_id=user.id, limit=limit or settings.PAGE_SIZE, cursor=cursor
+            ))
+        return RoomListResponse.model_validate(page).model_dump(mode="json")
+
+    async def create_room(self, telegram_id: int, name: str):
+        async with async_session() as db:
+            user = await self._user(db, telegram_id)
+            room = await self._call(room_repository.create_room(db, name=name, owner_id=user.id))
+        return RoomResponse.model_validate(room).model_dump(mode="json")
+
+    async def join_room(self, telegram_id: int, invite_code: str):
+        async with async_session() as db:
+            user = await self._user(db, telegram_id)
+            return await self._call(room_repository.join_room(db, invite_code, user.id))
+
+    async def leave_room(self, telegram_id: int, room_id: int):
+        async with async_session() as db:
+            user = await self._user(db, telegram_id)
+            return await self._call(room_repository.leave_room(db, room_id, user.id), error_status=400)
+
+    async def list_items(self, telegram_id: int, room_id: int, limit: Optional[int] = None,
+                         cursor: Optional[str] = None):
+        async with async_session() as db:
+            user = await self._user(db, telegram_id)
+            page = await self._call(shopping_repository.get_items(
+                db, room_id, user.id, limit=limit or settings.PAGE_SIZE, cursor=cursor
+            ))
+        return ShoppingItemPage.model_validate(page, from_attributes=True).model_dump(mode="json")
+
+
+# Create the API client used by the handlers of one bot application
+def create_api():
+    if settings.BOT_TRANSPORT == "embedded":
+        # Room versions and cache invalidations of the bot's changes reach the API processes only through Redis;
+        # in memory the API would keep answering 304 and granting access from its stale copies
+        if settings.STATE_BACKEND != "redis":
+            raise ValueError("BOT_TRANSPORT=embedded needs STATE_BACKEND=redis to keep the API processes coherent")
+        return EmbeddedApi()
+    if settings.BOT_TRANSPORT != "http":
+        raise ValueError(f"Unknown bot transport: {settings.BOT_TRANSPORT}")
+    return HttpApi(
+        settings.API_BASE_URL,
+        max_connections=settings.BOT_HTTP_MAX_CONNECTIONS,
+        max_keepalive=settings.BOT_HTTP_MAX_KEEPALIVE,
+        timeout=settings.BOT_HTTP_TIMEOUT,
+        retries=settings.BOT_HTTP_RETRIES,
+        backoff=settings.BOT_HTTP_BACKOFF,
+    )
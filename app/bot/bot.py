@@ -1,10 +1,10 @@
 import logging
-import httpx
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.future import select
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.constants import ParseMode
 from telegram.ext import (
+    Application,
     ApplicationBuilder,
     CommandHandler,
     CallbackQueryHandler,
@@ -13,29 +13,45 @@ from telegram.ext import (
     ContextTypes,
 )
 
+from app.bot.api import ApiError, create_api
+from app.bot.live_list import LiveLists
+from app.bot.room_pages import RoomPages
+from app.bot.sender import create_rate_limiter
+from app.bot.state import create_conversation_state
+from app.bot.updates import PerChatUpdateProcessor
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.redis import close_redis
 from app.models.models import User
+from app.services.user_cache import user_cache
+from app.websockets.manager import websocket_manager
 
 # Logging configuration
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-API_BASE_URL = settings.API_BASE_URL
-
 # -------------------- User Authentication --------------------
 
 async def get_or_create_user(db: AsyncSession, telegram_id: int, username: str):
     """
-    Check if a user exists in the database; if not, create a new one.
+    Register the user or refresh their username with a single upsert.
+    Repeat calls with an unchanged username are answered from the user cache without touching the database.
     """
-    result = await db.execute(select(User).where(User.telegram_id == telegram_id))
-    user = result.scalar_one_or_none()
-    if user is None:
-        user = User(telegram_id=telegram_id, username=username)
-        db.add(user)
-        await db.commit()
-        await db.refresh(user)
+    user = await user_cache.get(telegram_id)
+    if user is not None and user.username == username:
+        return user
+
+    result = await db.execute(
+        insert(User)
+        .values(telegram_id=telegram_id, username=username)
+        .on_conflict_do_update(index_elements=[User.telegram_id], set_={"username": username})
+        .returning(User)
+        .execution_options(populate_existing=True)
+    )
+    user = result.scalar_one()
+    await db.commit()
+    await user_cache.invalidate(telegram_id)  # Other workers may still cache the old username
+    await user_cache.set(user)
     return user
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -80,47 +96,85 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.answer()
         await query.message.reply_text("🛒 Функція створення списку покупок незабаром буде доступна!")
     elif data == "view_shopping_list":
-        # Placeholder for viewing a shopping list
-        await query.answer()
-        await query.message.reply_text("📜 Функція перегляду списку покупок незабаром буде доступна!")
+        await view_shopping_list(update, context)
+    elif data.startswith("rooms_page_"):
+        await view_rooms(update, context, page_index=int(data.removeprefix("rooms_page_")))
+    elif data.startswith("room_"):
+        await select_room(update, context, room_id=int(data.removeprefix("room_")))
     else:
         await query.answer("Невідома дія.")
 
 # -------------------- View Rooms --------------------
 
-async def view_rooms(update: Update, context: ContextTypes.DEFAULT_TYPE):
+async def view_rooms(update: Update, context: ContextTypes.DEFAULT_TYPE, page_index: int = 0):
     """
-    Fetch and display the list of user's rooms.
+    Display one page of the user's rooms; the first page is sent as a new message, other pages replace it.
     """
     query = update.callback_query
     await query.answer()
     user_id = query.from_user.id
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{API_BASE_URL}/rooms/",
-                headers={"telegram-id": str(user_id)},
-            )
-        rooms = response.json()
+        page = await context.bot_data["room_pages"].get(user_id, page_index)
+        if page is None:
+            # The browsed pages expired, start again from the first one
+            page_index = 0
+            page = await context.bot_data["room_pages"].get(user_id, page_index)
     except Exception as e:
         logger.error(f"Error fetching rooms: {e}")
         await query.message.reply_text("❌ Помилка при отриманні кімнат.")
         return
 
-    if isinstance(rooms, dict) and "error" in rooms:
-        await query.message.reply_text("❌ У Вас ще немає створених кімнат.")
-        return
-    if not rooms:
+    rooms = page["rooms"]
+    if not rooms and page_index == 0:
         await query.message.reply_text("⚠️ Кімнати відсутні.")
         return
 
-    message = "🏠 *Ваші кімнати:*\n\n"
+    message = f"🏠 *Ваші кімнати* (сторінка {page_index + 1}):\n\n"
     keyboard = []
     for room in rooms:
         message += f"🔹 *{room['name']}* (Код запрошення: {room['invite_code']})\n"
         keyboard.append([InlineKeyboardButton(f"🔑 {room['name']}", callback_data=f"room_{room['id']}")])
+    navigation = []
+    if page_index > 0:
+        navigation.append(InlineKeyboardButton("⬅️ Назад", callback_data=f"rooms_page_{page_index - 1}"))
+    if page["next_cursor"] is not None:
+        navigation.append(InlineKeyboardButton("Далі ➡️", callback_data=f"rooms_page_{page_index + 1}"))
+    if navigation:
+        keyboard.append(navigation)
     reply_markup = InlineKeyboardMarkup(keyboard)
-    await query.message.reply_text(message, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+    if page_index == 0 and query.data == "view_rooms":
+        await query.message.reply_text(message, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+    else:
+        await query.edit_message_text(message, reply_markup=reply_markup, parse_mode=ParseMode.MARKDOWN)
+
+# -------------------- Select Room --------------------
+
+def room_menu() -> InlineKeyboardMarkup:
+    """
+    Build the menu of actions available inside a room.
+    """
+    keyboard = [
+        [InlineKeyboardButton("🛒 Створити список покупок", callback_data="create_shopping_list")],
+        [InlineKeyboardButton("📜 Переглянути список покупок", callback_data="view_shopping_list")],
+        [InlineKeyboardButton("🚪 Вийти з кімнати", callback_data="leave_room")],
+    ]
+    return InlineKeyboardMarkup(keyboard)
+
+async def select_room(update: Update, context: ContextTypes.DEFAULT_TYPE, room_id: int):
+    """
+    Make the chosen room the current one and display its menu.
+    """
+    query = update.callback_query
+    await query.answer()
+    context.user_data["current_room"] = room_id
+    room = context.bot_data["room_pages"].find_room(query.from_user.id, room_id)
+    room_name = room["name"] if room else "Невідома"
+    await query.message.reply_text(
+        f"🏠 *Кімната:* *{room_name}*\n\n"
+        "Тут ви можете створювати або переглядати свій список покупок.",
+        reply_markup=room_menu(),
+        parse_mode=ParseMode.MARKDOWN,
+    )
 
 # -------------------- Create Room --------------------
 
@@ -143,22 +197,14 @@ async def create_room(update: Update, context: ContextTypes.DEFAULT_TYPE):
     room_name = update.message.text.strip()
     logger.info(f"Creating room: {room_name} for user {user_id}")
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{API_BASE_URL}/rooms/",
-                json={"name": room_name},
-                headers={"telegram-id": str(user_id)},
-            )
-        result = response.json()
+        result = await context.bot_data["api"].create_room(user_id, room_name)
+    except ApiError as e:
+        await update.message.reply_text(f"❌ Помилка: {e.detail}")
     except Exception as e:
         logger.error(f"Error creating room: {e}")
         await update.message.reply_text("❌ Помилка при створенні кімнати.")
-        context.user_data.pop("awaiting_room_name", None)
-        return
-
-    if "error" in result:
-        await update.message.reply_text(f"❌ Помилка: {result['error']}")
     else:
+        context.bot_data["room_pages"].invalidate(user_id)
         await update.message.reply_text(
             f"✅ *Кімната створена!*\n"
             f"🏠 Назва: *{result.get('name', 'Невідома')}*\n"
@@ -189,51 +235,60 @@ async def join_room(update: Update, context: ContextTypes.DEFAULT_TYPE):
     invite_code = update.message.text.strip()
     logger.info(f"User {user_id} attempting to join room with code {invite_code}")
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                f"{API_BASE_URL}/rooms/join/{invite_code}",
-                headers={"telegram-id": str(user_id)},
-            )
-        if response.status_code == 200:
-            result = response.json()
-            room_name = result.get("name", "Невідома")
-            # Assuming the API returns a room id; if not, use invite_code as an identifier.
-            room_id = result.get("id", invite_code)
-            # Save the current room info in user_data
-            context.user_data["current_room"] = room_id
-
-            # Build a dynamic menu for room actions
-            keyboard = [
-                [InlineKeyboardButton("🛒 Створити список покупок", callback_data="create_shopping_list")],
-                [InlineKeyboardButton("📜 Переглянути список покупок", callback_data="view_shopping_list")],
-                [InlineKeyboardButton("🚪 Вийти з кімнати", callback_data="leave_room")],
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await update.message.reply_text(
-                f"🎉 *Ви приєдналися до кімнати!*\n🏠 Назва: *{room_name}*\n\n"
-                "Тут ви можете створювати або переглядати свій список покупок.",
-                reply_markup=reply_markup,
-                parse_mode=ParseMode.MARKDOWN,
-            )
-        elif response.status_code == 409:
+        result = await context.bot_data["api"].join_room(user_id, invite_code)
+    except ApiError as e:
+        if e.status_code == 409:
             await update.message.reply_text(
                 "❗ *Ви вже є учасником цієї кімнати!*",
                 parse_mode=ParseMode.MARKDOWN,
             )
-        elif response.status_code == 404:
+        elif e.status_code == 404:
             await update.message.reply_text(
                 "❌ *Кімната не знайдена!*",
                 parse_mode=ParseMode.MARKDOWN,
             )
         else:
-            result = response.json()
-            detail = result.get("detail", "Щось пішло не так.")
-            await update.message.reply_text(f"❌ Помилка: {detail}", parse_mode=ParseMode.MARKDOWN)
+            await update.message.reply_text(f"❌ Помилка: {e.detail}", parse_mode=ParseMode.MARKDOWN)
     except Exception as e:
         logger.error(f"Error joining room: {e}")
         await update.message.reply_text("❌ Помилка при приєднанні до кімнати.")
+    else:
+        room_name = result.get("name", "Невідома")
+        # Assuming the API returns a room id; if not, use invite_code as an identifier.
+        room_id = result.get("id", invite_code)
+        # Save the current room info in user_data
+        context.user_data["current_room"] = room_id
+        context.bot_data["room_pages"].invalidate(user_id)
+
+        await update.message.reply_text(
+            f"🎉 *Ви приєдналися до кімнати!*\n🏠 Назва: *{room_name}*\n\n"
+            "Тут ви можете створювати або переглядати свій список покупок.",
+            reply_markup=room_menu(),
+            parse_mode=ParseMode.MARKDOWN,
+        )
     context.user_data.pop("awaiting_invite_code", None)
 
+# -------------------- View Shopping List --------------------
+
+async def view_shopping_list(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Show the shopping list of the current room as a message that is kept up to date.
+    """
+    query = update.callback_query
+    await query.answer()
+    current_room = context.user_data.get("current_room")
+    if not current_room:
+        await query.message.reply_text("Ви не знаходитеся в кімнаті.")
+        return
+
+    try:
+        await context.bot_data["live_lists"].show(query.message.chat.id, query.from_user.id, current_room)
+    except ApiError as e:
+        await query.message.reply_text(f"❌ Помилка: {e.detail}")
+    except Exception as e:
+        logger.error(f"Error fetching shopping list: {e}")
+        await query.message.reply_text("❌ Помилка при отриманні списку покупок.")
+
 # -------------------- Leave Room Handler --------------------
 
 async def leave_room_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -246,32 +301,31 @@ async def leave_room_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     user_id = query.from_user.id
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.delete(
-                f"{API_BASE_URL}/rooms/{current_room}/leave",
-                headers={"telegram-id": str(user_id)},
-            )
-        if response.status_code == 200:
-            await query.edit_message_text("🚪 Ви успішно покинули кімнату.")
-
-            context.user_data.pop("current_room", None)
-
-            keyboard = [
-                [InlineKeyboardButton("📋 Переглянути кімнати", callback_data="view_rooms")],
-                [InlineKeyboardButton("➕ Створити кімнату", callback_data="create_room")],
-                [InlineKeyboardButton("🔑 Приєднатися до кімнати", callback_data="join_room")],
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            await context.bot.send_message(
-                chat_id=query.message.chat.id,
-                text="Виберіть одну з кнопок для подальших дій:",
-                reply_markup=reply_markup
-            )
-        else:
-            await query.edit_message_text("❌ Помилка при виході з кімнати.")
+        await context.bot_data["api"].leave_room(user_id, current_room)
+    except ApiError:
+        await query.edit_message_text("❌ Помилка при виході з кімнати.")
+        return
     except Exception as e:
         logger.error(f"Error leaving room: {e}")
         await query.edit_message_text("❌ Помилка з'єднання з сервером.")
+        return
+
+    await query.edit_message_text("🚪 Ви успішно покинули кімнату.")
+
+    context.user_data.pop("current_room", None)
+    context.bot_data["room_pages"].invalidate(user_id)
+
+    keyboard = [
+        [InlineKeyboardButton("📋 Переглянути кімнати", callback_data="view_rooms")],
+        [InlineKeyboardButton("➕ Створити кімнату", callback_data="create_room")],
+        [InlineKeyboardButton("🔑 Приєднатися до кімнати", callback_data="join_room")],
+    ]
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    await context.bot.send_message(
+        chat_id=query.message.chat.id,
+        text="Виберіть одну з кнопок для подальших дій:",
+        reply_markup=reply_markup
+    )
 
 # -------------------- Unified Text Handler --------------------
 
@@ -288,16 +342,76 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 # -------------------- Run Bot --------------------
 
+# -------------------- Application Lifecycle --------------------
+async def on_startup(application: Application):
+    """
+    Open the API client shared by all handlers and start following room events for live lists.
+    """
+    api = create_api()
+    await api.start()
+    application.bot_data["api"] = api
+    application.bot_data["room_pages"] = RoomPages(
+        api, page_size=settings.BOT_ROOMS_PAGE_SIZE, ttl=settings.BOT_ROOMS_CACHE_TTL
+    )
+
+    # Room events are published by the API process, they only reach the bot through Redis
+    live = settings.STATE_BACKEND == "redis"
+    live_lists = LiveLists(application.bot, api, debounce=settings.BOT_LIVE_LIST_DEBOUNCE, live=live)
+    if live:
+        await websocket_manager.add_listener(live_lists.on_event)
+    else:
+        logger.warning("STATE_BACKEND is not redis: shopping lists are sent as snapshots and not kept up to date")
+    application.bot_data["live_lists"] = live_lists
+
+async def on_shutdown(application: Application):
+    """
+    Stop live lists, close the shared API client, the conversation state store and Redis.
+    """
+    live_lists = application.bot_data.pop("live_lists", None)
+    if live_lists is not None:
+        if live_lists.live:
+            websocket_manager.remove_listener(live_lists.on_event)
+        await live_lists.stop()
+    api = application.bot_data.pop("api", None)
+    if api is not None:
+        await api.close()
+    await application.bot_data["state"].backend.close()
+    await websocket_manager.shutdown()
+    await close_redis()
+
 def run_bot():
     """
     Start the Telegram bot.
     """
     logger.info("Запуск бота...")
-    app = ApplicationBuilder().token(settings.TELEGRAM_BOT_TOKEN).build()
+    app = (
+        ApplicationBuilder()
+        .token(settings.TELEGRAM_BOT_TOKEN)
+        .concurrent_updates(PerChatUpdateProcessor(settings.BOT_CONCURRENT_UPDATES))
+        .rate_limiter(create_rate_limiter())
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+        .build()
+    )
+    # Conversation flags live outside the process so any bot replica can continue a conversation
+    conversation_state = create_conversation_state()
+    conversation_state.register(app)
+    app.bot_data["state"] = conversation_state
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CallbackQueryHandler(button_handler))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
-    app.run_polling()
+    if settings.BOT_MODE == "webhook":
+        app.run_webhook(
+            listen=settings.BOT_WEBHOOK_LISTEN,
+            port=settings.BOT_WEBHOOK_PORT,
+            url_path=settings.BOT_WEBHOOK_PATH,
+            webhook_url=f"{settings.BOT_WEBHOOK_URL.rstrip('/')}/{settings.BOT_WEBHOOK_PATH}",
+            secret_token=settings.BOT_WEBHOOK_SECRET or None,
+        )
+    elif settings.BOT_MODE == "polling":
+        app.run_polling()
+    else:
+        raise ValueError(f"Unknown bot mode: {settings.BOT_MODE}")
 
 if __name__ == "__main__":
     run_bot()
\ No newline at end of file
@@ -0,0 +1,168 @@
+import asyncio
+import hashlib
+import json
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from telegram import Bot
+from telegram.error import BadRequest
+
+from app.bot.api import ApiError
+from app.bot.sender import NOTIFICATION, OutboundQueueFull
+from app.schemas.events import EventType
+
+logger = logging.getLogger(__name__)
+
+# Events after which a room's list has to be rendered again
+REFRESH_EVENTS = {
+    EventType.ITEM_ADDED, EventType.ITEM_UPDATED, EventType.ITEM_DELETED,
+    EventType.ITEMS_ADDED, EventType.ITEMS_UPDATED, EventType.ITEMS_DELETED,
+    EventType.ROOM_UPDATED,
+}
+
+# Telegram rejects longer messages
+MAX_MESSAGE_LENGTH = 4096
+
+
+def render_items(items: List[dict]) -> str:
+    """ Renders a room's items as plain text grouped by category. """
+    if not items:
+        return "🛒 Список покупок порожній."
+    by_category: Dict[str, List[str]] = {}
+    for item in items:
+        by_category.setdefault(item.get("category") or "Без категорії", []).append(item["name"])
+    lines = ["🛒 Список покупок:"]
+    for category, names in by_category.items():
+        lines.append(f"\n{category}:")
+        lines.extend(f"• {name}" for name in names)
+    text = "\n".join(lines)
+    if len(text) > MAX_MESSAGE_LENGTH:
+        text = text[:MAX_MESSAGE_LENGTH - 1] + "…"
+    return text
+
+
+def digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+@dataclass
+class LiveMessage:
+    """ A message showing a room's list, and the hash of what it currently shows. """
+
+    message_id: int
+    telegram_id: int  # Member whose access is used to read the list
+    digest: Optional[str] = None
+
+
+class LiveLists:
+    """
+    Keeps one list message per chat and room up to date by editing it in place.
+    Room events only mark a room as changed; all changes within the debounce window
+    are rendered once, and messages whose rendered content did not change are not edited.
+    Without `live` the lists are sent once and never followed, for setups where no room events reach the bot.
+    """
+
+    def __init__(self, bot: Bot, api, debounce: float = 2.0, max_items: int = 500, page_size: int = 200,
+                 live: bool = True):
+        self.bot = bot
+        self.api = api
+        self.live = live
+        self.debounce = debounce
+        self.max_items = max_items
+        self.page_size = page_size
+        self.lists: Dict[int, Dict[int, LiveMessage]] = {}  # room_id -> chat_id -> live message
+        self._pending: Dict[int, asyncio.Task] = {}  # room_id -> scheduled refresh
+
+    async def show(self, chat_id: int, telegram_id: int, room_id: int):
+        """ Sends a new list message to the chat; it replaces the chat's previous live message of the room. """
+        text = render_items(await self._load_items(telegram_id, room_id))
+        message = await self.bot.send_message(chat_id=chat_id, text=text)
+        if not self.live:
+            return
+        self.lists.setdefault(room_id, {})[chat_id] = LiveMessage(message.message_id, telegram_id, digest(text))
+
+    async def on_event(self, room_id: int, seq: int, event: str):
+        """ Manager listener: schedules a refresh of rooms that have live messages. """
+        if room_id not in self.lists:
+            return
+        event_type = json.loads(event).get("type")
+        if event_type == EventType.ROOM_DELETED:
+            self.forget_room(room_id)
+        elif event_type in REFRESH_EVENTS and room_id not in self._pending:
+            self._pending[room_id] = asyncio.create_task(self._refresh_later(room_id))
+
+    def forget_room(self, room_id: int):
+        self.lists.pop(room_id, None)
+        task = self._pending.pop(room_id, None)
+        if task is not None:
+            task.cancel()
+
+    async def stop(self):
+        for task in self._pending.values():
+            task.cancel()
+        self._pending.clear()
+        self.lists.clear()
+
+    async def _refresh_later(self, room_id: int):
+        await asyncio.sleep(self.debounce)
+        # Events arriving from now on schedule the next refresh
+        self._pending.pop(room_id, None)
+        try:
+            await self.refresh(room_id)
+        except Exception:
+            logger.exception(f"Failed to refresh the live list of room {room_id}")
+
+    async def refresh(self, room_id: int):
+        """ Renders the room's list once and edits every live message that shows something else. """
+        items = None
+        while items is None and self.lists.get(room_id):
+            chat_id, live = next(iter(self.lists[room_id].items()))
+            try:
+                items = await self._load_items(live.telegram_id, room_id)
+            except ApiError as e:
+                if e.status_code not in (403, 404):
+                    raise
+                self._forget(room_id, chat_id)  # That member left the room
+        if items is None:
+            return
+
+        text = render_items(items)
+        text_digest = digest(text)
+        # Chats are rate limited independently, so the edits are sent side by side
+        await asyncio.gather(*(
+            self._edit(room_id, chat_id, live, text, text_digest)
+            for chat_id, live in list(self.lists.get(room_id, {}).items())
+            if live.digest != text_digest
+        ))
+
+    async def _edit(self, room_id: int, chat_id: int, live: LiveMessage, text: str, text_digest: str):
+        try:
+            await self.bot.edit_message_text(
+                text=text, chat_id=chat_id, message_id=live.message_id,
+                rate_limit_args={"priority": NOTIFICATION},
+            )
+            live.digest = text_digest
+        except OutboundQueueFull:
+            logger.warning(f"Skipped a live list edit in chat {chat_id}, the send queue is full")
+        except BadRequest as e:
+            if "not modified" in str(e).lower():
+                live.digest = text_digest
+            else:
+                self._forget(room_id, chat_id)  # The message was deleted or is too old to edit
+
+    async def _load_items(self, telegram_id: int, room_id: int) -> List[dict]:
+        items, cursor = [], None
+        while len(items) < self.max_items:
+            page = await self.api.list_items(telegram_id, room_id, limit=self.page_size, cursor=cursor)
+            items.extend(page["items"])
+            cursor = page.get("next_cursor")
+            if cursor is None:
+                break
+        return items[:self.max_items]
+
+    def _forget(self, room_id: int, chat_id: int):
+        chats = self.lists.get(room_id, {})
+        chats.pop(chat_id, None)
+        if not chats:
+            self.forget_room(room_id)
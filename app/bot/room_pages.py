@@ -0,0 +1,53 @@
+from typing import List, Optional
+
+from app.core.cache import TTLCache
+
+
+class RoomPages:
+    """
+    Short-lived per-user cache of the room pages a user has browsed.
+    Keyset cursors only lead forward, so the cursor of every visited page is kept to be able to go back.
+    """
+
+    def __init__(self, api, page_size: int, ttl: float, maxsize: int = 10_000):
+        self.api = api
+        self.page_size = page_size
+        self.cache = TTLCache(maxsize, ttl)  # telegram_id -> {"cursors": [...], "pages": {index: page}}
+
+    async def get(self, telegram_id: int, index: int) -> Optional[dict]:
+        """
+        Returns page `index` of the user's rooms, fetching only that page on a miss.
+        None means the page cannot be reached any more, e.g. the cache expired; start again from page 0.
+        """
+        entry = self.cache.get(telegram_id)
+        if entry is None:
+            if index != 0:
+                return None
+            entry = {"cursors": [None], "pages": {}}
+            self.cache.set(telegram_id, entry)
+
+        page = entry["pages"].get(index)
+        if page is not None:
+            return page
+        cursors: List[Optional[str]] = entry["cursors"]
+        if index >= len(cursors):
+            return None
+
+        page = await self.api.list_rooms(telegram_id, limit=self.page_size, cursor=cursors[index])
+        entry["pages"][index] = page
+        if page["next_cursor"] is not None and len(cursors) == index + 1:
+            cursors.append(page["next_cursor"])
+        return page
+
+    def find_room(self, telegram_id: int, room_id: int) -> Optional[dict]:
+        """ Looks a room up in the pages the user has already seen. """
+        entry = self.cache.get(telegram_id)
+        for page in (entry or {}).get("pages", {}).values():
+            for room in page["rooms"]:
+                if room["id"] == room_id:
+                    return room
+        return None
+
+    def invalidate(self, telegram_id: int):
+        """ Forgets the user's pages; call it whenever the user's set of rooms changes. """
+        self.cache.invalidate(telegram_id)
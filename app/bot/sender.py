@@ -0,0 +1,289 @@
+import asyncio
+import heapq
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Coroutine, Deque, Dict, List, Optional, Tuple, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Send priorities, lower goes first; pass them as rate_limit_args={"priority": ...} to any Bot method
+INTERACTIVE = 0
+NOTIFICATION = 1
+PRIORITY_NAMES = ("interactive", "notification")
+
+
+class OutboundQueueFull(Exception):
+    """ Raised for a notification that was dropped because too many are already waiting. """
+
+
+class TokenBucket:
+    """ Allows `rate` sends per second with bursts of up to `capacity` sends. """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """ Returns how long to wait for the next token, 0 if one is available. """
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, now: float, seconds: float):
+        """ Makes the next token available only after `seconds`, as Telegram asked with retry_after. """
+        self._refill(now)
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+@dataclass
+class OutboundRequest:
+    priority: int
+    callback: Callable[..., Coroutine[Any, Any, Any]]
+    args: Any
+    kwargs: Dict[str, Any]
+    future: asyncio.Future
+    attempts: int = 0
+
+
+@dataclass
+class ChatQueue:
+    """ Pending requests of one chat, one FIFO per priority, and the chat's own rate limit. """
+
+    bucket: TokenBucket
+    pending: List[Deque[OutboundRequest]] = field(default_factory=lambda: [deque() for _ in PRIORITY_NAMES])
+    entry: Optional[int] = None  # Sequence of the chat's live entry in the scheduler heaps
+    entry_priority: Optional[int] = None
+    in_flight: int = 0
+
+    def head_priority(self) -> Optional[int]:
+        return next((priority for priority, queue in enumerate(self.pending) if queue), None)
+
+    def pop(self) -> OutboundRequest:
+        return self.pending[self.head_priority()].popleft()
+
+
+class OutboundRateLimiter(BaseRateLimiter[Dict[str, Any]]):
+    """
+    Schedules every Bot API request addressed to a chat under a global and a per-chat token bucket.
+    Interactive replies overtake queued notifications, chats are served independently so one busy chat
+    never delays the others, and requests rejected with RetryAfter are paused and sent again.
+    The counters from `stats()` are logged every `stats_interval` seconds.
+    """
+
+    def __init__(self, global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3,
+                 group_rate: float = 20 / 60, max_notifications: int = 1000, max_retries: int = 3,
+                 stats_interval: float = 0):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_notifications = max_notifications
+        self.max_retries = max_retries
+        self.stats_interval = stats_interval
+        self._chats: Dict[Union[int, str], ChatQueue] = {}
+        self._ready: List[Tuple[int, int, Union[int, str]]] = []  # (priority, seq, chat_id)
+        self._delayed: List[Tuple[float, int, int, Union[int, str]]] = []  # (not_before, priority, seq, chat_id)
+        self._depth = [0 for _ in PRIORITY_NAMES]
+        self._seq = 0
+        self._wakeup = asyncio.Event()
+        self._scheduler: Optional[asyncio.Task] = None
+        self._reporter: Optional[asyncio.Task] = None
+        self._sending: set = set()
+        self.sent = 0
+        self.retried = 0
+        self.dropped = 0
+        self.failed = 0
+
+    async def initialize(self) -> None:
+        self._scheduler = asyncio.create_task(self._run())
+        if self.stats_interval > 0:
+            self._reporter = asyncio.create_task(self._report())
+
+    async def shutdown(self) -> None:
+        for task in (self._scheduler, self._reporter):
+            if task is not None:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._scheduler = self._reporter = None
+        for chat in self._chats.values():
+            for queue in chat.pending:
+                for request in queue:
+                    request.future.cancel()
+        self._chats.clear()
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get("chat_id")
+        if chat_id is None or self._scheduler is None:
+            # Not addressed to a chat (getMe, answerCallbackQuery, ...), Telegram does not throttle these
+            return await callback(*args, **kwargs)
+        try:
+            chat_id = int(chat_id)  # The same chat may be given as an integer or a numeric string
+        except (TypeError, ValueError):
+            pass
+
+        priority = (rate_limit_args or {}).get("priority", INTERACTIVE)
+        if priority == NOTIFICATION and self._depth[NOTIFICATION] >= self.max_notifications:
+            self.dropped += 1
+            raise OutboundQueueFull(f"Dropped a notification to chat {chat_id}, the send queue is full.")
+
+        request = OutboundRequest(priority, callback, args, kwargs, asyncio.get_running_loop().create_future())
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            chat = self._chats[chat_id] = ChatQueue(self._chat_bucket(chat_id))
+        chat.pending[priority].append(request)
+        self._depth[priority] += 1
+        if chat.entry is None or priority < chat.entry_priority:
+            self._schedule(chat_id, chat, time.monotonic())
+        return await request.future
+
+    def _chat_bucket(self, chat_id: Union[int, str]) -> TokenBucket:
+        # Groups and channels (negative ids or @usernames) get a much lower limit than private chats
+        if isinstance(chat_id, str) or chat_id < 0:
+            return TokenBucket(self.group_rate, 1)
+        return TokenBucket(self.chat_rate, self.chat_burst)
+
+    def _schedule(self, chat_id: Union[int, str], chat: ChatQueue, now: float):
+        """ Puts the chat in line for its next send; any older entry of the chat becomes stale. """
+        priority = chat.head_priority()
+        if priority is None:
+            chat.entry = chat.entry_priority = None
+            return
+        self._seq += 1
+        chat.entry, chat.entry_priority = self._seq, priority
+        wait = chat.bucket.delay(now)
+        if wait > 0:
+            heapq.heappush(self._delayed, (now + wait, priority, self._seq, chat_id))
+        else:
+            heapq.heappush(self._ready, (priority, self._seq, chat_id))
+        self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, priority, seq, chat_id = heapq.heappop(self._delayed)
+                heapq.heappush(self._ready, (priority, seq, chat_id))
+
+            if not self._ready:
+                self._prune(now)
+                self._wakeup.clear()
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            wait = self.global_bucket.delay(now)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            _, seq, chat_id = heapq.heappop(self._ready)
+            chat = self._chats.get(chat_id)
+            if chat is None or chat.entry != seq:
+                continue  # Stale entry, the chat was rescheduled since
+            if chat.bucket.delay(now) > 0:
+                self._schedule(chat_id, chat, now)  # Paused by a RetryAfter after it was scheduled
+                continue
+
+            request = chat.pop()
+            self._depth[request.priority] -= 1
+            if request.future.done():
+                self._schedule(chat_id, chat, now)
+                continue  # The caller gave up waiting
+
+            self.global_bucket.take(now)
+            chat.bucket.take(now)
+            self._schedule(chat_id, chat, now)
+            chat.in_flight += 1
+            task = asyncio.create_task(self._send(chat_id, chat, request))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send(self, chat_id: Union[int, str], chat: ChatQueue, request: OutboundRequest):
+        try:
+            result = await request.callback(*request.args, **request.kwargs)
+        except RetryAfter as e:
+            self.retried += 1
+            if request.attempts >= self.max_retries:
+                self.failed += 1
+                if not request.future.done():
+                    request.future.set_exception(e)
+                return
+            logger.warning(f"Telegram asked to retry chat {chat_id} after {e.retry_after}s")
+            request.attempts += 1
+            now = time.monotonic()
+            chat.bucket.pause(now, float(e.retry_after))
+            chat.pending[request.priority].appendleft(request)
+            self._depth[request.priority] += 1
+            self._schedule(chat_id, chat, now)
+        except Exception as e:
+            self.failed += 1
+            if not request.future.done():
+                request.future.set_exception(e)
+        else:
+            self.sent += 1
+            if not request.future.done():
+                request.future.set_result(result)
+        finally:
+            chat.in_flight -= 1
+
+    def _prune(self, now: float):
+        """ Forgets idle chats whose bucket has refilled, they would start from a full bucket anyway. """
+        for chat_id in [chat_id for chat_id, chat in self._chats.items()
+                        if chat.entry is None and not chat.in_flight and chat.bucket.is_full(now)]:
+            del self._chats[chat_id]
+
+    async def _report(self):
+        # The bot runs apart from the API, so its send queue is reported in the bot's log
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            logger.info(f"Outbound requests: {self.stats()}")
+
+    def stats(self) -> dict:
+        return {
+            "queued": dict(zip(PRIORITY_NAMES, self._depth)),
+            "chats": len(self._chats),
+            "in_flight": len(self._sending),
+            "sent": self.sent,
+            "retried": self.retried,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+# Create the outbound rate limiter configured by settings
+def create_rate_limiter() -> OutboundRateLimiter:
+    return OutboundRateLimiter(
+        global_rate=settings.BOT_SEND_GLOBAL_RATE,
+        chat_rate=settings.BOT_SEND_CHAT_RATE,
+        chat_burst=settings.BOT_SEND_CHAT_BURST,
+        group_rate=settings.BOT_SEND_GROUP_RATE,
+        max_notifications=settings.BOT_SEND_MAX_NOTIFICATIONS,
+        max_retries=settings.BOT_SEND_MAX_RETRIES,
+        stats_interval=settings.BOT_SEND_STATS_INTERVAL,
+    )
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import sqlite3
+import time
+from typing import Optional
+
+from redis.asyncio import Redis
+from telegram import Update
+from telegram.ext import Application, ContextTypes, TypeHandler
+
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.redis import get_redis
+
+# Handler groups around the regular handlers (group 0): load state before them, save it after them
+LOAD_GROUP = -1
+SAVE_GROUP = 1
+
+
+class StateBackend:
+    """ Storage of conversation state as JSON objects under keys like "user:<id>", expiring after a TTL. """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+
+    async def load(self, key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def save(self, key: str, data: dict):
+        """ Stores the state and restarts its TTL; an empty state is deleted. """
+        raise NotImplementedError
+
+    async def close(self):
+        """ Releases any resources held by the backend. """
+
+
+class MemoryStateBackend(StateBackend):
+    """ Keeps state in this process only; enough for a single bot replica. """
+
+    def __init__(self, ttl: int, maxsize: int = 100_000):
+        super().__init__(ttl)
+        self.cache = TTLCache(maxsize, ttl)
+
+    async def load(self, key: str) -> Optional[dict]:
+        return self.cache.get(key)
+
+    async def save(self, key: str, data: dict):
+        if data:
+            self.cache.set(key, data)
+        else:
+            self.cache.invalidate(key)
+
+
+class RedisStateBackend(StateBackend):
+    """ Shares state between bot replicas; every update reads the latest state from Redis. """
+
+    def __init__(self, redis: Redis, ttl: int, prefix: str = "bot:state:"):
+        super().__init__(ttl)
+        self.redis = redis
+        self.prefix = prefix
+
+    async def load(self, key: str) -> Optional[dict]:
+        raw = await self.redis.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def save(self, key: str, data: dict):
+        if data:
+            await self.redis.set(self.prefix + key, json.dumps(data), ex=self.ttl)
+        else:
+            await self.redis.delete(self.prefix + key)
+
+
+class SqliteStateBackend(StateBackend):
+    """
+    Persists state in an on-disk SQLite database for single-node deployments that must survive restarts.
+    Reads are served by a write-through in-process cache; the blocking SQLite calls run in a worker thread.
+    """
+
+    # Expired rows are purged once every this many saves
+    PURGE_EVERY = 1000
+
+    def __init__(self, path: str, ttl: int, cache_size: int = 10_000):
+        super().__init__(ttl)
+        self.cache = TTLCache(cache_size, ttl)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS bot_state (key TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._lock = asyncio.Lock()  # One sqlite3 connection must not be used by two threads at once
+        self._saves = 0
+
+    async def _run(self, sql: str, *params):
+        async with self._lock:
+            return await asyncio.to_thread(lambda: self.connection.execute(sql, params).fetchone())
+
+    async def load(self, key: str) -> Optional[dict]:
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+        row = await self._run("SELECT data FROM bot_state WHERE key = ? AND expires_at > ?", key, time.time())
+        if row is None:
+            return None
+        data = json.loads(row[0])
+        self.cache.set(key, data)
+        return data
+
+    async def save(self, key: str, data: dict):
+        if data:
+            self.cache.set(key, data)
+            await self._run(
+                "INSERT INTO bot_state (key, data, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (key) DO UPDATE SET data = excluded.data, expires_at = excluded.expires_at",
+                key, json.dumps(data), time.time() + self.ttl,
+            )
+        else:
+            self.cache.invalidate(key)
+            await self._run("DELETE FROM bot_state WHERE key = ?", key)
+
+        self._saves += 1
+        if self._saves % self.PURGE_EVERY == 0:
+            await self._run("DELETE FROM bot_state WHERE expires_at <= ?", time.time())
+
+    async def close(self):
+        async with self._lock:
+            self.connection.close()
+
+
+class ConversationState:
+    """
+    Loads context.user_data and context.chat_data from a StateBackend before the handlers run
+    and writes them back after the handlers when they changed, so any bot replica can continue a conversation.
+    """
+
+    def __init__(self, backend: StateBackend):
+        self.backend = backend
+
+    @staticmethod
+    def _keys(update: Update):
+        if update.effective_user is not None:
+            yield "user_data", f"user:{update.effective_user.id}"
+        if update.effective_chat is not None:
+            yield "chat_data", f"chat:{update.effective_chat.id}"
+
+    async def load(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        snapshot = {}
+        for attribute, key in self._keys(update):
+            data = await self.backend.load(key) or {}
+            current = getattr(context, attribute)
+            current.clear()
+            current.update(data)
+            snapshot[key] = json.dumps(data, sort_keys=True)
+        context.state_snapshot = snapshot
+
+    async def save(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        snapshot = getattr(context, "state_snapshot", {})
+        for attribute, key in self._keys(update):
+            data = getattr(context, attribute)
+            if json.dumps(data, sort_keys=True) != snapshot.get(key):
+                await self.backend.save(key, dict(data))
+
+    def register(self, application: Application):
+        """ Adds the load and save handlers around the regular handlers of the application. """
+        application.add_handler(TypeHandler(Update, self.load), group=LOAD_GROUP)
+        application.add_handler(TypeHandler(Update, self.save), group=SAVE_GROUP)
+
+
+# Create the conversation state store selected by settings.BOT_STATE_BACKEND
+def create_conversation_state() -> ConversationState:
+    name, ttl = settings.BOT_STATE_BACKEND, settings.BOT_STATE_TTL
+    if name == "redis":
+        backend = RedisStateBackend(get_redis(), ttl)
+    elif name == "sqlite":
+        backend = SqliteStateBackend(settings.BOT_STATE_SQLITE_PATH, ttl)
+    elif name == "memory":
+        backend = MemoryStateBackend(ttl)
+    else:
+        raise ValueError(f"Unknown bot state backend: {name}")
+    return ConversationState(backend)
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+
+class TTLCache:
+    """ Bounded in-process LRU cache whose entries expire after a fixed time-to-live. """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0  # Bumped on every invalidation so loaders can detect races
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()  # key -> (expires_at, value)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)  # Evict the least recently used entry
+
+    def invalidate(self, key: Hashable):
+        self.generation += 1
+        self._data.pop(key, None)
+
+    def clear(self):
+        self.generation += 1
+        self._data.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+class InvalidationBus:
+    """ Invalidates named caches locally and, with the Redis state backend, on every other worker. """
+
+    CHANNEL = "cache:invalidate"
+
+    def __init__(self, redis: Optional[Redis] = None):
+        self.redis = redis
+        self.caches: Dict[str, TTLCache] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    def register(self, name: str, cache: TTLCache):
+        self.caches[name] = cache
+
+    async def invalidate(self, name: str, key: Any):
+        """ Drops a key from the named cache here and broadcasts the invalidation. """
+        self._invalidate_local(name, str(key))
+        if self.redis is not None:
+            await self.redis.publish(self.CHANNEL, f"{name}:{key}")
+
+    async def start(self):
+        """ Starts listening for invalidations published by other workers. """
+        if self.redis is not None and self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+    def _invalidate_local(self, name: str, key: str):
+        cache = self.caches.get(name)
+        if cache is not None:
+            # Keys travel as strings, so integer keys are matched both ways
+            cache.invalidate(key)
+            if key.lstrip("-").isdigit():
+                cache.invalidate(int(key))
+
+    async def _listen(self):
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(self.CHANNEL)
+        try:
+            while True:
+                try:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    logger.exception("Cache invalidation read failed, retrying")
+                    await asyncio.sleep(1.0)
+                    continue
+                if message is not None and message["type"] == "message":
+                    name, _, key = message["data"].partition(":")
+                    self._invalidate_local(name, key)
+        finally:
+            await pubsub.aclose()
+
+
+# Global invalidation bus shared by all caches of this process
+invalidation_bus = InvalidationBus(get_redis() if settings.STATE_BACKEND == "redis" else None)
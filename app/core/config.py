@@ -3,6 +3,25 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Database engine profiles; the DB_* settings below override single values of the selected profile
+DB_PROFILES = {
+    # Logs every statement, small pool for a single developer
+    "dev": {"echo": True, "pool_size": 5, "max_overflow": 5, "pool_timeout": 30, "pool_recycle": 1800,
+            "pool_pre_ping": True, "statement_cache_size": 100},
+    "prod": {"echo": False, "pool_size": 20, "max_overflow": 10, "pool_timeout": 10, "pool_recycle": 1800,
+             "pool_pre_ping": True, "statement_cache_size": 500},
+    # Fixed-size pool without per-checkout pings, so measurements are not skewed by connection churn
+    "bench": {"echo": False, "pool_size": 50, "max_overflow": 0, "pool_timeout": 5, "pool_recycle": -1,
+              "pool_pre_ping": False, "statement_cache_size": 1000},
+}
+
+
+# Function to get the engine profile named by DB_PROFILE, failing early on a name that is not defined
+def select_db_profile(name: str) -> dict:
+    if name not in DB_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE {name!r}, expected one of: {', '.join(DB_PROFILES)}")
+    return DB_PROFILES[name]
+
 
 class Settings:
     POSTGRES_USER: str = os.getenv("POSTGRES_USER")
@@ -20,8 +39,108 @@ class Settings:
     DATABASE_URL: str = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
     REDIS_URL: str = f"redis://{REDIS_HOST}:{REDIS_PORT}"
 
+    # Engine profile: "dev", "prod" or "bench"
+    DB_PROFILE: str = os.getenv("DB_PROFILE", "dev").strip()
+    _db_profile = select_db_profile(DB_PROFILE)
+    DB_ECHO: bool = os.getenv("DB_ECHO", str(_db_profile["echo"])).lower() == "true"
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", _db_profile["pool_size"]))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", _db_profile["max_overflow"]))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", _db_profile["pool_timeout"]))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", _db_profile["pool_recycle"]))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", str(_db_profile["pool_pre_ping"])).lower() == "true"
+    # Prepared statements asyncpg keeps per connection, 0 disables them (needed behind PgBouncer in transaction mode)
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", _db_profile["statement_cache_size"]))
+
+    # Read replicas used by GET routes, comma-separated like DATABASE_URL; reads use the primary when none is usable
+    DATABASE_REPLICA_URLS: list = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+    DB_REPLICA_CHECK_INTERVAL: float = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", 5))
+    DB_REPLICA_MAX_LAG: float = float(os.getenv("DB_REPLICA_MAX_LAG", 5))  # Replicas further behind, in seconds, are not read
+    # Seconds after a change during which the changed room and room lists are read from the primary;
+    # keep it above DB_REPLICA_MAX_LAG so no replica can still serve the old data
+    READ_YOUR_WRITES_WINDOW: float = float(os.getenv("READ_YOUR_WRITES_WINDOW", 10))
+
+    # Bearer token required by GET /metrics/; the endpoint is disabled while it is empty
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+
+    # "memory" keeps shared state in-process (single worker), "redis" shares it across workers
+    STATE_BACKEND: str = os.getenv("STATE_BACKEND", "memory")
+
+    # Outbound WebSocket queue per client; "drop_oldest" or "disconnect" when it overflows
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", 100))
+    WS_OVERFLOW_POLICY: str = os.getenv("WS_OVERFLOW_POLICY", "disconnect")
+    WS_CLOSE_TIMEOUT: float = float(os.getenv("WS_CLOSE_TIMEOUT", 5))
+    # Number of recent events kept per room for clients resuming with ?since=<seq>
+    WS_REPLAY_BUFFER_SIZE: int = int(os.getenv("WS_REPLAY_BUFFER_SIZE", 200))
+    # Seconds a room's sequence and replay buffer are kept after its last event while nobody is connected to it
+    WS_REPLAY_RETENTION: int = int(os.getenv("WS_REPLAY_RETENTION", 86400))
+
+    # Cache of telegram_id -> user used by get_current_user
+    USER_CACHE_ENABLED: bool = os.getenv("USER_CACHE_ENABLED", "true").lower() == "true"
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", 10000))
+    USER_CACHE_TTL: int = int(os.getenv("USER_CACHE_TTL", 300))
+
+    # Cache of room_id -> member ids used by access checks
+    ACL_CACHE_SIZE: int = int(os.getenv("ACL_CACHE_SIZE", 10000))
+    ACL_CACHE_TTL: int = int(os.getenv("ACL_CACHE_TTL", 300))
+
+    # Page sizes for keyset-paginated listings
+    PAGE_SIZE: int = int(os.getenv("PAGE_SIZE", 50))
+    MAX_PAGE_SIZE: int = int(os.getenv("MAX_PAGE_SIZE", 200))
+
+    # Deleted items are kept as tombstones for delta sync this long, compacted every interval
+    TOMBSTONE_RETENTION: int = int(os.getenv("TOMBSTONE_RETENTION", 7 * 24 * 3600))
+    TOMBSTONE_COMPACTION_INTERVAL: int = int(os.getenv("TOMBSTONE_COMPACTION_INTERVAL", 3600))
+
+    # Room events are broadcast from the outbox in batches; delivered events are kept for a day
+    OUTBOX_BATCH_SIZE: int = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+    OUTBOX_POLL_INTERVAL: float = float(os.getenv("OUTBOX_POLL_INTERVAL", 1))
+    OUTBOX_RETENTION: int = int(os.getenv("OUTBOX_RETENTION", 86400))
+
     TELEGRAM_BOT_TOKEN: str = os.getenv("TELEGRAM_BOT_TOKEN")
 
     API_BASE_URL: str = os.getenv("API_BASE_URL", "http://api:8000")
 
+    # How the bot reaches the application: "http" through the API, "embedded" in-process (needs STATE_BACKEND=redis)
+    BOT_TRANSPORT: str = os.getenv("BOT_TRANSPORT", "http")
+
+    # How the bot receives updates: "polling" or "webhook"
+    BOT_MODE: str = os.getenv("BOT_MODE", "polling")
+    BOT_WEBHOOK_URL: str = os.getenv("BOT_WEBHOOK_URL", "")  # Public base URL Telegram posts updates to
+    BOT_WEBHOOK_PATH: str = os.getenv("BOT_WEBHOOK_PATH", "telegram")
+    BOT_WEBHOOK_SECRET: str = os.getenv("BOT_WEBHOOK_SECRET", "")
+    BOT_WEBHOOK_LISTEN: str = os.getenv("BOT_WEBHOOK_LISTEN", "0.0.0.0")
+    BOT_WEBHOOK_PORT: int = int(os.getenv("BOT_WEBHOOK_PORT", 8443))
+    # Updates processed at once; updates of the same chat always run one after another
+    BOT_CONCURRENT_UPDATES: int = int(os.getenv("BOT_CONCURRENT_UPDATES", 64))
+
+    # Where the bot keeps conversation state: "memory", "redis" (multiple replicas) or "sqlite" (single node)
+    BOT_STATE_BACKEND: str = os.getenv("BOT_STATE_BACKEND", STATE_BACKEND)
+    BOT_STATE_SQLITE_PATH: str = os.getenv("BOT_STATE_SQLITE_PATH", "bot_state.sqlite3")
+    BOT_STATE_TTL: int = int(os.getenv("BOT_STATE_TTL", 86400))  # Stale conversations are forgotten after a day
+
+    # Outbound Telegram rate limits, in messages per second
+    BOT_SEND_GLOBAL_RATE: float = float(os.getenv("BOT_SEND_GLOBAL_RATE", 30))
+    BOT_SEND_CHAT_RATE: float = float(os.getenv("BOT_SEND_CHAT_RATE", 1))
+    BOT_SEND_CHAT_BURST: float = float(os.getenv("BOT_SEND_CHAT_BURST", 3))
+    BOT_SEND_GROUP_RATE: float = float(os.getenv("BOT_SEND_GROUP_RATE", 20 / 60))
+    BOT_SEND_MAX_NOTIFICATIONS: int = int(os.getenv("BOT_SEND_MAX_NOTIFICATIONS", 1000))
+    BOT_SEND_MAX_RETRIES: int = int(os.getenv("BOT_SEND_MAX_RETRIES", 3))
+    # Seconds between log lines with the send queue counters, 0 turns them off
+    BOT_SEND_STATS_INTERVAL: float = float(os.getenv("BOT_SEND_STATS_INTERVAL", 60))
+
+    # Seconds of room changes coalesced into one edit of a live shopping list message; lists are only kept
+    # live with STATE_BACKEND=redis, which carries room events from the API to the bot
+    BOT_LIVE_LIST_DEBOUNCE: float = float(os.getenv("BOT_LIVE_LIST_DEBOUNCE", 2))
+
+    # Rooms per page of the bot's room browser and how long browsed pages are cached, in seconds
+    BOT_ROOMS_PAGE_SIZE: int = int(os.getenv("BOT_ROOMS_PAGE_SIZE", 8))
+    BOT_ROOMS_CACHE_TTL: int = int(os.getenv("BOT_ROOMS_CACHE_TTL", 60))
+
+    # Pooled HTTP client used by the bot to call the API
+    BOT_HTTP_MAX_CONNECTIONS: int = int(os.getenv("BOT_HTTP_MAX_CONNECTIONS", 100))
+    BOT_HTTP_MAX_KEEPALIVE: int = int(os.getenv("BOT_HTTP_MAX_KEEPALIVE", 20))
+    BOT_HTTP_TIMEOUT: float = float(os.getenv("BOT_HTTP_TIMEOUT", 10))
+    BOT_HTTP_RETRIES: int = int(os.getenv("BOT_HTTP_RETRIES", 2))
+    BOT_HTTP_BACKOFF: float = float(os.getenv("BOT_HTTP_BACKOFF", 0.2))
+
 settings = Settings()
@@ -1,19 +1,229 @@
-from typing import AsyncGenerator
+import asyncio
+import itertools
+import logging
+import time
+from typing import AsyncGenerator, List, Optional
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
+from sqlalchemy import event, text
+from sqlalchemy.engine.default import DefaultDialect
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from app.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 DATABASE_URL = settings.DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://")
 
-engine = create_async_engine(DATABASE_URL, future=True, echo=True)
+# Seconds a replica is behind the primary; 0 when it has replayed everything it received, or is not a standby.
+# NULL for a standby that is not streaming from the primary: it has nothing left to replay but falls further
+# behind every second. Seeing the WAL receiver's status needs the pg_read_all_stats role (or pg_monitor)
+REPLICA_LAG_SQL = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN NULL "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+)
+
+
+class DatabaseMetrics:
+    """ Counters of connection checkouts and of SQLAlchemy's compiled statement cache. """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def record_checkout(self, wait: float):
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+
+    def stats(self, pool) -> dict:
+        cached = self.cache_hits + self.cache_misses
+        return {
+            "profile": settings.DB_PROFILE,
+            "pool": {
+                "size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "max_overflow": settings.DB_MAX_OVERFLOW,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            },
+            "statement_cache": {
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+                "hit_rate": round(self.cache_hits / cached, 4) if cached else None,
+                "prepared_statements_per_connection": settings.DB_STATEMENT_CACHE_SIZE,
+            },
+        }
+
+
+# Global instance of the DatabaseMetrics
+db_metrics = DatabaseMetrics()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """ Queue pool that measures how long each checkout waited for a connection, including opening new ones. """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            db_metrics.timeouts += 1
+            raise
+        db_metrics.record_checkout(time.perf_counter() - started)
+        return connection
+
+
+# Function to create an engine configured by the selected DB_PROFILE
+def create_engine(url: str, **kwargs) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        future=True,
+        echo=settings.DB_ECHO,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+        **kwargs,
+    )
+    event.listen(engine.sync_engine, "after_cursor_execute", _count_statement_cache)
+    return engine
+
+
+def _count_statement_cache(conn, cursor, statement, parameters, context, executemany):
+    if context is None:
+        return
+    if context.cache_hit is DefaultDialect.CACHE_HIT:
+        db_metrics.cache_hits += 1
+    elif context.cache_hit is DefaultDialect.CACHE_MISS:
+        db_metrics.cache_misses += 1
+
+
+engine = create_engine(DATABASE_URL, poolclass=InstrumentedPool)
 
 async_session = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
 
 Base = declarative_base()
 
 
+class ReplicaSet:
+    """
+    Read replicas taken in turn for read-only sessions. A background task checks every replica
+    and skips the ones that are down, not streaming or lag more than max_lag seconds; a replica that fails
+    to connect or drops a connection is skipped until its next successful check.
+    """
+
+    def __init__(self, urls: List[str], check_interval: float, max_lag: float):
+        self.engines = [create_engine(url.replace("postgresql://", "postgresql+asyncpg://")) for url in urls]
+        self.sessions = [async_sessionmaker(replica, expire_on_commit=False, class_=AsyncSession)
+                         for replica in self.engines]
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.healthy = [True for _ in self.engines]
+        self.lag: List[Optional[float]] = [None for _ in self.engines]
+        self._turn = itertools.cycle(range(len(self.engines)))
+        self._task: Optional[asyncio.Task] = None
+        for index, replica in enumerate(self.engines):
+            self._watch(index, replica)
+
+    def _watch(self, index: int, replica: AsyncEngine):
+        """ Marks the replica unhealthy as soon as a connection to it fails, without waiting for the next check. """
+
+        def connect(dialect, connection_record, cargs, cparams):
+            try:
+                return dialect.connect(*cargs, **cparams)
+            except Exception:
+                self._mark_unreachable(index)
+                raise
+
+        def handle_error(context):
+            if context.is_disconnect:
+                self._mark_unreachable(index)
+
+        event.listen(replica.sync_engine, "do_connect", connect)
+        event.listen(replica.sync_engine, "handle_error", handle_error)
+
+    def _mark_unreachable(self, index: int):
+        if self.healthy[index]:
+            logger.warning(f"Read replica {index} is unreachable, reading from another database")
+        self.healthy[index] = False
+
+    def session(self) -> Optional[AsyncSession]:
+        """
+        Returns a session on the next healthy replica, or None to read from the primary.
+        The session connects on its first query, so requests answered without one cost no round trip.
+        """
+        for _ in self.engines:
+            index = next(self._turn)
+            if self.healthy[index]:
+                return self.sessions[index]()
+        return None
+
+    @staticmethod
+    async def _measure_lag(replica: AsyncEngine) -> Optional[float]:
+        async with replica.connect() as connection:
+            lag = await connection.scalar(REPLICA_LAG_SQL)
+            return None if lag is None else float(lag)
+
+    async def check(self):
+        for index, replica in enumerate(self.engines):
+            try:
+                lag = await asyncio.wait_for(self._measure_lag(replica), self.check_interval)
+            except Exception:
+                lag = None
+            self.lag[index] = lag
+            self.healthy[index] = lag is not None and lag <= self.max_lag
+
+    async def start(self):
+        if self.engines and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.engines:
+            await replica.dispose()
+
+    async def _run(self):
+        while True:
+            await self.check()
+            await asyncio.sleep(self.check_interval)
+
+    def stats(self) -> List[dict]:
+        return [
+            {
+                "host": replica.url.host,
+                "healthy": self.healthy[index],
+                "lag": self.lag[index],
+                "checked_out": replica.pool.checkedout(),
+            }
+            for index, replica in enumerate(self.engines)
+        ]
+
+
+# Global instance of the ReplicaSet, empty when no replicas are configured
+replicas = ReplicaSet(settings.DATABASE_REPLICA_URLS, settings.DB_REPLICA_CHECK_INTERVAL, settings.DB_REPLICA_MAX_LAG)
+
+
 async def get_db() -> AsyncGenerator:
     async with async_session() as session:
         yield session
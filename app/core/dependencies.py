@@ -1,17 +1,48 @@
-from fastapi import Depends, HTTPException, Header
+from typing import AsyncGenerator, Optional
+
+from fastapi import Depends, HTTPException, Header, Request
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from app.core.database import get_db
+from app.core.database import async_session, get_db, replicas
 from app.models.models import User
+from app.services.user_cache import user_cache
+from app.services.versioning import room_key, room_versions, user_rooms_key
 
 
-# Function to get the current user by Telegram ID from the headers
-async def get_current_user(telegram_id: int = Header(...), db: AsyncSession = Depends(get_db)):
+# Function to find a user by Telegram ID, from the cache when possible
+async def find_user(db: AsyncSession, telegram_id: int) -> Optional[User]:
+    user = await user_cache.get(telegram_id)
+    if user is not None:
+        return user
+
     result = await db.execute(select(User).where(User.telegram_id == telegram_id))
     user = result.scalar_one_or_none()
+    if user is not None:
+        await user_cache.set(user)
+    return user
+
 
+# Function to get the current user by Telegram ID from the headers, always from the primary
+# so that a user registered moments ago is found
+async def get_current_user(telegram_id: int = Header(...), db: AsyncSession = Depends(get_db)):
+    user = await find_user(db, telegram_id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found.")
+    return user
+
+
+# Function to get a session for read-only routes: on a read replica, unless the user's room list
+# or the requested room changed within the read-your-writes window and a replica may not have the change yet
+async def get_read_db(request: Request, current_user: User = Depends(get_current_user)) -> AsyncGenerator:
+    session = None
+    if replicas.engines:
+        keys = [user_rooms_key(current_user.id)]
+        room_id = request.path_params.get("room_id")
+        if room_id is not None:
+            keys.append(room_key(room_id))
+        if not await room_versions.changed_recently(*keys):
+            session = replicas.session()
 
-    return user
\ No newline at end of file
+    async with session or async_session() as session:
+        yield session
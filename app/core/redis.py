@@ -0,0 +1,23 @@
+from typing import Optional
+
+from redis.asyncio import Redis, from_url
+
+from app.core.config import settings
+
+_redis: Optional[Redis] = None
+
+
+def get_redis() -> Redis:
+    """ Returns the shared Redis client, creating it on first use. """
+    global _redis
+    if _redis is None:
+        _redis = from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis
+
+
+async def close_redis():
+    """ Closes the shared Redis client if it was ever created. """
+    global _redis
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
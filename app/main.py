@@ -1,12 +1,42 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
-from app.api.v1.routes import shopping, room, websockets
+from app.api.v1.routes import metrics, shopping, room, websockets
+from app.core.cache import invalidation_bus
+from app.core.database import replicas
+from app.core.redis import close_redis
+from app.services.outbox import outbox_dispatcher
+from app.services.tombstones import run_tombstone_compaction
+from app.websockets.manager import websocket_manager
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await invalidation_bus.start()
+    await outbox_dispatcher.start()
+    await replicas.start()
+    compaction = asyncio.create_task(run_tombstone_compaction())
+    yield
+    compaction.cancel()
+    try:
+        await compaction
+    except asyncio.CancelledError:
+        pass
+    await outbox_dispatcher.stop()
+    await replicas.stop()
+    await invalidation_bus.stop()
+    await websocket_manager.shutdown()
+    await close_redis()
+
 
-app = FastAPI(title= "Shopping List API")
+app = FastAPI(title= "Shopping List API", lifespan=lifespan)
 
 # Register routes
 app.include_router(shopping.router)
 app.include_router(room.router)
+app.include_router(metrics.router)
 
 # Register WebSocket route
 app.include_router(websockets.router)
@@ -1,18 +1,23 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import Column, Integer, String, ForeignKey, UniqueConstraint, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Text, ForeignKey, UniqueConstraint, DateTime, Index, func, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 
 Base = declarative_base()
 
+# Id of the current transaction, stamped on every item change as its sync version
+CURRENT_TXID_SQL = "pg_current_xact_id()::text::bigint"
+# Oldest transaction still in flight: every version below it is final
+SNAPSHOT_XMIN_SQL = "pg_snapshot_xmin(pg_current_snapshot())::text::bigint"
+
 
 class User(Base):
     __tablename__ = "users"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     telegram_id = Column(Integer, unique=True, index=True, nullable=False)
-    username = Column(String, index=True)
+    username = Column(String)
 
     # Relationship with rooms
     owned_rooms = relationship('Room', backref='owner', cascade="all, delete-orphan")
@@ -22,38 +27,83 @@ class User(Base):
 class ShoppingItem(Base):
     __tablename__ = 'shopping_items'
 
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
-    category = Column(String, index=True, nullable=True)
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    category = Column(String, nullable=True)
     room_id = Column(Integer, ForeignKey('rooms.id', ondelete='CASCADE'))
-    created_at = Column(DateTime(timezone=True), default=datetime.now(timezone.utc))
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Tombstone marker: deleted items are kept until compaction so clients can sync the deletion
+    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    version = Column(BigInteger, server_default=text(f"({CURRENT_TXID_SQL})"), nullable=False)
+
+    __table_args__ = (
+        # Keyset pagination of a room's items; list reads never return tombstones
+        Index('ix_shopping_items_live_room_id_created_at_id', 'room_id', 'created_at', 'id',
+              postgresql_where=text('deleted_at IS NULL')),
+        # Delta sync of a room's changes, and the cascade when a room is deleted
+        Index('ix_shopping_items_room_id_version_id', 'room_id', 'version', 'id'),
+        # Tombstone compaction
+        Index('ix_shopping_items_deleted_at', 'deleted_at', postgresql_where=text('deleted_at IS NOT NULL')),
+    )
 
 
 # Model for Rooms
 class Room(Base):
     __tablename__ = 'rooms'
 
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
     owner_id = Column(Integer, ForeignKey('users.id'))  # Link to User
     invite_code = Column(String, unique=True, index=True)
-    created_at = Column(DateTime(timezone=True), default=datetime.now(timezone.utc))
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    # Highest item version whose tombstone was compacted away; older sync cursors must resync
+    purged_version = Column(BigInteger, server_default="0", nullable=False)
 
     # Relationships
     items = relationship('ShoppingItem', backref='room', cascade="all, delete-orphan")
     members = relationship('RoomUser', backref='room', cascade="all, delete-orphan")
 
+    # Keyset pagination of room listings
+    __table_args__ = (Index('ix_rooms_created_at_id', 'created_at', 'id'),)
+
 
 # Model for Room-User
 class RoomUser(Base):
     __tablename__ = 'room_users'
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     room_id = Column(Integer, ForeignKey('rooms.id', ondelete='CASCADE'))
     user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'))
 
     # Relationship with User
     user = relationship('User', backref='room_users')
 
-    # Ensure that a user cannot be added to the same room multiple times
-    __table_args__ = (UniqueConstraint('room_id', 'user_id', name='unique_room_user'),)
+    __table_args__ = (
+        # Ensure that a user cannot be added to the same room multiple times; also serves lookups by room
+        UniqueConstraint('room_id', 'user_id', name='unique_room_user'),
+        # Rooms of a user, used by every membership check and room listing
+        Index('ix_room_users_user_id_room_id', 'user_id', 'room_id'),
+    )
+
+
+# Model for room events waiting to be broadcast, written in the same transaction as the change
+class OutboxEvent(Base):
+    __tablename__ = 'outbox_events'
+
+    id = Column(BigInteger, primary_key=True)
+    room_id = Column(Integer, nullable=False)  # No foreign key: events of deleted rooms are still delivered
+    payload = Column(Text, nullable=False)  # Serialized RoomEvent
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    available_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)  # Retry backoff
+    attempts = Column(Integer, server_default="0", nullable=False)
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Pending events, drained in id order
+        Index('ix_outbox_events_pending', 'id', postgresql_where=text('delivered_at IS NULL')),
+        # Pending events of one room, looked up to keep a room's events behind its failed one
+        Index('ix_outbox_events_room_pending', 'room_id', 'id', postgresql_where=text('delivered_at IS NULL')),
+        # Purging of delivered events
+        Index('ix_outbox_events_delivered_at', 'delivered_at', postgresql_where=text('delivered_at IS NOT NULL')),
+    )
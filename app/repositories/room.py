@@ -1,54 +1,88 @@
 import uuid
-from sqlalchemy import select
+from typing import Optional
+
+from sqlalchemy import delete, func, insert, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 from fastapi import HTTPException
+from app.core.pagination import decode_cursor, paginate
 from app.models.models import Room, RoomUser
-from app.websockets.manager import websocket_manager
+from app.schemas.events import EventType, RoomEvent
+from app.schemas.room import RoomSummary
+from app.services.access_control import get_room_member_ids, invalidate_room_members
+from app.services.versioning import room_key, room_versions, user_rooms_key
+from app.services.outbox import add_event
 
 
 async def create_room(db: AsyncSession, name: str, owner_id: int):
-    invite_code = str(uuid.uuid4())[:8]
-    room = Room(name=name, owner_id=owner_id, invite_code=invite_code)
-    db.add(room)
-    await db.commit()
-    await db.refresh(room)
-
-    room_user = RoomUser(room_id=room.id, user_id=owner_id)
-    db.add(room_user)
-    await db.commit()
+    # One statement inserts the room and its owner's membership, so a room never exists without its owner
+    new_room = (
+        insert(Room)
+        .values(name=name, owner_id=owner_id, invite_code=str(uuid.uuid4())[:8], created_at=func.now())
+        .returning(*Room.__table__.c)
+        .cte("new_room")
+    )
+    owner = (
+        insert(RoomUser)
+        .from_select(["room_id", "user_id"], select(new_room.c.id, literal(owner_id)))
+        .returning(RoomUser.room_id)
+        .cte("owner")
+    )
+    result = await db.execute(
+        select(aliased(Room, new_room)).join(owner, owner.c.room_id == new_room.c.id)
+    )
+    room = result.scalar_one()
 
     message = (
         f"📢 *Нова кімната створена!* 🏠\n"
         f"👤 Власник: _User {owner_id}_\n"
-        f"🛒 Назва кімнати: *{room.name}*\n"
-        f"🔑 Код запрошення: {room.invite_code}"
+        f"🛒 Назва кімнати: *{room.name}*"
     )
-    await websocket_manager.send_message(room.id, message)
+    add_event(db, RoomEvent(
+        type=EventType.ROOM_CREATED, room_id=room.id, actor_id=owner_id,
+        room=RoomSummary.model_validate(room), message=message,
+    ))
+    await db.commit()
+    # Mark the room changed before dropping its cached members, so the reload reads the primary
+    await room_versions.bump(room_key(room.id), user_rooms_key(owner_id))
+    await invalidate_room_members(room.id)
 
     return room
 
 
-async def get_user_rooms(db: AsyncSession, user_id: int):
-    result = await db.execute(
-        select(Room).join(RoomUser).where(RoomUser.user_id == user_id)
-    )
-    return result.scalars().all()
+async def get_user_rooms(db: AsyncSession, user_id: int, limit: int, cursor: Optional[str] = None):
+    query = select(Room).join(RoomUser).where(RoomUser.user_id == user_id)
+    after = decode_cursor(cursor)
+    if after is not None:
+        query = query.where(tuple_(Room.created_at, Room.id) > tuple_(*after))
+    result = await db.execute(query.order_by(Room.created_at, Room.id).limit(limit + 1))
+    rooms, next_cursor = paginate(result.scalars().all(), limit)
+    return {"rooms": rooms, "next_cursor": next_cursor}
 
 
 async def update_room(db: AsyncSession, room_id: int, new_name: str, user_id: int):
     room = await db.get(Room, room_id)
     if room and room.owner_id == user_id:
+        # Nothing to rename (the name is optional in RoomUpdate): no event and no new version
+        if new_name is None or new_name == room.name:
+            return room
         old_name = room.name
         room.name = new_name
-        await db.commit()
-        await db.refresh(room)
+        members = await get_room_member_ids(db, room.id)
 
         message = (
             f"🔄 *Назва кімнати оновлена!* ✏️\n"
             f"🛒 {old_name} ➝ *{room.name}*\n"
             f"👤 Оновив: _User {user_id}_"
         )
-        await websocket_manager.send_message(room.id, message)
+        add_event(db, RoomEvent(
+            type=EventType.ROOM_UPDATED, room_id=room.id, actor_id=user_id,
+            room=RoomSummary.model_validate(room), changes={"name": (old_name, room.name)}, message=message,
+        ))
+        await db.commit()
+        await db.refresh(room)
+        await room_versions.bump(room_key(room.id), *(user_rooms_key(member) for member in members))
 
         return room
 
@@ -58,15 +92,21 @@ async def update_room(db: AsyncSession, room_id: int, new_name: str, user_id: in
 async def delete_room(db: AsyncSession, room_id: int, user_id: int):
     room = await db.get(Room, room_id)
     if room and room.owner_id == user_id:
+        members = await get_room_member_ids(db, room.id)
         await db.delete(room)
-        await db.commit()
 
         message = (
             f"❌ *Кімнату видалено!* 🏠\n"
             f"🛒 Назва: *{room.name}*\n"
             f"👤 Видалив: _User {user_id}_"
         )
-        await websocket_manager.send_message(room.id, message)
+        add_event(db, RoomEvent(
+            type=EventType.ROOM_DELETED, room_id=room.id, actor_id=user_id,
+            room=RoomSummary.model_validate(room), message=message,
+        ))
+        await db.commit()
+        await room_versions.bump(room_key(room.id), *(user_rooms_key(member) for member in members))
+        await invalidate_room_members(room.id)
 
         return {"message": "Room successfully deleted."}
 
@@ -74,63 +114,79 @@ async def delete_room(db: AsyncSession, room_id: int, user_id: int):
 
 
 async def join_room(db: AsyncSession, invite_code: str, user_id: int):
-    result = await db.execute(select(Room).where(Room.invite_code == invite_code))
-    room = result.scalar_one_or_none()
-    if not room:
-        raise HTTPException(status_code=404, detail="Room not found.")
-
-    user_check = await db.execute(
-        select(RoomUser).where(RoomUser.room_id == room.id, RoomUser.user_id == user_id)
+    # Find the room and insert the membership in one statement; the unique constraint rejects repeated joins
+    room = select(Room.id, Room.name).where(Room.invite_code == invite_code).cte("room")
+    joined = (
+        pg_insert(RoomUser)
+        .from_select(["room_id", "user_id"], select(room.c.id, literal(user_id)))
+        .on_conflict_do_nothing(constraint="unique_room_user")
+        .returning(RoomUser.room_id)
+        .cte("joined")
+    )
+    result = await db.execute(
+        select(room.c.id, room.c.name, joined.c.room_id).outerjoin(joined, joined.c.room_id == room.c.id)
     )
-    existing_member = user_check.scalar_one_or_none()
-    if existing_member:
+    row = result.one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Room not found.")
+    room_id, room_name, joined_room_id = row
+    if joined_room_id is None:
         raise HTTPException(status_code=409, detail="You are already a member of this room.")
 
-    new_member = RoomUser(room_id=room.id, user_id=user_id)
-    db.add(new_member)
+    message = (
+        f"✅ *Новий учасник у кімнаті!* 🎉\n"
+        f"🛒 Кімната: *{room_name}*\n"
+        f"👤 Приєднався: _User {user_id}_"
+    )
+    add_event(db, RoomEvent(
+        type=EventType.MEMBER_JOINED, room_id=room_id, actor_id=user_id, user_id=user_id, message=message,
+    ))
     try:
         await db.commit()
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail="Internal server error.")
-    await db.refresh(new_member)
-
-    message = (
-        f"✅ *Новий учасник у кімнаті!* 🎉\n"
-        f"🛒 Кімната: *{room.name}*\n"
-        f"👤 Приєднався: _User {user_id}_"
-    )
-    await websocket_manager.send_message(room.id, message)
+    await room_versions.bump(room_key(room_id), user_rooms_key(user_id))
+    await invalidate_room_members(room_id)
 
     # Повертаємо числовий ідентифікатор кімнати, її назву та повідомлення
-    return {"id": room.id, "name": room.name, "message": "Successfully joined the room"}
+    return {"id": room_id, "name": room_name, "message": "Successfully joined the room"}
 
 
 async def leave_room(db: AsyncSession, room_id: int, user_id: int):
-    room = await db.get(Room, room_id)
-    if not room:
+    # Delete the membership of anyone but the owner and report why nothing was deleted in the same statement
+    room = select(Room.id, Room.name, Room.owner_id).where(Room.id == room_id).cte("room")
+    left = (
+        delete(RoomUser)
+        .where(RoomUser.room_id == room.c.id, RoomUser.user_id == user_id, room.c.owner_id != user_id)
+        .returning(RoomUser.room_id)
+        .cte("left_room")
+    )
+    result = await db.execute(
+        select(room.c.name, room.c.owner_id, left.c.room_id).outerjoin(left, left.c.room_id == room.c.id)
+    )
+    row = result.one_or_none()
+    if row is None:
         raise HTTPException(status_code=404, detail="Room not found.")
-    if room.owner_id == user_id:
+    room_name, owner_id, left_room_id = row
+    if owner_id == user_id:
         raise HTTPException(
             status_code=400,
             detail="Власник не може покинути кімнату. Видаліть кімнату замість цього."
         )
-
-    result = await db.execute(
-        select(RoomUser).where(RoomUser.room_id == room.id, RoomUser.user_id == user_id)
-    )
-    room_user = result.scalar_one_or_none()
-    if not room_user:
+    if left_room_id is None:
         raise HTTPException(status_code=404, detail="Ви не є учасником цієї кімнати.")
 
-    await db.delete(room_user)
-    await db.commit()
-
     message = (
         f"🚪 *Користувач покинув кімнату!* 👋\n"
-        f"🛒 Кімната: *{room.name}*\n"
+        f"🛒 Кімната: *{room_name}*\n"
         f"👤 Користувач: _User {user_id}_"
     )
-    await websocket_manager.send_message(room.id, message)
+    add_event(db, RoomEvent(
+        type=EventType.MEMBER_LEFT, room_id=room_id, actor_id=user_id, user_id=user_id, message=message,
+    ))
+    await db.commit()
+    await room_versions.bump(room_key(room_id), user_rooms_key(user_id))
+    await invalidate_room_members(room_id)
 
-    return {"message": "Successfully left the room."}
\ No newline at end of file
+    return {"message": "Successfully left the room."}
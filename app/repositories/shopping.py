@@ -1,80 +1,312 @@
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from sqlalchemy import (
+    Boolean, Integer, String, and_, case, column, exists, func, insert, literal, literal_column, true, tuple_, update,
+    values,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.orm import aliased
+
+from app.core.pagination import decode_cursor, paginate
+from app.models.models import CURRENT_TXID_SQL, SNAPSHOT_XMIN_SQL, Room, RoomUser, ShoppingItem
+from app.schemas.events import EventType, RoomEvent
+from app.schemas.shopping import ShoppingItemCreate, ShoppingItemUpdate, ShoppingItemResponse, ShoppingItemBulkUpdate
+from app.services.versioning import room_key, room_versions
+from app.services.outbox import add_event
+
+
+# Subquery of the rooms a user is a member of, used to authorize statements in place
+def member_room_ids(user_id: int):
+    return select(RoomUser.room_id).where(RoomUser.user_id == user_id)
+
+
+# Condition matching the live (not deleted) items a user may change
+def writable_by(user_id: int):
+    return and_(ShoppingItem.deleted_at.is_(None), ShoppingItem.room_id.in_(member_room_ids(user_id)))
+
 
-from app.models.models import ShoppingItem
-from app.schemas.shopping import ShoppingItemCreate, ShoppingItemUpdate
-from app.services.access_control import has_access_to_room
-from app.websockets.manager import websocket_manager
+# Columns set on every item change so delta sync picks it up
+def change_stamp() -> dict:
+    return {"version": literal_column(CURRENT_TXID_SQL), "updated_at": func.now()}
 
 
 async def add_item(db: AsyncSession, item_data: ShoppingItemCreate, user_id: int):
-    if not await has_access_to_room(db, user_id, item_data.room_id):
+    # INSERT ... SELECT ... WHERE EXISTS (membership) RETURNING: the row is only written by members
+    result = await db.execute(
+        insert(ShoppingItem)
+        .from_select(
+            ["name", "category", "room_id", "created_at"],
+            select(
+                literal(item_data.name, String),
+                literal(item_data.category, String),
+                literal(item_data.room_id),
+                func.now(),
+            ).where(exists().where(RoomUser.room_id == item_data.room_id, RoomUser.user_id == user_id)),
+        )
+        .returning(ShoppingItem)
+    )
+    item = result.scalar_one_or_none()
+    if item is None:
         return {"error": "Access denied."}
 
-    item = ShoppingItem(**item_data.model_dump())
-    db.add(item)
-    await db.commit()
-    await db.refresh(item)
-
     message = (
         f"🛍 *Новий товар додано!* ✅\n"
         f"📌 Назва: *{item.name}*\n"
         f"🗂 Категорія: `{item.category if item.category else 'Без категорії'}`\n"
         f"👤 Додав: _User {user_id}_"
     )
-    await websocket_manager.send_message(item_data.room_id, message)
+    add_event(db, RoomEvent(
+        type=EventType.ITEM_ADDED, room_id=item.room_id, actor_id=user_id,
+        item=ShoppingItemResponse.model_validate(item), message=message,
+    ))
+    await db.commit()
+    await room_versions.bump(room_key(item.room_id))
 
     return item
 
 
-async def get_items(db: AsyncSession, room_id: int, user_id: int):
-    if not await has_access_to_room(db, user_id, room_id):
+async def get_items(db: AsyncSession, room_id: int, user_id: int, limit: int, cursor: Optional[str] = None):
+    # The membership row is the driving table: no row means no access, a NULL item means an empty page.
+    # The page is read in a LATERAL subquery so it is taken in index order instead of sorting the whole room
+    conditions = [ShoppingItem.room_id == RoomUser.room_id, ShoppingItem.deleted_at.is_(None)]
+    after = decode_cursor(cursor)
+    if after is not None:
+        conditions.append(tuple_(ShoppingItem.created_at, ShoppingItem.id) > tuple_(*after))
+    page = (
+        select(ShoppingItem)
+        .where(*conditions)
+        .order_by(ShoppingItem.created_at, ShoppingItem.id)
+        .limit(limit + 1)
+        .lateral("page")
+    )
+    item = aliased(ShoppingItem, page)
+    result = await db.execute(
+        select(RoomUser.id, item)
+        .outerjoin(page, true())
+        .where(RoomUser.room_id == room_id, RoomUser.user_id == user_id)
+        .order_by(item.created_at, item.id)
+    )
+    rows = result.all()
+    if not rows:
         return {"error": "Access denied."}
-
-    result = await db.execute(select(ShoppingItem).where(ShoppingItem.room_id == room_id))
-    return result.scalars().all()
+    items, next_cursor = paginate([item for _, item in rows if item is not None], limit)
+    return {"items": items, "next_cursor": next_cursor}
 
 
 async def update_item(db: AsyncSession, item_id: int, item_data: ShoppingItemUpdate, user_id: int):
-    item = await db.get(ShoppingItem, item_id)
+    changes = item_data.model_dump(exclude_unset=True)
+    if not changes:
+        result = await db.execute(
+            select(ShoppingItem).where(ShoppingItem.id == item_id, writable_by(user_id))
+        )
+        item = result.scalar_one_or_none()
+        return item if item is not None else {"error": "Access denied."}
+
+    # Lock the authorized row and keep its previous values so they can be returned next to the new ones
+    old = (
+        select(ShoppingItem.id, ShoppingItem.name, ShoppingItem.category)
+        .where(ShoppingItem.id == item_id, writable_by(user_id))
+        .with_for_update()
+        .subquery("old")
+    )
+    # populate_existing: the returned row replaces any stale copy of the item already held by the session
+    result = await db.execute(
+        update(ShoppingItem)
+        .where(ShoppingItem.id == old.c.id)
+        .values(**changes, **change_stamp())
+        .returning(ShoppingItem, old.c.name, old.c.category)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return {"error": "Access denied."}
+    item, old_name, old_category = row
+
+    message = (
+        f"🔄 *Товар оновлено!* ✏️\n"
+        f"📌 Назва: *{old_name}* ➝ *{item.name}*\n"
+        f"🗂 Категорія: `{old_category if old_category else 'Без категорії'}` ➝ `{item.category if item.category else 'Без категорії'}`\n"
+        f"👤 Оновив: _User {user_id}_"
+    )
+    changes = {
+        key: (old, getattr(item, key))
+        for key, old in (("name", old_name), ("category", old_category))
+        if old != getattr(item, key)
+    }
+    add_event(db, RoomEvent(
+        type=EventType.ITEM_UPDATED, room_id=item.room_id, actor_id=user_id,
+        item=ShoppingItemResponse.model_validate(item), changes=changes, message=message,
+    ))
+    await db.commit()
+    await room_versions.bump(room_key(item.room_id))
+
+    return item
 
-    if item and await has_access_to_room(db, user_id, item.room_id):
-        old_name = item.name
-        old_category = item.category
 
-        for key, value in item_data.model_dump(exclude_unset=True).items():
-            setattr(item, key, value)
+async def delete_item(db: AsyncSession, item_id: int, user_id: int):
+    # Soft delete: the row stays as a tombstone for delta sync until it is compacted
+    result = await db.execute(
+        update(ShoppingItem)
+        .where(ShoppingItem.id == item_id, writable_by(user_id))
+        .values(deleted_at=func.now(), **change_stamp())
+        .returning(ShoppingItem)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    item = result.scalar_one_or_none()
+    if item is None:
+        return {"error": "Access denied."}
 
-        await db.commit()
-        await db.refresh(item)
+    message = (
+        f"🚨 *Товар видалено!* ❌\n"
+        f"📌 Назва: *{item.name}*\n"
+        f"👤 Видалив: _User {user_id}_"
+    )
+    add_event(db, RoomEvent(
+        type=EventType.ITEM_DELETED, room_id=item.room_id, actor_id=user_id,
+        item=ShoppingItemResponse.model_validate(item), message=message,
+    ))
+    await db.commit()
+    await room_versions.bump(room_key(item.room_id))
 
+    return {"message": "Item successfully deleted."}
+
+
+# Stage one aggregated event per room for a bulk change
+def add_bulk_events(db: AsyncSession, event_type: EventType, items: List, user_id: int, verb: str):
+    by_room: Dict[int, List[ShoppingItemResponse]] = defaultdict(list)
+    for item in items:
+        by_room[item.room_id].append(ShoppingItemResponse.model_validate(item))
+
+    for room_id, room_items in by_room.items():
         message = (
-            f"🔄 *Товар оновлено!* ✏️\n"
-            f"📌 Назва: *{old_name}* ➝ *{item.name}*\n"
-            f"🗂 Категорія: `{old_category if old_category else 'Без категорії'}` ➝ `{item.category if item.category else 'Без категорії'}`\n"
-            f"👤 Оновив: _User {user_id}_"
+            f"🛒 *{verb}: {len(room_items)}*\n"
+            + "".join(f"📌 *{item.name}*\n" for item in room_items[:10])
+            + (f"… та ще {len(room_items) - 10}\n" if len(room_items) > 10 else "")
+            + f"👤 Користувач: _User {user_id}_"
         )
+        add_event(db, RoomEvent(
+            type=event_type, room_id=room_id, actor_id=user_id, items=room_items, message=message,
+        ))
 
-        await websocket_manager.send_message(item.room_id, message)
 
-        return item
+async def add_items(db: AsyncSession, items_data: List[ShoppingItemCreate], user_id: int):
+    # One multi-row INSERT ... SELECT FROM (VALUES ...) keeping only rows for the user's rooms
+    rows = values(
+        column("name", String), column("category", String), column("room_id", Integer), name="new_items",
+    ).data([(item.name, item.category, item.room_id) for item in items_data])
+    result = await db.execute(
+        insert(ShoppingItem)
+        .from_select(
+            ["name", "category", "room_id", "created_at"],
+            select(rows.c.name, rows.c.category, rows.c.room_id, func.now())
+            .where(rows.c.room_id.in_(member_room_ids(user_id))),
+        )
+        .returning(ShoppingItem)
+    )
+    items = result.scalars().all()
+    if len(items) != len(items_data):
+        await db.rollback()
+        return {"error": "Access denied."}
+    add_bulk_events(db, EventType.ITEMS_ADDED, items, user_id, "Додано товарів")
+    await db.commit()
+    await room_versions.bump(*{room_key(item.room_id) for item in items})
+    return items
 
-    return {"error": "Access denied."}
 
+async def update_items(db: AsyncSession, items_data: List[ShoppingItemBulkUpdate], user_id: int):
+    # Each row says which fields were sent, so unset fields keep their value and explicit nulls clear it
+    rows = values(
+        column("id", Integer),
+        column("name", String), column("set_name", Boolean),
+        column("category", String), column("set_category", Boolean),
+        name="changes",
+    ).data([
+        (item.id, item.name, "name" in item.model_fields_set, item.category, "category" in item.model_fields_set)
+        for item in items_data
+    ])
+    result = await db.execute(
+        update(ShoppingItem)
+        .where(ShoppingItem.id == rows.c.id, writable_by(user_id))
+        .values(
+            name=case((rows.c.set_name, rows.c.name), else_=ShoppingItem.name),
+            category=case((rows.c.set_category, rows.c.category), else_=ShoppingItem.category),
+            **change_stamp(),
+        )
+        .returning(ShoppingItem)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    items = result.scalars().all()
+    if len(items) != len(items_data):
+        await db.rollback()
+        return {"error": "Access denied."}
+    add_bulk_events(db, EventType.ITEMS_UPDATED, items, user_id, "Оновлено товарів")
+    await db.commit()
+    await room_versions.bump(*{room_key(item.room_id) for item in items})
+    return items
 
-async def delete_item(db: AsyncSession, item_id: int, user_id: int):
-    item = await db.get(ShoppingItem, item_id)
-    if item and await has_access_to_room(db, user_id, item.room_id):
-        await db.delete(item)
-        await db.commit()
 
-        message = (
-            f"🚨 *Товар видалено!* ❌\n"
-            f"📌 Назва: *{item.name}*\n"
-            f"👤 Видалив: _User {user_id}_"
+async def delete_items(db: AsyncSession, item_ids: List[int], user_id: int):
+    item_ids = set(item_ids)
+    result = await db.execute(
+        update(ShoppingItem)
+        .where(ShoppingItem.id.in_(item_ids), writable_by(user_id))
+        .values(deleted_at=func.now(), **change_stamp())
+        .returning(ShoppingItem)
+        .execution_options(synchronize_session=False, populate_existing=True)
+    )
+    items = result.scalars().all()
+    if len(items) != len(item_ids):
+        # Deleting is idempotent: ids already deleted in the user's rooms are not a denial
+        missing_ids = item_ids - {item.id for item in items}
+        already_deleted = await db.scalar(
+            select(func.count()).select_from(ShoppingItem).where(
+                ShoppingItem.id.in_(missing_ids),
+                ShoppingItem.deleted_at.is_not(None),
+                ShoppingItem.room_id.in_(member_room_ids(user_id)),
+            )
         )
-        await websocket_manager.send_message(item.room_id, message)
+        if already_deleted != len(missing_ids):
+            await db.rollback()
+            return {"error": "Access denied."}
+    if items:
+        add_bulk_events(db, EventType.ITEMS_DELETED, items, user_id, "Видалено товарів")
+    await db.commit()
+    await room_versions.bump(*{room_key(item.room_id) for item in items})
+    return {"message": f"{len(items)} items successfully deleted."}
+
+
+async def get_changes(db: AsyncSession, room_id: int, user_id: int, since: int, after_id: Optional[int], limit: int):
+    """
+    Returns the items created, updated or deleted in a room after the `since` version.
+    Versions are transaction ids, so only changes of transactions older than every
+    transaction still in flight are returned; later ones are picked up by the next call.
+    """
+    result = await db.execute(
+        select(Room.purged_version, literal_column(SNAPSHOT_XMIN_SQL))
+        .join(RoomUser, RoomUser.room_id == Room.id)
+        .where(Room.id == room_id, RoomUser.user_id == user_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return {"error": "Access denied."}
+    purged_version, horizon = row
+    # Continuation pages (after_id set) belong to a sync that already passed this check
+    if 0 < since < purged_version and after_id is None:
+        return {"resync": True}
 
-        return {"message": "Item successfully deleted."}
+    query = select(ShoppingItem).where(ShoppingItem.room_id == room_id, ShoppingItem.version < horizon)
+    if after_id is not None:
+        query = query.where(tuple_(ShoppingItem.version, ShoppingItem.id) > tuple_(since, after_id))
+    else:
+        query = query.where(ShoppingItem.version > since)
+    if since == 0:
+        query = query.where(ShoppingItem.deleted_at.is_(None))  # A first sync needs no tombstones
+    result = await db.execute(query.order_by(ShoppingItem.version, ShoppingItem.id).limit(limit + 1))
+    items = result.scalars().all()
 
-    return {"error": "Access denied."}
+    if len(items) > limit:
+        items = items[:limit]
+        return {"changes": items, "version": items[-1].version, "after_id": items[-1].id, "has_more": True}
+    return {"changes": items, "version": max(since, horizon - 1), "after_id": None, "has_more": False}
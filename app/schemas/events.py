@@ -0,0 +1,42 @@
+from enum import Enum
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from app.schemas.room import RoomSummary
+from app.schemas.shopping import ShoppingItemResponse
+
+
+# Kinds of changes broadcast to the members of a room
+class EventType(str, Enum):
+    ITEM_ADDED = "item_added"
+    ITEM_UPDATED = "item_updated"
+    ITEM_DELETED = "item_deleted"
+    ITEMS_ADDED = "items_added"
+    ITEMS_UPDATED = "items_updated"
+    ITEMS_DELETED = "items_deleted"
+    ROOM_CREATED = "room_created"
+    ROOM_UPDATED = "room_updated"
+    ROOM_DELETED = "room_deleted"
+    MEMBER_JOINED = "member_joined"
+    MEMBER_LEFT = "member_left"
+    MEMBER_ADDED = "member_added"
+    MEMBER_REMOVED = "member_removed"
+
+
+# Schema for events sent over the room WebSocket
+class RoomEvent(BaseModel):
+    type: EventType
+    room_id: int
+    actor_id: int = Field(..., description="ID of the user who made the change")
+    seq: Optional[int] = Field(None, description="Per-room sequence, stamped when the event is broadcast")
+    item: Optional[ShoppingItemResponse] = Field(None, description="Item snapshot after the change")
+    items: Optional[List[ShoppingItemResponse]] = Field(None, description="Item snapshots of a bulk change")
+    room: Optional[RoomSummary] = Field(None, description="Room snapshot after the change")
+    user_id: Optional[int] = Field(None, description="Member affected by a membership change")
+    changes: Optional[Dict[str, Tuple[Any, Any]]] = Field(None, description="Changed fields as [old, new]")
+    message: Optional[str] = Field(None, description="Human-readable notification text")
+
+    def serialize(self) -> str:
+        """ Serializes the event once so the same payload can be sent to every socket. """
+        return self.model_dump_json(exclude_none=True)
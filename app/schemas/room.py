@@ -2,6 +2,8 @@ from typing import Optional, List
 from pydantic import BaseModel, Field
 from datetime import datetime
 
+from app.schemas.shopping import ShoppingItemResponse
+
 
 # Base schema for Room (used for inheritance)
 class RoomBase(BaseModel):
@@ -18,20 +20,47 @@ class RoomUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=3, max_length=30, description="Updated name of the room")
 
 
-# Schema for API response
-class RoomResponse(RoomBase):
+# Schema of a room as broadcast in room events; the invite code is only given to members through the API
+class RoomSummary(RoomBase):
     id: int
     owner_id: int
-    invite_code: str
     created_at: datetime
 
     class Config:
         from_attributes = True
 
 
-    # Schema for returning a list of rooms
+# Schema for API response
+class RoomResponse(RoomSummary):
+    invite_code: str
+
+
+# Schema for returning a page of rooms
 class RoomListResponse(BaseModel):
     rooms: List[RoomResponse] = Field(..., description="List of rooms")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, null on the last page")
+
+    class Config:
+        from_attributes = True
+
+# Schema for a member of a room
+class RoomMember(BaseModel):
+    id: int
+    telegram_id: int
+    username: Optional[str] = None
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+# Schema for everything a client needs to open a room
+class RoomSnapshot(BaseModel):
+    room: RoomResponse
+    members: List[RoomMember]
+    items: List[ShoppingItemResponse] = Field(..., description="First page of items")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page of items, null on the last page")
+    version: int = Field(..., description="Sync version to pass as `since` to GET /shopping/{room_id}/changes")
+    seq: int = Field(..., description="Event sequence to pass as `since` when connecting to the room WebSocket")
+
+    class Config:
+        from_attributes = True
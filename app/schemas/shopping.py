@@ -1,6 +1,10 @@
-from typing import Optional
+from datetime import datetime
+from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
+
+# Upper bound on the number of items in one bulk request
+MAX_BULK_ITEMS = 500
 
 
 # Schema for creating a new shopping item
@@ -22,8 +26,55 @@ class ShoppingItemResponse(BaseModel):
     name: str
     category: Optional[str] = None
     room_id: int
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: Optional[int] = None
 
     class Config:
         from_attributes = True
 
 
+# Schema for a page of items
+class ShoppingItemPage(BaseModel):
+    items: List[ShoppingItemResponse] = Field(..., description="Items of this page")
+    next_cursor: Optional[str] = Field(None, description="Cursor of the next page, null on the last page")
+
+
+# Schema for updating one item of a bulk update
+class ShoppingItemBulkUpdate(ShoppingItemUpdate):
+    id: int = Field(..., gt=0, description="ID of the item to update")
+
+
+# Schema for creating many items at once
+class ShoppingItemBulkCreateRequest(BaseModel):
+    items: List[ShoppingItemCreate] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+
+# Schema for updating many items at once
+class ShoppingItemBulkUpdateRequest(BaseModel):
+    items: List[ShoppingItemBulkUpdate] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS)
+
+    @field_validator("items")
+    @classmethod
+    def unique_ids(cls, items: List[ShoppingItemBulkUpdate]) -> List[ShoppingItemBulkUpdate]:
+        if len({item.id for item in items}) != len(items):
+            raise ValueError("Each item may only be updated once per request")
+        return items
+
+
+# Schema for deleting many items at once
+class ShoppingItemBulkDeleteRequest(BaseModel):
+    ids: List[int] = Field(..., min_length=1, max_length=MAX_BULK_ITEMS, description="IDs of the items to delete")
+
+
+# Schema for an item in a delta sync; deleted_at is set on tombstones
+class ShoppingItemChange(ShoppingItemResponse):
+    deleted_at: Optional[datetime] = None
+
+
+# Schema for the response of a delta sync
+class ShoppingItemChanges(BaseModel):
+    changes: List[ShoppingItemChange] = Field(..., description="Items created, updated or deleted since the given version")
+    version: int = Field(..., description="Version to pass as `since` on the next sync")
+    after_id: Optional[int] = Field(None, description="Pass as `after_id` with `version` while has_more is true")
+    has_more: bool = Field(..., description="Whether more changes are waiting")
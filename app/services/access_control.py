@@ -1,12 +1,35 @@
+from typing import FrozenSet
+
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import TTLCache, invalidation_bus
+from app.core.config import settings
 from app.models.models import RoomUser
 
+# room_id -> frozenset of member user ids
+membership_cache = TTLCache(settings.ACL_CACHE_SIZE, settings.ACL_CACHE_TTL)
+invalidation_bus.register("room_members", membership_cache)
+
+
+# Function to get the ids of all members of a room, from the cache when possible
+async def get_room_member_ids(db: AsyncSession, room_id: int) -> FrozenSet[int]:
+    members = membership_cache.get(room_id)
+    if members is None:
+        generation = membership_cache.generation
+        result = await db.execute(select(RoomUser.user_id).where(RoomUser.room_id == room_id))
+        members = frozenset(result.scalars().all())
+        # Don't cache a member list that was invalidated while it was being loaded
+        if membership_cache.generation == generation:
+            membership_cache.set(room_id, members)
+    return members
+
 
 # Function to check if a user has access to a specific room
 async def has_access_to_room(db: AsyncSession, user_id: int, room_id: int) -> bool:
-    result = await db.execute(
-        select(RoomUser).where(RoomUser.room_id == room_id).where(RoomUser.user_id == user_id)
-    )
-    return result.scalar_one_or_none() is not None
+    return user_id in await get_room_member_ids(db, room_id)
+
+
+# Function to drop the cached members of a room on every worker after membership changes
+async def invalidate_room_members(room_id: int):
+    await invalidation_bus.invalidate("room_members", room_id)
@@ -0,0 +1,147 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Set
+
+from sqlalchemy import delete, event, exists, func, select
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.models import OutboxEvent
+from app.schemas.events import RoomEvent
+from app.websockets.manager import websocket_manager
+
+logger = logging.getLogger(__name__)
+
+# Advisory lock held by the dispatcher draining the outbox, so each room's events are published in order
+DISPATCH_LOCK_ID = 0x6F7574626F78  # "outbox"
+
+
+# Function to stage a room event in the caller's transaction; it is broadcast once the transaction commits
+def add_event(db: AsyncSession, room_event: RoomEvent):
+    db.add(OutboxEvent(room_id=room_event.room_id, payload=room_event.serialize()))
+    db.info["outbox_pending"] = True
+
+
+class OutboxDispatcher:
+    """
+    Publishes committed outbox events to the WebSocket broadcast backend in batches and marks them delivered.
+    Events that fail are retried with exponential backoff; later events of the same room wait for them,
+    in this batch and in every later one until the failed event is delivered.
+    """
+
+    def __init__(self, batch_size: int = 100, poll_interval: float = 1.0, max_backoff: float = 60.0,
+                 retention: int = 86400):
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_backoff = max_backoff
+        self.retention = retention
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self):
+        """ Wakes the dispatcher up right after a commit instead of at the next poll. """
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def start(self):
+        if self._task is None:
+            self._wakeup = asyncio.Event()  # Bound to the running loop, so it is created on every start
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def dispatch(self, db: AsyncSession) -> int:
+        """ Publishes one batch of pending events and returns how many were handled. """
+        locked = await db.scalar(select(func.pg_try_advisory_xact_lock(DISPATCH_LOCK_ID)))
+        if not locked:
+            return 0  # Another worker is draining the outbox
+
+        # An event waiting out its backoff holds back the newer events of its room; older events that are
+        # available come earlier in id order, so they are in this batch and the loop below keeps them in order
+        earlier = aliased(OutboxEvent)
+        waiting_earlier = exists().where(
+            earlier.room_id == OutboxEvent.room_id,
+            earlier.delivered_at.is_(None),
+            earlier.id < OutboxEvent.id,
+            earlier.available_at > func.now(),
+        )
+        result = await db.execute(
+            select(OutboxEvent)
+            .where(OutboxEvent.delivered_at.is_(None), OutboxEvent.available_at <= func.now(), ~waiting_earlier)
+            .order_by(OutboxEvent.id)
+            .limit(self.batch_size)
+        )
+        events = result.scalars().all()
+        now = datetime.now(timezone.utc)
+        blocked: Set[int] = set()
+        for outbox_event in events:
+            if outbox_event.room_id in blocked:
+                continue  # An earlier event of this room failed, keep the order
+            try:
+                await websocket_manager.publish(outbox_event.room_id, outbox_event.payload)
+                outbox_event.delivered_at = now
+            except Exception:
+                logger.exception(f"Failed to publish outbox event {outbox_event.id}")
+                blocked.add(outbox_event.room_id)
+                outbox_event.attempts += 1
+                backoff = min(self.max_backoff, self.poll_interval * 2 ** outbox_event.attempts)
+                outbox_event.available_at = now + timedelta(seconds=backoff)
+        await db.commit()
+        return len(events)
+
+    async def purge(self, db: AsyncSession):
+        """ Deletes events delivered longer ago than the retention window. """
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.retention)
+        await db.execute(delete(OutboxEvent).where(OutboxEvent.delivered_at < cutoff))
+        await db.commit()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        next_purge = loop.time()
+        while True:
+            self._wakeup.clear()
+            try:
+                async with async_session() as db:
+                    while await self.dispatch(db) == self.batch_size:
+                        pass
+                    if loop.time() >= next_purge:
+                        await self.purge(db)
+                        next_purge = loop.time() + self.retention / 24
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Outbox dispatch failed")
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+# Global instance of the OutboxDispatcher
+outbox_dispatcher = OutboxDispatcher(
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    poll_interval=settings.OUTBOX_POLL_INTERVAL,
+    retention=settings.OUTBOX_RETENTION,
+)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_dispatcher(session: Session):
+    if session.info.pop("outbox_pending", False):
+        outbox_dispatcher.notify()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_pending(session: Session):
+    session.info.pop("outbox_pending", None)
@@ -1,54 +1,131 @@
-from sqlalchemy import select
+from sqlalchemy import and_, delete, literal, literal_column, select
+from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
 
-from app.models.models import User, RoomUser, Room
+from app.models.models import SNAPSHOT_XMIN_SQL, User, RoomUser, Room
+from app.repositories.shopping import get_items
+from app.schemas.events import EventType, RoomEvent
+from app.services.access_control import invalidate_room_members
+from app.services.outbox import add_event
+from app.services.versioning import room_key, room_versions, user_rooms_key
+from app.websockets.manager import websocket_manager
 
 
-# Get all members from room
-async def get_room_members(db: AsyncSession, room_id: int):
+# Get all members from room, only for its members
+async def get_room_members(db: AsyncSession, room_id: int, user_id: int):
+    me = aliased(RoomUser)
     result = await db.execute(
-        select(User).join(RoomUser).where(RoomUser.room_id == room_id)
+        select(User)
+        .join(RoomUser, RoomUser.user_id == User.id)
+        .join(me, and_(me.room_id == RoomUser.room_id, me.user_id == user_id))
+        .where(RoomUser.room_id == room_id)
     )
-    return result.scalars().all()
+    members = result.scalars().all()
+    if not members:
+        return {"error": "Access denied."}
+    return members
 
 
-# Add a user to the room
-async def add_user_to_room(db: AsyncSession, room_id: int, user_id: int, current_user_id: int):
-    room = await db.get(Room, room_id)
-    if room.owner_id != current_user_id:
-        return {"error": "You are not the owner of this room."}
+# Get a room with its members and first page of items in two statements
+async def get_room_snapshot(db: AsyncSession, room_id: int, user_id: int, limit: int):
+    # Read the event sequence first: replaying from it may repeat changes already in the snapshot, never miss one
+    seq = await websocket_manager.last_seq(room_id)
 
-    existing_member = await db.execute(
-        select(RoomUser).where(RoomUser.room_id == room_id, RoomUser.user_id == user_id)
+    me = aliased(RoomUser)
+    result = await db.execute(
+        select(Room, User, literal_column(SNAPSHOT_XMIN_SQL))
+        .join(RoomUser, RoomUser.room_id == Room.id)
+        .join(User, User.id == RoomUser.user_id)
+        .join(me, and_(me.room_id == Room.id, me.user_id == user_id))
+        .where(Room.id == room_id)
+        .order_by(RoomUser.id)
     )
+    rows = result.all()
+    if not rows:
+        return {"error": "Access denied."}
+
+    page = await get_items(db, room_id, user_id, limit)
+    if "error" in page:
+        return page  # Left the room between the two statements
 
-    if existing_member.scalar_one_or_none():
+    # Every change below the horizon is visible to the items statement, later ones come with the next sync
+    horizon = rows[0][2]
+    return {
+        "room": rows[0][0],
+        "members": [member for _, member, _ in rows],
+        "items": page["items"],
+        "next_cursor": page["next_cursor"],
+        "version": horizon - 1,
+        "seq": seq,
+    }
+
+
+# Add a user to the room
+async def add_user_to_room(db: AsyncSession, room_id: int, user_id: int, current_user_id: int):
+    # The owner check and the insert run as one statement; the unique constraint rejects existing members
+    room = select(Room.id, Room.name).where(Room.id == room_id, Room.owner_id == current_user_id).cte("room")
+    added = (
+        insert(RoomUser)
+        .from_select(["room_id", "user_id"], select(room.c.id, literal(user_id)))
+        .on_conflict_do_nothing(constraint="unique_room_user")
+        .returning(RoomUser.room_id)
+        .cte("added")
+    )
+    result = await db.execute(select(room.c.name, added.c.room_id).outerjoin(added, added.c.room_id == room.c.id))
+    row = result.one_or_none()
+    if row is None:
+        return {"error": "You are not the owner of this room."}
+    room_name, added_room_id = row
+    if added_room_id is None:
         return {"error": "User is already a member of this room."}
 
-    new_member = RoomUser(room_id=room_id, user_id=user_id)
-    db.add(new_member)
+    message = (
+        f"➕ *Учасника додано до кімнати!* 🎉\n"
+        f"🛒 Кімната: *{room_name}*\n"
+        f"👤 Додано: _User {user_id}_"
+    )
+    add_event(db, RoomEvent(
+        type=EventType.MEMBER_ADDED, room_id=room_id, actor_id=current_user_id, user_id=user_id, message=message,
+    ))
     await db.commit()
-    await db.refresh(new_member)
+    # Mark the room changed before dropping its cached members, so the reload reads the primary
+    await room_versions.bump(room_key(room_id), user_rooms_key(user_id))
+    await invalidate_room_members(room_id)
     return {"message": "User added successfully."}
 
 
 # Remove a user from the room (only the owner can do this)
 async def remove_user_from_room(db: AsyncSession, room_id: int, user_id: int, current_user_id: int):
-    room = await db.get(Room, room_id)
-    if room.owner_id != current_user_id:
+    # The owner check and the delete run as one statement; the owner's own membership is never deleted
+    room = select(Room.id, Room.name, Room.owner_id).where(Room.id == room_id, Room.owner_id == current_user_id).cte("room")
+    removed = (
+        delete(RoomUser)
+        .where(RoomUser.room_id == room.c.id, RoomUser.user_id == user_id, room.c.owner_id != user_id)
+        .returning(RoomUser.room_id)
+        .cte("removed")
+    )
+    result = await db.execute(
+        select(room.c.name, room.c.owner_id, removed.c.room_id).outerjoin(removed, removed.c.room_id == room.c.id)
+    )
+    row = result.one_or_none()
+    if row is None:
         return {"error": "You are not the owner of this room."}
-
-    if room.owner_id == user_id:
+    room_name, owner_id, removed_room_id = row
+    if owner_id == user_id:
         return {"error": "The owner cannot be removed from the room."}
-
-    user_to_remove = await db.execute(
-        select(RoomUser).where(RoomUser.room_id == room_id, RoomUser.user_id == user_id)
-    )
-    member = user_to_remove.scalar_one_or_none()
-
-    if not member:
+    if removed_room_id is None:
         return {"error": "User is not a member of this room."}
 
-    await db.delete(member)
+    message = (
+        f"➖ *Учасника видалено з кімнати!* 🚪\n"
+        f"🛒 Кімната: *{room_name}*\n"
+        f"👤 Видалено: _User {user_id}_"
+    )
+    add_event(db, RoomEvent(
+        type=EventType.MEMBER_REMOVED, room_id=room_id, actor_id=current_user_id, user_id=user_id, message=message,
+    ))
     await db.commit()
+    await room_versions.bump(room_key(room_id), user_rooms_key(user_id))
+    await invalidate_room_members(room_id)
     return {"message": "User removed successfully."}
\ No newline at end of file
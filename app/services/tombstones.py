@@ -0,0 +1,58 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_session
+from app.models.models import Room, ShoppingItem
+
+logger = logging.getLogger(__name__)
+
+
+# Remove tombstones older than the retention window and remember the newest purged version per room
+async def compact_tombstones(db: AsyncSession, retention: int, batch_size: int = 1000) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=retention)
+    expired = (
+        select(ShoppingItem.id)
+        .where(ShoppingItem.deleted_at < cutoff)
+        .order_by(ShoppingItem.deleted_at)
+        .limit(batch_size)
+    )
+    purged = (
+        delete(ShoppingItem)
+        .where(ShoppingItem.id.in_(expired))
+        .returning(ShoppingItem.room_id, ShoppingItem.version)
+        .cte("purged")
+    )
+    per_room = (
+        select(purged.c.room_id, func.max(purged.c.version).label("version"), func.count().label("count"))
+        .group_by(purged.c.room_id)
+        .subquery("per_room")
+    )
+    result = await db.execute(
+        update(Room)
+        .where(Room.id == per_room.c.room_id)
+        .values(purged_version=func.greatest(Room.purged_version, per_room.c.version))
+        .returning(per_room.c.count)
+        .execution_options(synchronize_session=False)
+    )
+    purged_count = sum(result.scalars().all())
+    await db.commit()
+    return purged_count
+
+
+# Periodic job compacting tombstones, started from the application lifespan
+async def run_tombstone_compaction():
+    while True:
+        try:
+            async with async_session() as db:
+                while await compact_tombstones(db, settings.TOMBSTONE_RETENTION):
+                    pass
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Tombstone compaction failed")
+        await asyncio.sleep(settings.TOMBSTONE_COMPACTION_INTERVAL)
@@ -0,0 +1,69 @@
+import json
+from typing import Optional
+
+from redis.asyncio import Redis
+
+from app.core.cache import TTLCache, invalidation_bus
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.models.models import User
+
+
+class UserCache:
+    """
+    Caches telegram_id -> user lookups in an in-process LRU+TTL tier,
+    optionally backed by a shared Redis tier for multi-worker deployments.
+    """
+
+    NAME = "users"
+
+    def __init__(self, enabled: bool, maxsize: int, ttl: int, redis: Optional[Redis] = None):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.local = TTLCache(maxsize, ttl)
+        self.redis = redis
+        self.redis_hits = 0
+        invalidation_bus.register(self.NAME, self.local)
+
+    @staticmethod
+    def _key(telegram_id: int) -> str:
+        return f"user:tg:{telegram_id}"
+
+    async def get(self, telegram_id: int) -> Optional[User]:
+        """ Returns a detached copy of the cached user, or None on a miss. """
+        if not self.enabled:
+            return None
+        data = self.local.get(telegram_id)
+        if data is None and self.redis is not None:
+            raw = await self.redis.get(self._key(telegram_id))
+            if raw is not None:
+                self.redis_hits += 1
+                data = json.loads(raw)
+                self.local.set(telegram_id, data)
+        return User(**data) if data is not None else None
+
+    async def set(self, user: User):
+        if not self.enabled:
+            return
+        data = {"id": user.id, "telegram_id": user.telegram_id, "username": user.username}
+        self.local.set(user.telegram_id, data)
+        if self.redis is not None:
+            await self.redis.set(self._key(user.telegram_id), json.dumps(data), ex=self.ttl)
+
+    async def invalidate(self, telegram_id: int):
+        """ Forgets a user everywhere; call it whenever a user row is created or changed. """
+        if self.redis is not None:
+            await self.redis.delete(self._key(telegram_id))
+        await invalidation_bus.invalidate(self.NAME, telegram_id)
+
+    def stats(self) -> dict:
+        return {**self.local.stats(), "redis_hits": self.redis_hits, "enabled": self.enabled}
+
+
+# Global instance of the UserCache
+user_cache = UserCache(
+    enabled=settings.USER_CACHE_ENABLED,
+    maxsize=settings.USER_CACHE_SIZE,
+    ttl=settings.USER_CACHE_TTL,
+    redis=get_redis() if settings.STATE_BACKEND == "redis" else None,
+)
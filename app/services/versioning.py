@@ -0,0 +1,109 @@
+import time
+import uuid
+import zlib
+from typing import Dict, Optional, Tuple
+
+from redis.asyncio import Redis
+
+from app.core.config import settings
+from app.core.redis import get_redis
+
+
+def room_key(room_id: int) -> str:
+    """ Version of a room: its items, name and members. """
+    return f"room:{room_id}"
+
+
+def user_rooms_key(user_id: int) -> str:
+    """ Version of the list of rooms a user belongs to. """
+    return f"user_rooms:{user_id}"
+
+
+class VersionStore:
+    """
+    Change counters bumped by every mutation and used as ETags for list reads.
+    The epoch changes whenever the counters are reset, so old ETags never match new versions.
+    """
+
+    async def read(self, key: str) -> Tuple[str, int]:
+        """ Returns the current epoch and the version of a key. """
+        raise NotImplementedError
+
+    async def bump(self, *keys: str):
+        raise NotImplementedError
+
+    async def changed_recently(self, *keys: str) -> bool:
+        """ Tells whether any of the keys was bumped within the read-your-writes window. """
+        raise NotImplementedError
+
+    async def etag(self, key: str, *params) -> str:
+        """ Builds a weak ETag from the key's version and the query parameters of the read. """
+        epoch, version = await self.read(key)
+        variant = zlib.crc32(repr(params).encode())
+        return f'W/"{epoch}.{version}.{variant:x}"'
+
+
+class InMemoryVersionStore(VersionStore):
+    """ Counters of the current process, for single-worker deployments. """
+
+    def __init__(self, window: float):
+        self._epoch = uuid.uuid4().hex[:8]
+        self.window = window
+        self.versions: Dict[str, int] = {}
+        self.changed_at: Dict[str, float] = {}
+
+    async def read(self, key: str) -> Tuple[str, int]:
+        return self._epoch, self.versions.get(key, 0)
+
+    async def bump(self, *keys: str):
+        now = time.monotonic()
+        for key in keys:
+            self.versions[key] = self.versions.get(key, 0) + 1
+            self.changed_at[key] = now
+
+    async def changed_recently(self, *keys: str) -> bool:
+        now = time.monotonic()
+        return any(now - self.changed_at.get(key, float("-inf")) < self.window for key in keys)
+
+
+class RedisVersionStore(VersionStore):
+    """ Counters shared by all workers through Redis. """
+
+    EPOCH_KEY = "versions:epoch"
+
+    def __init__(self, redis: Redis, window: float):
+        self.redis = redis
+        self.window_ms = int(window * 1000)
+
+    async def read(self, key: str) -> Tuple[str, int]:
+        epoch, version = await self.redis.mget(self.EPOCH_KEY, f"version:{key}")
+        if epoch is None:
+            # First use, or Redis lost its data: start a new epoch
+            await self.redis.set(self.EPOCH_KEY, uuid.uuid4().hex[:8], nx=True)
+            epoch = await self.redis.get(self.EPOCH_KEY)
+        return epoch, int(version or 0)
+
+    async def bump(self, *keys: str):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.incr(f"version:{key}")
+                pipe.set(f"changed:{key}", 1, px=self.window_ms)
+            await pipe.execute()
+
+    async def changed_recently(self, *keys: str) -> bool:
+        return await self.redis.exists(*(f"changed:{key}" for key in keys)) > 0
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """ Checks an If-None-Match header against an ETag (weak comparison). """
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or etag[2:] in candidates
+
+
+# Global instance of the VersionStore
+room_versions: VersionStore = (
+    RedisVersionStore(get_redis(), settings.READ_YOUR_WRITES_WINDOW) if settings.STATE_BACKEND == "redis"
+    else InMemoryVersionStore(settings.READ_YOUR_WRITES_WINDOW)
+)
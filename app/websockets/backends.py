@@ -0,0 +1,279 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from redis.asyncio import Redis
+
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Callback used by a backend to hand a sequenced room event to the local WebSocket manager
+Deliver = Callable[[int, int, str], Awaitable[None]]
+
+# Result of a replay: the room's latest sequence and the missed events, or None if they are gone
+Replay = Tuple[int, Optional[List[Tuple[int, str]]]]
+
+
+def stamp(seq: int, payload: str) -> str:
+    """ Adds the sequence number to a serialized JSON object without re-encoding it. """
+    return f'{{"seq":{seq},{payload[1:]}' if payload != "{}" else f'{{"seq":{seq}}}'
+
+
+def select_missed(last_seq: int, events: List[Tuple[int, str]], since: int) -> Replay:
+    """ Picks the events after `since`, or None when the buffer no longer covers the gap. """
+    if since > last_seq:
+        return last_seq, None  # The client is ahead of us, e.g. the sequence was reset
+    if since < last_seq and (not events or events[0][0] > since + 1):
+        return last_seq, None
+    return last_seq, [(seq, event) for seq, event in events if seq > since]
+
+
+class BroadcastBackend:
+    """
+    Transport that sequences room events and fans them out to every WebSocket manager.
+    A room's sequence and buffer are forgotten `retention` seconds after its last event unless someone
+    is connected to it; clients resuming from an older sequence are then asked to resync.
+    """
+
+    def __init__(self, buffer_size: int = 200, retention: int = 86400):
+        self.buffer_size = buffer_size
+        self.retention = retention
+        self._deliver: Optional[Deliver] = None
+
+    def attach(self, deliver: Deliver):
+        """ Registers the callback that delivers events to local connections. """
+        self._deliver = deliver
+
+    async def subscribe(self, room_id: int):
+        """ Called when the first local connection joins a room. """
+
+    async def unsubscribe(self, room_id: int):
+        """ Called when the last local connection leaves a room. """
+
+    async def subscribe_all(self):
+        """ Starts delivering the events of every room, not only of rooms with local connections. """
+
+    async def publish(self, room_id: int, payload: str) -> int:
+        """ Stamps the next sequence number on a JSON payload, buffers and broadcasts it. """
+        raise NotImplementedError
+
+    async def replay(self, room_id: int, since: int) -> Replay:
+        """ Returns the buffered events of a room with a sequence greater than `since`. """
+        raise NotImplementedError
+
+    async def last_seq(self, room_id: int) -> int:
+        """ Returns the sequence of the latest event published to a room, 0 if there was none. """
+        raise NotImplementedError
+
+    async def stop(self):
+        """ Releases any resources held by the backend. """
+
+
+class RoomLog:
+    """ Sequence counter and bounded ring buffer of recent events for one room. """
+
+    def __init__(self, buffer_size: int):
+        self.seq = 0
+        self.events: Deque[Tuple[int, str]] = deque(maxlen=buffer_size)
+        self.published = time.monotonic()
+
+
+class InMemoryBackend(BroadcastBackend):
+    """ Delivers events only to connections of the current process. """
+
+    def __init__(self, buffer_size: int = 200, retention: int = 86400):
+        super().__init__(buffer_size, retention)
+        self.logs: Dict[int, RoomLog] = {}
+        self._rooms: Set[int] = set()  # Rooms with local connections, their logs are never evicted
+        self._next_sweep = time.monotonic() + retention
+
+    async def subscribe(self, room_id: int):
+        self._rooms.add(room_id)
+
+    async def unsubscribe(self, room_id: int):
+        self._rooms.discard(room_id)
+
+    def _evict_idle(self, now: float):
+        """ Forgets the logs of rooms without events or connections for `retention` seconds, e.g. deleted rooms. """
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.retention / 10
+        for room_id in [room_id for room_id, log in self.logs.items()
+                        if now - log.published > self.retention and room_id not in self._rooms]:
+            del self.logs[room_id]
+
+    async def publish(self, room_id: int, payload: str) -> int:
+        now = time.monotonic()
+        self._evict_idle(now)
+        log = self.logs.get(room_id)
+        if log is None:
+            log = self.logs[room_id] = RoomLog(self.buffer_size)
+        log.published = now
+        log.seq += 1
+        event = stamp(log.seq, payload)
+        log.events.append((log.seq, event))
+        if self._deliver is not None:
+            await self._deliver(room_id, log.seq, event)
+        return log.seq
+
+    async def replay(self, room_id: int, since: int) -> Replay:
+        log = self.logs.get(room_id)
+        if log is None:
+            return select_missed(0, [], since)
+        return select_missed(log.seq, list(log.events), since)
+
+    async def last_seq(self, room_id: int) -> int:
+        log = self.logs.get(room_id)
+        return log.seq if log is not None else 0
+
+
+class RedisBackend(BroadcastBackend):
+    """
+    Fans events out through Redis pub/sub, one channel per room with local listeners.
+    Sequence numbers and the replay buffer live in Redis so they are shared by all workers.
+    """
+
+    # Atomically takes the next sequence, stamps the payload, buffers it and publishes it.
+    # Buffered and published entries are encoded as "<seq>:<event>". Both keys expire after the retention.
+    PUBLISH_SCRIPT = """
+    local seq = redis.call('INCR', KEYS[1])
+    local payload = ARGV[1]
+    local event
+    if payload == '{}' then
+        event = '{"seq":' .. seq .. '}'
+    else
+        event = '{"seq":' .. seq .. ',' .. string.sub(payload, 2)
+    end
+    local entry = seq .. ':' .. event
+    redis.call('RPUSH', KEYS[2], entry)
+    redis.call('LTRIM', KEYS[2], -tonumber(ARGV[2]), -1)
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    redis.call('PUBLISH', KEYS[3], entry)
+    return seq
+    """
+
+    def __init__(self, redis: Redis, buffer_size: int = 200, retention: int = 86400, channel_prefix: str = "room:"):
+        super().__init__(buffer_size, retention)
+        self.redis = redis
+        self.channel_prefix = channel_prefix
+        self._publish = redis.register_script(self.PUBLISH_SCRIPT)
+        self._pubsub = redis.pubsub(ignore_subscribe_messages=True)
+        self._listener: Optional[asyncio.Task] = None
+        self._all_rooms = False
+        self._rooms: Set[int] = set()  # Rooms with local connections, their keys are kept from expiring
+
+    def _channel(self, room_id: int) -> str:
+        return f"{self.channel_prefix}{room_id}"
+
+    def _keys(self, room_id: int) -> List[str]:
+        channel = self._channel(room_id)
+        return [f"{channel}:seq", f"{channel}:log", channel]
+
+    async def subscribe(self, room_id: int):
+        self._rooms.add(room_id)
+        await self._keep_alive([room_id])
+        if self._all_rooms:
+            return  # Already covered by the pattern subscription
+        await self._pubsub.subscribe(self._channel(room_id))
+        # The pub/sub connection only exists after the first subscription
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def unsubscribe(self, room_id: int):
+        self._rooms.discard(room_id)
+        if not self._all_rooms:
+            await self._pubsub.unsubscribe(self._channel(room_id))
+
+    async def subscribe_all(self):
+        if self._all_rooms:
+            return
+        self._all_rooms = True
+        await self._pubsub.psubscribe(f"{self.channel_prefix}*")
+        # Per-room subscriptions would deliver every event twice
+        await self._pubsub.unsubscribe()
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def publish(self, room_id: int, payload: str) -> int:
+        return int(await self._publish(keys=self._keys(room_id), args=[payload, self.buffer_size, self.retention]))
+
+    async def _keep_alive(self, room_ids):
+        """ Restarts the expiry of rooms with local connections, whose clients rely on their sequence. """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for room_id in room_ids:
+                seq_key, log_key, _ = self._keys(room_id)
+                pipe.expire(seq_key, self.retention)
+                pipe.expire(log_key, self.retention)
+            await pipe.execute()
+
+    async def replay(self, room_id: int, since: int) -> Replay:
+        seq_key, log_key, _ = self._keys(room_id)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.get(seq_key)
+            pipe.lrange(log_key, 0, -1)
+            last_seq, entries = await pipe.execute()
+        events = []
+        for entry in entries:
+            seq, _, event = entry.partition(":")
+            events.append((int(seq), event))
+        return select_missed(int(last_seq or 0), events, since)
+
+    async def last_seq(self, room_id: int) -> int:
+        seq_key, _, _ = self._keys(room_id)
+        return int(await self.redis.get(seq_key) or 0)
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self._pubsub.aclose()
+
+    async def _listen(self):
+        """ Reads room events from Redis and hands them to the local manager. """
+        loop = asyncio.get_running_loop()
+        next_keep_alive = loop.time() + self.retention / 4
+        while True:
+            try:
+                if loop.time() >= next_keep_alive:
+                    next_keep_alive = loop.time() + self.retention / 4
+                    await self._keep_alive(list(self._rooms))
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Redis pub/sub read failed, retrying")
+                await asyncio.sleep(1.0)
+                continue
+
+            if message is None or message["type"] not in ("message", "pmessage"):
+                continue
+
+            # Anything else published under the prefix is skipped; one bad message must not stop the listener
+            try:
+                room_id = int(message["channel"][len(self.channel_prefix):])
+                seq, _, event = message["data"].partition(":")
+                seq = int(seq)
+            except (TypeError, ValueError):
+                logger.warning(f"Skipped a malformed message on channel {message['channel']}")
+                continue
+            try:
+                await self._deliver(room_id, seq, event)
+            except Exception:
+                logger.exception(f"Failed to deliver event to room {room_id}")
+
+
+def create_backend(name: str, buffer_size: int = 200, retention: int = 86400) -> BroadcastBackend:
+    """ Builds the broadcast backend selected by settings.STATE_BACKEND. """
+    if name == "redis":
+        return RedisBackend(get_redis(), buffer_size, retention)
+    if name == "memory":
+        return InMemoryBackend(buffer_size, retention)
+    raise ValueError(f"Unknown broadcast backend: {name}")
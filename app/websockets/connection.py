@@ -0,0 +1,82 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# What to do when a client's outbound queue is full
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+# Close code sent to evicted slow consumers ("Try Again Later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class ClientConnection:
+    """ A WebSocket with its own bounded outbound queue drained by a dedicated writer task. """
+
+    def __init__(self, websocket: WebSocket, queue_size: int, overflow_policy: str = DISCONNECT):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.overflow_policy = overflow_policy
+        self.dropped = 0
+        self.last_seq = 0  # Highest event sequence queued for this client
+        self._held: Optional[List[Tuple[int, str]]] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        """ Starts the writer task that sends queued messages to the socket. """
+        self._writer = asyncio.create_task(self._write_loop())
+
+    def hold(self):
+        """ Holds live events back while the missed ones are being replayed. """
+        self._held = []
+
+    def resume(self, replayed: List[Tuple[int, str]]) -> bool:
+        """ Queues replayed events followed by the live events held in the meantime. """
+        held, self._held = self._held or [], None
+        return all(self.enqueue(event, seq) for seq, event in replayed + held)
+
+    def enqueue(self, message: str, seq: Optional[int] = None) -> bool:
+        """
+        Queues a message without waiting on the network, skipping events the client already has.
+        Returns False when the client overflowed and has to be disconnected.
+        """
+        if seq is not None:
+            if self._held is not None:
+                self._held.append((seq, message))
+                return True
+            if seq <= self.last_seq:
+                return True
+            self.last_seq = seq
+        try:
+            self.queue.put_nowait(message)
+            return True
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.overflow_policy == DROP_OLDEST:
+                self.queue.get_nowait()
+                self.queue.put_nowait(message)
+                return True
+            return False
+
+    async def close(self, code: int = 1000, timeout: float = 5.0):
+        """ Stops the writer and closes the socket, giving up after the timeout. """
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        try:
+            await asyncio.wait_for(self.websocket.close(code=code), timeout)
+        except Exception:
+            pass  # The client is already gone or too slow to acknowledge the close
+
+    async def _write_loop(self):
+        while True:
+            message = await self.queue.get()
+            try:
+                await self.websocket.send_text(message)
+            except Exception as e:
+                logger.info(f"Stopping writer for a closed WebSocket: {e}")
+                return
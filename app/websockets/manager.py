@@ -1,31 +1,110 @@
-from typing import Dict, List
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional
 from fastapi import WebSocket
 
+from app.core.config import settings
+from app.websockets.backends import BroadcastBackend, InMemoryBackend, create_backend
+from app.websockets.connection import ClientConnection, SLOW_CONSUMER_CLOSE_CODE
+
+logger = logging.getLogger(__name__)
+
+# Callback receiving every room event seen by this process: (room_id, seq, serialized event)
+Listener = Callable[[int, int, str], Awaitable[None]]
+
 class WebSocketManager:
     """ Manages WebSocket connections for real-time updates in rooms. """
 
-    def __init__(self):
-        self.active_connections: Dict[int, List[WebSocket]] = {}  # room_id -> list of WebSocket connections
+    def __init__(self, backend: Optional[BroadcastBackend] = None, queue_size: int = 100,
+                 overflow_policy: str = "disconnect", close_timeout: float = 5.0):
+        self.active_connections: Dict[int, Dict[WebSocket, ClientConnection]] = {}  # room_id -> connections
+        self.backend = backend or InMemoryBackend()
+        self.backend.attach(self._deliver)
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.close_timeout = close_timeout
+        self._evictions = set()  # Keeps references to running eviction tasks
+        self.listeners: List[Listener] = []
 
-    async def connect(self, room_id: int, websocket: WebSocket):
-        """ Accepts a new WebSocket connection and adds it to the room. """
+    async def connect(self, room_id: int, websocket: WebSocket, since: Optional[int] = None):
+        """
+        Accepts a new WebSocket connection and adds it to the room; the caller checks that it may read the room.
+        If `since` is given, the events the client missed after that sequence are sent first,
+        or a "resync_required" message when they are no longer buffered.
+        """
         await websocket.accept()
         if room_id not in self.active_connections:
-            self.active_connections[room_id] = []
-        self.active_connections[room_id].append(websocket)
+            self.active_connections[room_id] = {}
+            await self.backend.subscribe(room_id)  # First local listener in this room
+        connection = ClientConnection(websocket, self.queue_size, self.overflow_policy)
+        if since is not None:
+            connection.hold()  # Live events are queued after the replayed ones
+        self.active_connections[room_id][websocket] = connection
+        connection.start()
 
-    def disconnect(self, room_id: int, websocket: WebSocket):
+        if since is not None:
+            last_seq, missed = await self.backend.replay(room_id, since)
+            if missed is None or len(missed) > self.queue_size:
+                connection.last_seq = last_seq
+                connection.enqueue(json.dumps({"type": "resync_required", "room_id": room_id, "seq": last_seq}))
+                missed = []
+            if not connection.resume(missed):
+                await self.disconnect(room_id, websocket, code=SLOW_CONSUMER_CLOSE_CODE)
+
+    async def disconnect(self, room_id: int, websocket: WebSocket, code: int = 1000):
         """ Removes a WebSocket connection when a user disconnects. """
-        if room_id in self.active_connections:
-            self.active_connections[room_id].remove(websocket)
-            if not self.active_connections[room_id]:
-                del self.active_connections[room_id]  # Remove room if no active connections
+        connections = self.active_connections.get(room_id)
+        if connections is None:
+            return
+        connection = connections.pop(websocket, None)
+        if not connections:
+            del self.active_connections[room_id]  # Remove room if no active connections
+            await self.backend.unsubscribe(room_id)
+        if connection is not None:
+            await connection.close(code=code, timeout=self.close_timeout)
+
+    async def add_listener(self, listener: Listener):
+        """ Registers an in-process consumer of the events of every room, e.g. the bot's live lists. """
+        self.listeners.append(listener)
+        await self.backend.subscribe_all()
+
+    def remove_listener(self, listener: Listener):
+        self.listeners.remove(listener)
+
+    async def publish(self, room_id: int, payload: str) -> int:
+        """ Publishes a serialized event, read back from the outbox, to all clients of its room on every worker. """
+        return await self.backend.publish(room_id, payload)
+
+    async def last_seq(self, room_id: int) -> int:
+        """ Returns the room's latest event sequence; connecting with since=<it> misses nothing after it. """
+        return await self.backend.last_seq(room_id)
+
+    async def shutdown(self):
+        """ Closes local connections and stops the broadcast backend. """
+        for room_id in list(self.active_connections):
+            for websocket in list(self.active_connections.get(room_id, {})):
+                await self.disconnect(room_id, websocket, code=1001)
+        await self.backend.stop()
 
-    async def send_message(self, room_id: int, message: str):
-        """ Sends a well-formatted message to all connected clients in a room. """
-        if room_id in self.active_connections:
-            for connection in self.active_connections[room_id]:
-                await connection.send_text(message)
+    async def _deliver(self, room_id: int, seq: int, event: str):
+        """ Queues an event for every client of a room connected to this worker. """
+        for listener in self.listeners:
+            try:
+                await listener(room_id, seq, event)
+            except Exception:
+                logger.exception(f"Room event listener failed for room {room_id}")
+        for websocket, connection in list(self.active_connections.get(room_id, {}).items()):
+            if not connection.enqueue(event, seq):
+                logger.warning(f"Evicting slow WebSocket consumer in room {room_id}")
+                task = asyncio.create_task(self.disconnect(room_id, websocket, code=SLOW_CONSUMER_CLOSE_CODE))
+                self._evictions.add(task)
+                task.add_done_callback(self._evictions.discard)
 
 # Global instance of the WebSocketManager
-websocket_manager = WebSocketManager()
+websocket_manager = WebSocketManager(
+    create_backend(settings.STATE_BACKEND, settings.WS_REPLAY_BUFFER_SIZE, settings.WS_REPLAY_RETENTION),
+    queue_size=settings.WS_SEND_QUEUE_SIZE,
+    overflow_policy=settings.WS_OVERFLOW_POLICY,
+    close_timeout=settings.WS_CLOSE_TIMEOUT,
+)
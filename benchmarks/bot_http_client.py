@@ -0,0 +1,79 @@
+"""
+Latency of bot API calls against a local stand-in API, with one AsyncClient per call
+(the bot's previous behaviour: a new TCP connection per button press) and with the shared pooled HttpApi.
+
+    python -m benchmarks.bot_http_client [calls] [concurrency]
+"""
+import asyncio
+import socket
+import statistics
+import sys
+import time
+
+import httpx
+import uvicorn
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.bot.api import HttpApi
+
+
+async def list_rooms(request):
+    return JSONResponse({"rooms": [], "next_cursor": None})
+
+
+stand_in = Starlette(routes=[Route("/rooms/", list_rooms)])
+
+
+async def per_call_client(base_url: str, telegram_id: int):
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        response = await client.get("/rooms/", headers={"telegram-id": str(telegram_id)})
+        return response.json()
+
+
+async def measure(call, calls: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(n: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await call(n)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(calls)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return calls / elapsed, statistics.median(latencies), latencies[int(len(latencies) * 0.99)]
+
+
+async def main(calls: int, concurrency: int):
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server = uvicorn.Server(uvicorn.Config(stand_in, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    base_url = f"http://127.0.0.1:{port}"
+
+    api = HttpApi(base_url)
+    print(f"{calls} calls, {concurrency} concurrent")
+    print(f"{'client':>10} {'calls/s':>10} {'p50':>10} {'p99':>10}")
+    for name, call in (
+        ("per call", lambda n: per_call_client(base_url, n)),
+        ("pooled", lambda n: api.list_rooms(n)),
+    ):
+        throughput, p50, p99 = await measure(call, calls, concurrency)
+        print(f"{name:>10} {throughput:>10.0f} {p50 * 1000:>8.3f}ms {p99 * 1000:>8.3f}ms")
+
+    await api.close()
+    server.should_exit = True
+    await serving
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [2000, 20][len(args):])))
@@ -0,0 +1,59 @@
+"""
+Update processing throughput and latency with one chat sending a burst while many others send a message each.
+
+Every handler waits HANDLER_TIME, as a handler waiting on the database and the Bot API would.
+Compares handling updates one at a time with PerChatUpdateProcessor; latency is measured
+from the moment an update is handed to the processor until its handler finishes.
+
+    python -m benchmarks.bot_updates [concurrency]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from telegram.ext import SimpleUpdateProcessor
+
+from app.bot.updates import PerChatUpdateProcessor
+from tests.factories import make_update
+
+HANDLER_TIME = 0.02
+HOT_CHAT_UPDATES = 200
+OTHER_CHATS = 400
+
+
+def percentile(samples, share):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * share))]
+
+
+async def run(processor):
+    latencies = {"hot chat": [], "other chats": []}
+
+    async def handle(kind, received):
+        await asyncio.sleep(HANDLER_TIME)
+        latencies[kind].append(time.perf_counter() - received)
+
+    # The burst arrives first, every other chat's update arrives right behind it
+    updates = [(make_update(n, 1), "hot chat") for n in range(HOT_CHAT_UPDATES)]
+    updates += [(make_update(HOT_CHAT_UPDATES + n, 1000 + n), "other chats") for n in range(OTHER_CHATS)]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(processor.process_update(update, handle(kind, time.perf_counter()))
+                           for update, kind in updates))
+    elapsed = time.perf_counter() - started
+
+    print(f"{type(processor).__name__}({processor.max_concurrent_updates}): "
+          f"{len(updates) / elapsed:.0f} updates/s")
+    for kind, samples in latencies.items():
+        print(f"  {kind:<12} p50 {statistics.median(samples) * 1000:8.1f} ms"
+              f"  p99 {percentile(samples, 0.99) * 1000:8.1f} ms")
+
+
+async def main(concurrency: int):
+    await run(SimpleUpdateProcessor(1))
+    await run(PerChatUpdateProcessor(concurrency))
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 64))
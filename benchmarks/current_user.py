@@ -0,0 +1,50 @@
+"""
+Micro-benchmark of the get_current_user dependency under concurrent load, with and without the user cache.
+Needs the database of the POSTGRES_* settings, migrated to head.
+
+    DB_PROFILE=bench python -m benchmarks.current_user [calls] [concurrency]
+"""
+import asyncio
+import statistics
+import sys
+import time
+
+from app.core.database import async_session, engine
+from app.core.dependencies import get_current_user
+from app.services.user_cache import user_cache
+from tests.factories import create_user
+
+
+async def run(telegram_ids, calls: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def call(n: int):
+        async with semaphore:
+            started = time.perf_counter()
+            async with async_session() as db:
+                await get_current_user(telegram_ids[n % len(telegram_ids)], db)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(call(n) for n in range(calls)))
+    return calls / (time.perf_counter() - started), latencies
+
+
+async def main(calls: int, concurrency: int):
+    telegram_ids = [(await create_user()).telegram_id for _ in range(100)]
+    print(f"{calls} calls, {concurrency} concurrent, {len(telegram_ids)} users")
+    print(f"{'cache':>8} {'calls/s':>10} {'p50':>10} {'p99':>10}")
+    for enabled in (False, True):
+        user_cache.enabled = enabled
+        user_cache.local.clear()
+        throughput, latencies = await run(telegram_ids, calls, concurrency)
+        latencies.sort()
+        print(f"{'on' if enabled else 'off':>8} {throughput:>10.0f} "
+              f"{statistics.median(latencies) * 1000:>8.3f}ms {latencies[int(len(latencies) * 0.99)] * 1000:>8.3f}ms")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [10_000, 50][len(args):])))
@@ -0,0 +1,60 @@
+"""
+Broadcast latency for rooms of 1, 100 and 1000 sockets, 5% of which are slow clients.
+
+Measures how long `publish` takes to return (the time a request handler would wait)
+and how long until every fast client has received the event.
+
+    python -m benchmarks.ws_broadcast
+"""
+import asyncio
+import statistics
+import time
+
+from app.websockets.backends import InMemoryBackend
+from app.websockets.manager import WebSocketManager
+from tests.fakes import FakeWebSocket
+
+EVENTS = 50
+SLOW_SHARE = 0.05
+SLOW_DELAY = 0.5  # Seconds a slow client takes to receive one message
+
+
+def percentile(samples, share):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * share))]
+
+
+async def run(sockets: int):
+    manager = WebSocketManager(InMemoryBackend(), queue_size=EVENTS * 2)
+    slow_count = int(sockets * SLOW_SHARE)
+    clients = [FakeWebSocket(delay=SLOW_DELAY if i < slow_count else 0) for i in range(sockets)]
+    fast = clients[slow_count:]
+    for client in clients:
+        await manager.connect(1, client)
+
+    publish_times, delivery_times = [], []
+    for n in range(1, EVENTS + 1):
+        started = time.perf_counter()
+        await manager.publish(1, '{"type":"item_added"}')
+        publish_times.append(time.perf_counter() - started)
+        while any(len(client.sent) < n for client in fast):
+            await asyncio.sleep(0)
+        delivery_times.append(time.perf_counter() - started)
+
+    await manager.shutdown()
+    return publish_times, delivery_times
+
+
+async def main():
+    print(f"{'sockets':>8} {'slow':>5} {'publish p50':>12} {'publish p99':>12} {'delivery p50':>13} {'delivery p99':>13}")
+    for sockets in (1, 100, 1000):
+        publish_times, delivery_times = await run(sockets)
+        print(
+            f"{sockets:>8} {int(sockets * SLOW_SHARE):>5} "
+            f"{statistics.median(publish_times) * 1000:>10.3f}ms {percentile(publish_times, 0.99) * 1000:>10.3f}ms "
+            f"{statistics.median(delivery_times) * 1000:>11.3f}ms {percentile(delivery_times, 0.99) * 1000:>11.3f}ms"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
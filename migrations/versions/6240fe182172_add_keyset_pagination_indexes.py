@@ -0,0 +1,31 @@
+"""Add keyset pagination indexes
+
+Revision ID: 6240fe182172
+Revises: d49768b628ca
+Create Date: 2026-10-18 17:20:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6240fe182172'
+down_revision: Union[str, None] = 'd49768b628ca'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Rows must have a created_at to take part in (created_at, id) keyset ordering
+    op.execute("UPDATE shopping_items SET created_at = now() WHERE created_at IS NULL")
+    op.execute("UPDATE rooms SET created_at = now() WHERE created_at IS NULL")
+    op.create_index('ix_shopping_items_room_id_created_at_id', 'shopping_items', ['room_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_rooms_created_at_id', 'rooms', ['created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_rooms_created_at_id', table_name='rooms')
+    op.drop_index('ix_shopping_items_room_id_created_at_id', table_name='shopping_items')
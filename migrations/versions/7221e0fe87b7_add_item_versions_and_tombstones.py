@@ -0,0 +1,38 @@
+"""Add item versions and tombstones
+
+Revision ID: 7221e0fe87b7
+Revises: 6240fe182172
+Create Date: 2026-10-18 17:31:02.551870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7221e0fe87b7'
+down_revision: Union[str, None] = '6240fe182172'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('shopping_items', sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False))
+    op.add_column('shopping_items', sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('shopping_items', sa.Column('version', sa.BigInteger(), server_default=sa.text('(pg_current_xact_id()::text::bigint)'), nullable=False))
+    op.add_column('rooms', sa.Column('purged_version', sa.BigInteger(), server_default='0', nullable=False))
+    op.create_index('ix_shopping_items_room_id_version_id', 'shopping_items', ['room_id', 'version', 'id'], unique=False)
+    op.create_index('ix_shopping_items_deleted_at', 'shopping_items', ['deleted_at'], unique=False, postgresql_where=sa.text('deleted_at IS NOT NULL'))
+
+
+def downgrade() -> None:
+    # Tombstones are not items anymore once the columns are gone
+    op.execute("DELETE FROM shopping_items WHERE deleted_at IS NOT NULL")
+    op.drop_index('ix_shopping_items_deleted_at', table_name='shopping_items', postgresql_where=sa.text('deleted_at IS NOT NULL'))
+    op.drop_index('ix_shopping_items_room_id_version_id', table_name='shopping_items')
+    op.drop_column('rooms', 'purged_version')
+    op.drop_column('shopping_items', 'version')
+    op.drop_column('shopping_items', 'deleted_at')
+    op.drop_column('shopping_items', 'updated_at')
@@ -0,0 +1,39 @@
+"""Add outbox events
+
+Revision ID: 8c0f5b1d2e94
+Revises: 7221e0fe87b7
+Create Date: 2026-10-18 18:02:14.905311
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8c0f5b1d2e94'
+down_revision: Union[str, None] = '7221e0fe87b7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('outbox_events',
+    sa.Column('id', sa.BigInteger(), nullable=False),
+    sa.Column('room_id', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('available_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('delivered_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_outbox_events_pending', 'outbox_events', ['id'], unique=False, postgresql_where=sa.text('delivered_at IS NULL'))
+    op.create_index('ix_outbox_events_delivered_at', 'outbox_events', ['delivered_at'], unique=False, postgresql_where=sa.text('delivered_at IS NOT NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_events_delivered_at', table_name='outbox_events', postgresql_where=sa.text('delivered_at IS NOT NULL'))
+    op.drop_index('ix_outbox_events_pending', table_name='outbox_events', postgresql_where=sa.text('delivered_at IS NULL'))
+    op.drop_table('outbox_events')
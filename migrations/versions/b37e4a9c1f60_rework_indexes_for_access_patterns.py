@@ -0,0 +1,54 @@
+"""Rework indexes for access patterns
+
+Revision ID: b37e4a9c1f60
+Revises: 8c0f5b1d2e94
+Create Date: 2026-10-18 19:05:37.214530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b37e4a9c1f60'
+down_revision: Union[str, None] = '8c0f5b1d2e94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Membership lookups by user: membership checks of every item write and the room listing
+    op.create_index('ix_room_users_user_id_room_id', 'room_users', ['user_id', 'room_id'], unique=False)
+    # List reads skip tombstones, so the pagination index leaves them out
+    op.create_index('ix_shopping_items_live_room_id_created_at_id', 'shopping_items', ['room_id', 'created_at', 'id'],
+                    unique=False, postgresql_where=sa.text('deleted_at IS NULL'))
+    op.drop_index('ix_shopping_items_room_id_created_at_id', table_name='shopping_items')
+
+    # Duplicates of the primary keys
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_index('ix_rooms_id', table_name='rooms')
+    op.drop_index('ix_shopping_items_id', table_name='shopping_items')
+    op.drop_index('ix_room_users_id', table_name='room_users')
+    # Columns no query filters or sorts by
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_index('ix_rooms_name', table_name='rooms')
+    op.drop_index('ix_shopping_items_name', table_name='shopping_items')
+    op.drop_index('ix_shopping_items_category', table_name='shopping_items')
+
+
+def downgrade() -> None:
+    op.create_index('ix_shopping_items_category', 'shopping_items', ['category'], unique=False)
+    op.create_index('ix_shopping_items_name', 'shopping_items', ['name'], unique=False)
+    op.create_index('ix_rooms_name', 'rooms', ['name'], unique=False)
+    op.create_index('ix_users_username', 'users', ['username'], unique=False)
+    op.create_index('ix_room_users_id', 'room_users', ['id'], unique=False)
+    op.create_index('ix_shopping_items_id', 'shopping_items', ['id'], unique=False)
+    op.create_index('ix_rooms_id', 'rooms', ['id'], unique=False)
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+
+    op.create_index('ix_shopping_items_room_id_created_at_id', 'shopping_items', ['room_id', 'created_at', 'id'], unique=False)
+    op.drop_index('ix_shopping_items_live_room_id_created_at_id', table_name='shopping_items',
+                  postgresql_where=sa.text('deleted_at IS NULL'))
+    op.drop_index('ix_room_users_user_id_room_id', table_name='room_users')
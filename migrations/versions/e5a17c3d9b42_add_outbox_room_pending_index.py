@@ -0,0 +1,26 @@
+"""Add outbox room pending index
+
+Revision ID: e5a17c3d9b42
+Revises: b37e4a9c1f60
+Create Date: 2026-10-18 21:14:52.630184
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a17c3d9b42'
+down_revision: Union[str, None] = 'b37e4a9c1f60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_outbox_events_room_pending', 'outbox_events', ['room_id', 'id'], unique=False, postgresql_where=sa.text('delivered_at IS NULL'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_outbox_events_room_pending', table_name='outbox_events', postgresql_where=sa.text('delivered_at IS NULL'))
@@ -0,0 +1,77 @@
+"""
+Shared fixtures. Tests run with `python -m pytest` from the project root.
+Tests that need the database use the `db` fixture, which expects a Postgres migrated to head
+(`alembic upgrade head`) at the POSTGRES_* settings and skips the test when it is unreachable.
+"""
+import os
+from contextlib import contextmanager
+
+import pytest
+from dotenv import load_dotenv
+
+load_dotenv()
+for name, default in (("POSTGRES_USER", "postgres"), ("POSTGRES_PASSWORD", "postgres"), ("POSTGRES_DB", "shop"),
+                      ("POSTGRES_HOST", "localhost"), ("POSTGRES_PORT", "5432")):
+    os.environ.setdefault(name, default)
+os.environ.setdefault("DB_ECHO", "false")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    """ A session on the test database; the engine is disposed afterwards as every test runs in a new loop. """
+    from app.core.database import async_session, engine
+
+    try:
+        async with engine.connect():
+            pass
+    except Exception as e:
+        await engine.dispose()
+        pytest.skip(f"Postgres is not reachable: {e}")
+    async with async_session() as session:
+        yield session
+    await engine.dispose()
+
+
+@contextmanager
+def count_statements(engine):
+    """ Counts the statements sent to the database inside the block; outbox writes are left out. """
+    from sqlalchemy import event
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "outbox_events" not in statement:
+            statements.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def client():
+    """ A TestClient of the API running its lifespan; database calls from the test go through `client.portal`. """
+    from fastapi.testclient import TestClient
+    from sqlalchemy import text
+
+    from app.core.database import async_session, engine
+    from app.main import app
+
+    async def ping():
+        async with async_session() as session:
+            await session.execute(text("SELECT 1"))
+
+    with TestClient(app) as test_client:
+        try:
+            test_client.portal.call(ping)
+        except Exception as e:
+            pytest.skip(f"Postgres is not reachable: {e}")
+        yield test_client
+        test_client.portal.call(engine.dispose)  # Its connections belong to this client's event loop
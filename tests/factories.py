@@ -0,0 +1,34 @@
+import random
+from datetime import datetime, timezone
+
+from sqlalchemy.dialects.postgresql import insert
+from telegram import Chat, Message, Update, User as TelegramUser
+
+from app.core.database import async_session
+from app.models.models import User
+
+
+def new_telegram_id() -> int:
+    """ Telegram ids far above real ones, so tests never touch real users. """
+    return random.randint(1_500_000_000, 2_000_000_000)
+
+
+async def create_user(telegram_id: int = None) -> User:
+    telegram_id = telegram_id or new_telegram_id()
+    async with async_session() as db:
+        result = await db.execute(
+            insert(User)
+            .values(telegram_id=telegram_id, username=f"test{telegram_id}")
+            .on_conflict_do_update(index_elements=[User.telegram_id], set_={"username": f"test{telegram_id}"})
+            .returning(User)
+        )
+        user = result.scalar_one()
+        await db.commit()
+        return user
+
+
+def make_update(update_id: int, chat_id: int, text: str = "/list") -> Update:
+    """ A text message update from a private chat, as the bot would receive it. """
+    chat = Chat(chat_id, Chat.PRIVATE)
+    sender = TelegramUser(chat_id, "Test", is_bot=False)
+    return Update(update_id, message=Message(update_id, datetime.now(timezone.utc), chat, from_user=sender, text=text))
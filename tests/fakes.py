@@ -0,0 +1,137 @@
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Tuple
+
+from telegram.request import BaseRequest
+
+
+class FakeWebSocket:
+    """ Records what is sent to it; a slow client is emulated by blocking sends until `release()`. """
+
+    def __init__(self, slow: bool = False, delay: float = 0.0):
+        self.sent = []
+        self.accepted = False
+        self.close_code = None
+        self.delay = delay
+        self._open = asyncio.Event()
+        if not slow:
+            self._open.set()
+
+    async def accept(self):
+        self.accepted = True
+
+    async def send_text(self, message: str):
+        await self._open.wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+    def release(self):
+        self._open.set()
+
+
+class FakeBotApi(BaseRequest):
+    """
+    Answers Bot API calls in process and records every sendMessage attempt as (chat_id, text).
+    `flood[chat_id]` is how many of the chat's next sends are rejected with 429 and `retry_after`.
+    """
+
+    def __init__(self, retry_after: int = 1):
+        self.sent = []
+        self.attempts = []
+        self.flood = {}
+        self.retry_after = retry_after
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    @staticmethod
+    def _reply(result, status: int = 200) -> Tuple[int, bytes]:
+        return status, json.dumps({"ok": True, "result": result}).encode()
+
+    async def do_request(self, url, method, request_data=None, read_timeout=None, write_timeout=None,
+                         connect_timeout=None, pool_timeout=None) -> Tuple[int, bytes]:
+        endpoint = url.rsplit("/", 1)[-1]
+        parameters = request_data.parameters if request_data else {}
+        if endpoint == "getMe":
+            return self._reply({"id": 1, "is_bot": True, "first_name": "Test", "username": "test_bot"})
+        if endpoint != "sendMessage":
+            return self._reply(True)
+
+        chat_id, text = int(parameters["chat_id"]), parameters["text"]
+        self.attempts.append((chat_id, text))
+        if self.flood.get(chat_id):
+            self.flood[chat_id] -= 1
+            return 429, json.dumps({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }).encode()
+        self.sent.append((chat_id, text))
+        return self._reply({
+            "message_id": len(self.sent),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "text": text,
+        })
+
+
+class FakeChatBot:
+    """ Stands in for the Bot in code that only sends and edits messages; `errors[chat_id]` is raised on edits. """
+
+    def __init__(self):
+        self.sent = []
+        self.edits = []
+        self.errors = {}
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.sent.append((chat_id, text))
+        return SimpleNamespace(message_id=len(self.sent), chat_id=chat_id, text=text)
+
+    async def edit_message_text(self, text, chat_id, message_id, **kwargs):
+        if chat_id in self.errors:
+            raise self.errors[chat_id]
+        self.edits.append((chat_id, message_id, text))
+        return True
+
+
+class FakeItemsApi:
+    """ Serves `items[room_id]` to the bot in pages; `errors[telegram_id]` is raised for that user. """
+
+    def __init__(self):
+        self.items: Dict[int, List[dict]] = {}
+        self.errors = {}
+        self.calls = 0
+
+    async def list_items(self, telegram_id: int, room_id: int, limit: int = 50, cursor: str = None):
+        self.calls += 1
+        if telegram_id in self.errors:
+            raise self.errors[telegram_id]
+        start = int(cursor or 0)
+        items = self.items.get(room_id, [])
+        next_cursor = str(start + limit) if start + limit < len(items) else None
+        return {"items": items[start:start + limit], "next_cursor": next_cursor}
+
+
+class FakeRoomsApi:
+    """ Serves `rooms[telegram_id]` to the bot in pages and records the cursor of every request. """
+
+    def __init__(self):
+        self.rooms: Dict[int, List[dict]] = {}
+        self.cursors = []
+
+    async def list_rooms(self, telegram_id: int, limit: int = 50, cursor: str = None):
+        self.cursors.append(cursor)
+        start = int(cursor or 0)
+        rooms = self.rooms.get(telegram_id, [])
+        next_cursor = str(start + limit) if start + limit < len(rooms) else None
+        return {"rooms": rooms[start:start + limit], "next_cursor": next_cursor}
@@ -0,0 +1,43 @@
+import pytest
+
+from app.bot.api import ApiError, EmbeddedApi, create_api
+from app.core.config import settings
+from app.services.outbox import outbox_dispatcher
+from tests.factories import create_user, new_telegram_id
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize("backend, dispatching", [("memory", False), ("redis", True)])
+async def test_outbox_is_dispatched_from_the_bot_only_over_redis(monkeypatch, backend, dispatching):
+    monkeypatch.setattr(settings, "STATE_BACKEND", backend)
+    monkeypatch.setattr(outbox_dispatcher, "_run", _idle)
+    api = EmbeddedApi()
+    await api.start()
+    try:
+        assert (outbox_dispatcher._task is not None) == dispatching
+    finally:
+        await api.close()
+
+
+async def _idle():
+    pass
+
+
+def test_embedded_transport_needs_redis(monkeypatch):
+    monkeypatch.setattr(settings, "BOT_TRANSPORT", "embedded")
+    monkeypatch.setattr(settings, "STATE_BACKEND", "memory")
+    with pytest.raises(ValueError, match="STATE_BACKEND=redis"):
+        create_api()
+
+    monkeypatch.setattr(settings, "STATE_BACKEND", "redis")
+    assert isinstance(create_api(), EmbeddedApi)
+
+
+async def test_acting_user_is_resolved_like_the_api_does(db):
+    user = await create_user()
+    assert (await EmbeddedApi._user(db, user.telegram_id)).id == user.id
+
+    with pytest.raises(ApiError) as error:
+        await EmbeddedApi._user(db, new_telegram_id())
+    assert error.value.status_code == 404
@@ -0,0 +1,34 @@
+import httpx
+import pytest
+
+from app.bot.api import HttpApi
+
+pytestmark = pytest.mark.anyio
+
+
+def flaky_api(failures: int):
+    """ An HttpApi whose first `failures` requests time out after reaching the server. """
+    calls = []
+
+    def handler(request: httpx.Request):
+        calls.append(request.method)
+        if len(calls) <= failures:
+            raise httpx.ReadTimeout("response lost", request=request)
+        return httpx.Response(200, json={"ok": True})
+
+    api = HttpApi("http://api", backoff=0)
+    api.client = httpx.AsyncClient(base_url="http://api", transport=httpx.MockTransport(handler))
+    return api, calls
+
+
+async def test_reads_are_retried():
+    api, calls = flaky_api(failures=2)
+    assert await api.list_rooms(1) == {"ok": True}
+    assert calls == ["GET", "GET", "GET"]
+
+
+async def test_deletes_are_not_retried():
+    api, calls = flaky_api(failures=1)
+    with pytest.raises(httpx.ReadTimeout):
+        await api.leave_room(1, 5)
+    assert calls == ["DELETE"]
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import pytest
+from telegram.ext import ExtBot
+
+from app.bot.sender import NOTIFICATION, OutboundRateLimiter
+from tests.fakes import FakeBotApi
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def bot():
+    api = FakeBotApi()
+    limiter = OutboundRateLimiter(global_rate=100, chat_rate=20, chat_burst=1)
+    bot = ExtBot("123:TEST", request=api, get_updates_request=api, rate_limiter=limiter)
+    await bot.initialize()
+    yield bot, api, limiter
+    await bot.shutdown()
+
+
+async def test_interactive_replies_overtake_queued_notifications(bot):
+    bot, api, limiter = bot
+    notification = {"priority": NOTIFICATION}
+
+    # The first send empties the chat's bucket, so the next three wait in the chat's queue
+    await bot.send_message(1, "first", rate_limit_args=notification)
+    await asyncio.gather(
+        bot.send_message(1, "notification 1", rate_limit_args=notification),
+        bot.send_message(1, "notification 2", rate_limit_args=notification),
+        bot.send_message(1, "reply"),
+    )
+
+    assert [text for _, text in api.sent] == ["first", "reply", "notification 1", "notification 2"]
+    assert limiter.stats()["sent"] == 4
+    assert limiter.stats()["queued"] == {"interactive": 0, "notification": 0}
+
+
+async def test_retry_after_pauses_only_the_flooded_chat(bot):
+    bot, api, limiter = bot
+    api.flood[1] = 1
+
+    started = time.monotonic()
+    flooded = asyncio.create_task(bot.send_message(1, "flooded"))
+    await asyncio.sleep(0.1)
+    await asyncio.wait_for(bot.send_message(2, "other chat"), timeout=0.5)
+    await asyncio.wait_for(flooded, timeout=3)
+
+    assert time.monotonic() - started >= api.retry_after
+    assert api.attempts == [(1, "flooded"), (2, "other chat"), (1, "flooded")]
+    assert api.sent == [(2, "other chat"), (1, "flooded")]
+    assert limiter.stats()["retried"] == 1
+
+
+async def test_stats_are_logged(caplog):
+    limiter = OutboundRateLimiter(stats_interval=0.05)
+    await limiter.initialize()
+    with caplog.at_level("INFO", logger="app.bot.sender"):
+        await asyncio.sleep(0.12)
+    await limiter.shutdown()
+
+    assert "Outbound requests: {'queued': {'interactive': 0, 'notification': 0}" in caplog.text
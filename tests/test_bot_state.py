@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.bot.state import ConversationState, MemoryStateBackend, RedisStateBackend, SqliteStateBackend
+from tests.factories import make_update
+
+pytestmark = pytest.mark.anyio
+
+TTL = 60
+
+
+@pytest.fixture(params=["memory", "redis", "sqlite"])
+async def backend(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryStateBackend(TTL)
+    elif request.param == "redis":
+        fakeredis = pytest.importorskip("fakeredis")
+        backend = RedisStateBackend(fakeredis.FakeAsyncRedis(decode_responses=True), TTL)
+    else:
+        backend = SqliteStateBackend(str(tmp_path / "state.db"), TTL)
+    yield backend
+    await backend.close()
+
+
+async def test_state_round_trips(backend):
+    assert await backend.load("user:1") is None
+
+    await backend.save("user:1", {"room_id": 7, "step": "rename"})
+    assert await backend.load("user:1") == {"room_id": 7, "step": "rename"}
+
+    # An emptied state is removed rather than stored
+    await backend.save("user:1", {})
+    assert await backend.load("user:1") is None
+
+
+async def test_redis_state_expires_after_the_ttl():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    backend = RedisStateBackend(redis, TTL)
+
+    await backend.save("chat:1", {"room_id": 7})
+    assert 0 < await redis.ttl("bot:state:chat:1") <= TTL
+
+
+async def test_sqlite_state_survives_a_restart(tmp_path):
+    path = str(tmp_path / "state.db")
+    backend = SqliteStateBackend(path, TTL)
+    await backend.save("chat:1", {"room_id": 7})
+    await backend.close()
+
+    backend = SqliteStateBackend(path, TTL)
+    try:
+        assert await backend.load("chat:1") == {"room_id": 7}
+    finally:
+        await backend.close()
+
+
+class CountingBackend(MemoryStateBackend):
+    def __init__(self):
+        super().__init__(TTL)
+        self.saved = []
+
+    async def save(self, key: str, data: dict):
+        self.saved.append(key)
+        await super().save(key, data)
+
+
+async def test_conversation_state_is_loaded_and_only_changes_are_saved():
+    backend = CountingBackend()
+    state = ConversationState(backend)
+    update = make_update(1, 42)
+    await backend.save("user:42", {"step": "rename"})
+    backend.saved.clear()
+
+    context = SimpleNamespace(user_data={"stale": True}, chat_data={})
+    await state.load(update, context)
+    assert context.user_data == {"step": "rename"}
+
+    await state.save(update, context)
+    assert backend.saved == []
+
+    context.chat_data["room_id"] = 7
+    await state.save(update, context)
+    assert backend.saved == ["chat:42"]
+
+    # Another replica picks the conversation up from the backend
+    other = SimpleNamespace(user_data={}, chat_data={})
+    await state.load(update, other)
+    assert (other.user_data, other.chat_data) == ({"step": "rename"}, {"room_id": 7})
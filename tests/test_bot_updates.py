@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from app.bot.updates import PerChatUpdateProcessor
+from tests.factories import make_update
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_updates_of_one_chat_run_in_order():
+    processor = PerChatUpdateProcessor(8)
+    handled = []
+
+    async def handle(n):
+        await asyncio.sleep(0.01 if n % 2 else 0)
+        handled.append(n)
+
+    await asyncio.gather(*(processor.process_update(make_update(n, 1), handle(n)) for n in range(10)))
+
+    assert handled == list(range(10))
+    assert processor._chats == {}
+
+
+async def test_burst_from_one_chat_does_not_block_other_chats():
+    processor = PerChatUpdateProcessor(2)
+    hot_chat = asyncio.Event()
+
+    async def blocked():
+        await hot_chat.wait()
+
+    async def other():
+        pass
+
+    burst = [asyncio.create_task(processor.process_update(make_update(n, 1), blocked())) for n in range(10)]
+    await asyncio.sleep(0)
+
+    # Only the first update of the busy chat holds a slot, the rest wait for the chat's lock
+    await asyncio.wait_for(processor.process_update(make_update(100, 2), other()), timeout=1)
+    await asyncio.wait_for(processor.process_update(make_update(101, 3), other()), timeout=1)
+
+    hot_chat.set()
+    await asyncio.wait_for(asyncio.gather(*burst), timeout=1)
+
+
+async def test_shutdown_does_not_break_updates_in_flight():
+    processor = PerChatUpdateProcessor(2)
+    release = asyncio.Event()
+
+    async def handle():
+        await release.wait()
+
+    in_flight = [asyncio.create_task(processor.process_update(make_update(n, 1), handle())) for n in range(2)]
+    await asyncio.sleep(0)
+    await processor.shutdown()
+    release.set()
+
+    await asyncio.wait_for(asyncio.gather(*in_flight), timeout=1)
+    assert processor._chats == {}
@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import func, select
+
+from app.bot.bot import get_or_create_user
+from app.core.database import engine
+from app.models.models import User
+from app.services.user_cache import user_cache
+from tests.conftest import count_statements
+from tests.factories import new_telegram_id
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_start_registers_with_one_statement_and_then_hits_the_cache(db):
+    telegram_id = new_telegram_id()
+
+    with count_statements(engine) as statements:
+        user = await get_or_create_user(db, telegram_id, "first")
+    assert len(statements) == 1, statements
+    assert (user.telegram_id, user.username) == (telegram_id, "first")
+
+    with count_statements(engine) as statements:
+        again = await get_or_create_user(db, telegram_id, "first")
+    assert statements == []
+    assert again.id == user.id
+
+
+async def test_start_with_a_new_username_updates_the_same_user(db):
+    telegram_id = new_telegram_id()
+    user = await get_or_create_user(db, telegram_id, "first")
+
+    with count_statements(engine) as statements:
+        renamed = await get_or_create_user(db, telegram_id, "second")
+    assert len(statements) == 1, statements
+    assert (renamed.id, renamed.username) == (user.id, "second")
+    assert (await user_cache.get(telegram_id)).username == "second"
+    assert await db.scalar(select(func.count()).select_from(User).where(User.telegram_id == telegram_id)) == 1
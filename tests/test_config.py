@@ -0,0 +1,12 @@
+import pytest
+
+from app.core.config import DB_PROFILES, select_db_profile
+
+
+def test_known_db_profiles_are_selected():
+    assert select_db_profile("prod") is DB_PROFILES["prod"]
+
+
+def test_unknown_db_profile_names_the_allowed_ones():
+    with pytest.raises(ValueError, match="Unknown DB_PROFILE 'qa', expected one of: dev, prod, bench"):
+        select_db_profile("qa")
@@ -0,0 +1,26 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import app.main
+from app.core.database import engine
+
+
+def test_shutdown_waits_for_the_tombstone_compaction(monkeypatch):
+    order = []
+
+    async def compaction():
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await asyncio.sleep(0.05)  # A compaction batch still committing
+            order.append("compaction")
+
+    async def close_redis():
+        order.append("redis")
+
+    monkeypatch.setattr(app.main, "run_tombstone_compaction", compaction)
+    monkeypatch.setattr(app.main, "close_redis", close_redis)
+    with TestClient(app.main.app) as client:
+        client.portal.call(engine.dispose)  # Its connections belong to this client's event loop
+    assert order == ["compaction", "redis"]
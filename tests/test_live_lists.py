@@ -0,0 +1,92 @@
+import asyncio
+import json
+
+import pytest
+from telegram.error import BadRequest
+
+from app.bot.api import ApiError
+from app.bot.live_list import LiveLists
+from app.schemas.events import EventType
+from tests.fakes import FakeChatBot, FakeItemsApi
+
+pytestmark = pytest.mark.anyio
+
+ROOM_ID = 1
+
+
+def room_event(event_type: str) -> str:
+    return json.dumps({"type": event_type, "room_id": ROOM_ID})
+
+
+async def test_lists_are_sent_once_when_not_live():
+    bot, api = FakeChatBot(), FakeItemsApi()
+    api.items[ROOM_ID] = [{"name": "milk"}]
+    lists = LiveLists(bot, api, debounce=0, live=False)
+
+    await lists.show(chat_id=10, telegram_id=100, room_id=ROOM_ID)
+    await lists.on_event(ROOM_ID, 1, room_event(EventType.ITEM_ADDED))
+
+    assert len(bot.sent) == 1 and "milk" in bot.sent[0][1]
+    assert lists.lists == {} and lists._pending == {}
+
+
+async def test_events_within_the_debounce_window_render_once():
+    bot, api = FakeChatBot(), FakeItemsApi()
+    api.items[ROOM_ID] = [{"name": "milk"}]
+    lists = LiveLists(bot, api, debounce=0.05)
+    await lists.show(chat_id=10, telegram_id=100, room_id=ROOM_ID)
+    await lists.show(chat_id=20, telegram_id=200, room_id=ROOM_ID)
+
+    api.items[ROOM_ID] = [{"name": "milk"}, {"name": "bread"}]
+    for seq in range(1, 4):
+        await lists.on_event(ROOM_ID, seq, room_event(EventType.ITEM_ADDED))
+    await asyncio.sleep(0.15)
+
+    assert api.calls == 3  # Two shows and a single refresh for both chats
+    assert sorted(chat_id for chat_id, _, _ in bot.edits) == [10, 20]
+    assert all("bread" in text for _, _, text in bot.edits)
+
+
+async def test_messages_already_showing_the_list_are_not_edited():
+    bot, api = FakeChatBot(), FakeItemsApi()
+    api.items[ROOM_ID] = [{"name": "milk"}]
+    lists = LiveLists(bot, api, debounce=0)
+    await lists.show(chat_id=10, telegram_id=100, room_id=ROOM_ID)
+    api.items[ROOM_ID] = [{"name": "bread"}]
+    await lists.show(chat_id=20, telegram_id=200, room_id=ROOM_ID)
+
+    await lists.refresh(ROOM_ID)
+    assert [(chat_id, message_id) for chat_id, message_id, _ in bot.edits] == [(10, 1)]
+
+    await lists.refresh(ROOM_ID)
+    assert len(bot.edits) == 1
+
+
+async def test_lists_of_members_who_lost_access_are_forgotten():
+    bot, api = FakeChatBot(), FakeItemsApi()
+    api.items[ROOM_ID] = [{"name": "milk"}]
+    lists = LiveLists(bot, api, debounce=0)
+    await lists.show(chat_id=10, telegram_id=100, room_id=ROOM_ID)
+    await lists.show(chat_id=20, telegram_id=200, room_id=ROOM_ID)
+    api.items[ROOM_ID] = [{"name": "bread"}]
+
+    api.errors[100] = ApiError(403, "Access denied.")
+    await lists.refresh(ROOM_ID)
+    assert list(lists.lists[ROOM_ID]) == [20]
+    assert [chat_id for chat_id, _, _ in bot.edits] == [20]
+
+    api.errors[200] = ApiError(404, "User not found.")
+    await lists.refresh(ROOM_ID)
+    assert ROOM_ID not in lists.lists
+
+
+async def test_messages_that_cannot_be_edited_are_forgotten():
+    bot, api = FakeChatBot(), FakeItemsApi()
+    api.items[ROOM_ID] = [{"name": "milk"}]
+    lists = LiveLists(bot, api, debounce=0)
+    await lists.show(chat_id=10, telegram_id=100, room_id=ROOM_ID)
+    api.items[ROOM_ID] = [{"name": "bread"}]
+
+    bot.errors[10] = BadRequest("Message to edit not found")
+    await lists.refresh(ROOM_ID)
+    assert ROOM_ID not in lists.lists
@@ -0,0 +1,17 @@
+import pytest
+
+from app.core.config import settings
+
+
+@pytest.mark.parametrize("token, headers, status", [
+    ("", {"Authorization": "Bearer "}, 404),
+    ("secret", {}, 401),
+    ("secret", {"Authorization": "Bearer wrong"}, 401),
+    ("secret", {"Authorization": "Bearer secret"}, 200),
+])
+def test_metrics_need_the_configured_token(client, monkeypatch, token, headers, status):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", token)
+    response = client.get("/metrics/", headers=headers)
+    assert response.status_code == status
+    if status == 200:
+        assert "pool" in response.json()["database"]
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+from sqlalchemy import delete
+
+from app.models.models import OutboxEvent
+from app.services.outbox import OutboxDispatcher
+from app.websockets.manager import websocket_manager
+from tests.factories import new_telegram_id
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_failed_event_holds_back_its_room_across_batches(db, monkeypatch):
+    room_id = new_telegram_id()  # Any id no other test uses
+    published, failing = [], {"1"}
+
+    async def publish(room, payload):
+        if room != room_id:
+            return
+        if payload in failing:
+            failing.discard(payload)
+            raise ConnectionError("broadcast backend unavailable")
+        published.append(payload)
+
+    monkeypatch.setattr(websocket_manager, "publish", publish)
+    dispatcher = OutboxDispatcher(poll_interval=0.05)
+    try:
+        db.add_all([OutboxEvent(room_id=room_id, payload="1"), OutboxEvent(room_id=room_id, payload="2")])
+        await db.commit()
+        await dispatcher.dispatch(db)
+        assert published == []
+
+        # The first event is still backing off, so neither the skipped nor a newer event may overtake it
+        db.add(OutboxEvent(room_id=room_id, payload="3"))
+        await db.commit()
+        await dispatcher.dispatch(db)
+        assert published == []
+
+        await asyncio.sleep(0.15)
+        await dispatcher.dispatch(db)
+        assert published == ["1", "2", "3"]
+    finally:
+        await db.execute(delete(OutboxEvent).where(OutboxEvent.room_id == room_id))
+        await db.commit()
@@ -0,0 +1,144 @@
+"""
+Plan regression checks for the hot read paths. The statements the repositories actually send are captured
+and EXPLAINed on a database seeded with one large room among many small ones, inside a transaction that
+is rolled back. A check fails when a query stops using its index or falls back to a sequential scan.
+"""
+from contextlib import asynccontextmanager
+
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import engine
+from app.repositories.room import get_user_rooms
+from app.repositories.shopping import get_changes, get_items
+from app.services.access_control import get_room_member_ids, membership_cache
+from app.services.outbox import OutboxDispatcher
+from app.websockets.manager import websocket_manager
+
+pytestmark = pytest.mark.anyio
+
+ROOMS = 5000
+ROOMS_WITH_ITEMS = 200
+ROOM_ITEMS = 200
+LARGE_ROOM_ITEMS = 20000
+# Telegram ids above the ones tests/factories.py hands out
+FIRST_TELEGRAM_ID = 2_100_000_000
+
+SEED = [
+    f"INSERT INTO users (telegram_id, username) "
+    f"SELECT {FIRST_TELEGRAM_ID} + g, 'plan' || g FROM generate_series(1, {ROOMS}) g",
+    # One room per seeded user, each user a member of five rooms; the seeded users' ids are consecutive
+    f"INSERT INTO rooms (name, owner_id, invite_code, created_at) "
+    f"SELECT 'plan room', id, 'plan-' || id, now() - id * interval '1 second' "
+    f"FROM users WHERE telegram_id > {FIRST_TELEGRAM_ID}",
+    f"INSERT INTO room_users (room_id, user_id) "
+    f"SELECT id, owner_id - k FROM rooms, generate_series(0, 4) k WHERE invite_code LIKE 'plan-%' "
+    f"AND owner_id - k >= (SELECT min(owner_id) FROM rooms WHERE invite_code LIKE 'plan-%')",
+    # The first room is large, the next ones hold a couple of hundred items each and the rest are empty
+    f"INSERT INTO shopping_items (name, room_id, created_at, version) "
+    f"SELECT 'item', r.id, now() - g * interval '1 second', g "
+    f"FROM (SELECT id, row_number() OVER (ORDER BY owner_id) AS n FROM rooms WHERE invite_code LIKE 'plan-%') r, "
+    f"generate_series(1, CASE WHEN r.n = 1 THEN {LARGE_ROOM_ITEMS} ELSE {ROOM_ITEMS} END) g "
+    f"WHERE r.n <= {ROOMS_WITH_ITEMS}",
+    # A long delivered history with a few events still pending
+    f"INSERT INTO outbox_events (room_id, payload, delivered_at) "
+    f"SELECT g % {ROOMS}, '{{}}', now() FROM generate_series(1, 50000) g",
+    "INSERT INTO outbox_events (room_id, payload) SELECT g, '{}' FROM generate_series(1, 10) g",
+    "ANALYZE users, rooms, room_users, shopping_items, outbox_events",
+]
+
+
+@pytest.fixture
+async def seeded(db):
+    """ A session inside a rolled back transaction over the seeded data, the large room and its owner. """
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        for statement in SEED:
+            await connection.execute(text(statement))
+        room_id, user_id = (await connection.execute(text(
+            "SELECT id, owner_id FROM rooms WHERE invite_code LIKE 'plan-%' ORDER BY owner_id LIMIT 1"
+        ))).one()
+        session = AsyncSession(bind=connection, join_transaction_mode="create_savepoint", expire_on_commit=False)
+        membership_cache.clear()
+        try:
+            yield session, room_id, user_id
+        finally:
+            await session.close()
+            await transaction.rollback()
+            membership_cache.clear()
+
+
+@asynccontextmanager
+async def plans(session: AsyncSession):
+    """ Collects the plan of every SELECT sent inside the block. """
+    statements, collected = [], []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    try:
+        yield collected
+    finally:
+        event.remove(engine.sync_engine, "before_cursor_execute", record)
+    connection = await (await session.connection()).get_raw_connection()
+    for statement, parameters in statements:
+        rows = await connection.driver_connection.fetch("EXPLAIN " + statement, *parameters)
+        collected.append("\n".join(row[0] for row in rows))
+
+
+# Both indexes serve a lookup by room and user
+MEMBERSHIP_INDEXES = ("unique_room_user", "ix_room_users_user_id_room_id")
+
+
+def assert_uses(plan: str, *indexes):
+    """ Fails on a sequential scan or when an index (or any of a tuple of alternatives) is not used. """
+    assert "Seq Scan" not in plan, plan
+    for index in indexes:
+        alternatives = index if isinstance(index, tuple) else (index,)
+        assert any(f"using {name} " in plan or f"on {name} " in plan for name in alternatives), plan
+
+
+async def test_get_items_reads_the_page_from_the_live_items_index(seeded):
+    session, room_id, user_id = seeded
+    async with plans(session) as collected:
+        await get_items(session, room_id, user_id, 50)
+    [plan] = collected
+    assert_uses(plan, MEMBERSHIP_INDEXES, "ix_shopping_items_live_room_id_created_at_id")
+    # Only the page itself is sorted, the room's items are read in index order
+    assert plan.count("Sort Key") == 1, plan
+
+
+async def test_get_changes_reads_the_version_index(seeded):
+    session, room_id, user_id = seeded
+    async with plans(session) as collected:
+        await get_changes(session, room_id, user_id, LARGE_ROOM_ITEMS // 2, None, 50)
+    membership, changes = collected
+    assert_uses(membership, "rooms_pkey", MEMBERSHIP_INDEXES)
+    assert_uses(changes, "ix_shopping_items_room_id_version_id")
+    assert "Sort" not in changes, changes
+
+
+async def test_membership_lookups_use_an_index(seeded):
+    session, room_id, user_id = seeded
+    async with plans(session) as collected:
+        await get_room_member_ids(session, room_id)
+        await get_user_rooms(session, user_id, 20)
+    members, rooms = collected
+    assert_uses(members, "unique_room_user")
+    assert_uses(rooms, "ix_room_users_user_id_room_id", "rooms_pkey")
+
+
+async def test_outbox_reads_only_pending_events(seeded, monkeypatch):
+    session, _, _ = seeded
+
+    async def publish(room_id, payload):
+        return 0
+
+    monkeypatch.setattr(websocket_manager, "publish", publish)
+    async with plans(session) as collected:
+        await OutboxDispatcher().dispatch(session)
+    _, pending = collected
+    assert_uses(pending, "ix_outbox_events_pending")
@@ -0,0 +1,98 @@
+import asyncio
+import json
+
+import pytest
+
+from app.websockets.backends import RedisBackend
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def backends():
+    """ Two backends, as two workers would have, sharing one fake Redis server. """
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")  # Needed by fakeredis to run the publish script
+    server = fakeredis.FakeServer()
+    first, second = (RedisBackend(fakeredis.FakeAsyncRedis(server=server, decode_responses=True), buffer_size=3)
+                     for _ in range(2))
+    yield first, second
+    for backend in (first, second):
+        await backend.stop()
+
+
+async def received(deliveries: list, count: int):
+    for _ in range(100):
+        if len(deliveries) >= count:
+            return deliveries
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"expected {count} deliveries, got {deliveries}")
+
+
+async def test_publish_numbers_events_per_room(backends):
+    first, second = backends
+
+    assert [await first.publish(1, '{"type":"item_added"}') for _ in range(2)] == [1, 2]
+    assert await second.publish(1, "{}") == 3
+    assert await second.publish(2, "{}") == 1
+
+    assert await first.last_seq(1) == 3
+    assert await first.last_seq(3) == 0
+    _, events = await second.replay(1, 0)
+    assert [json.loads(event) for _, event in events] == [
+        {"seq": 1, "type": "item_added"}, {"seq": 2, "type": "item_added"}, {"seq": 3},
+    ]
+
+
+async def test_replay_returns_events_after_since(backends):
+    first, second = backends
+    for _ in range(5):
+        await first.publish(1, "{}")
+
+    assert await second.replay(1, 3) == (5, [(4, '{"seq":4}'), (5, '{"seq":5}')])
+    assert await second.replay(1, 5) == (5, [])
+    # Events 1 and 2 fell out of the buffer of three, and a client ahead of the room must resync
+    assert await second.replay(1, 1) == (5, None)
+    assert await second.replay(1, 9) == (5, None)
+
+
+async def test_subscribe_all_delivers_events_published_by_another_worker(backends):
+    first, second = backends
+    deliveries = []
+
+    async def deliver(room_id, seq, event):
+        deliveries.append((room_id, seq, event))
+
+    first.attach(deliver)
+    await first.subscribe_all()
+    await second.publish(1, "{}")
+    await second.publish(2, "{}")
+
+    assert await received(deliveries, 2) == [(1, 1, '{"seq":1}'), (2, 1, '{"seq":1}')]
+
+
+async def test_malformed_messages_do_not_stop_the_listener(backends):
+    first, second = backends
+    deliveries = []
+
+    async def deliver(room_id, seq, event):
+        deliveries.append((room_id, seq))
+
+    first.attach(deliver)
+    await first.subscribe_all()
+    await second.redis.publish("room:lobby", "1:{}")
+    await second.redis.publish("room:1", "not an event")
+    await second.publish(1, "{}")
+
+    assert await received(deliveries, 1) == [(1, 1)]
+
+
+async def test_room_keys_expire_unless_someone_is_connected(backends):
+    first, _ = backends
+    await first.publish(1, "{}")
+    assert 0 < await first.redis.ttl("room:1:seq") <= first.retention
+    assert 0 < await first.redis.ttl("room:1:log") <= first.retention
+
+    await first.redis.expire("room:1:seq", 5)
+    await first.subscribe(1)
+    assert await first.redis.ttl("room:1:seq") > 5
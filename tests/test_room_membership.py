@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import func, select
+
+from app.core.database import async_session, engine
+from app.models.models import RoomUser
+from app.repositories import room as room_repository
+from app.repositories.room import create_room, join_room, leave_room
+from app.services import room_service
+from app.services.room_service import add_user_to_room, remove_user_from_room
+from app.services.versioning import room_versions
+from tests.conftest import count_statements
+from tests.factories import create_user
+
+pytestmark = pytest.mark.anyio
+
+ATTEMPTS = 10
+
+
+@pytest.fixture
+async def room(db):
+    owner, member = await create_user(), await create_user()
+    room = await create_room(db, "membership", owner.id)
+    return room, owner, member
+
+
+async def attempt(call) -> str:
+    """ Runs a membership change in its own session and returns its message, error or HTTP status. """
+    async with async_session() as db:
+        try:
+            result = await call(db)
+        except HTTPException as e:
+            return str(e.status_code)
+    return result.get("message") or result["error"]
+
+
+async def memberships(room_id: int, user_id: int) -> int:
+    async with async_session() as db:
+        return await db.scalar(
+            select(func.count()).select_from(RoomUser).where(RoomUser.room_id == room_id, RoomUser.user_id == user_id)
+        )
+
+
+async def test_each_membership_change_is_one_statement(room):
+    room, owner, member = room
+    calls = [
+        lambda db: join_room(db, room.invite_code, member.id),
+        lambda db: leave_room(db, room.id, member.id),
+        lambda db: add_user_to_room(db, room.id, member.id, owner.id),
+        lambda db: remove_user_from_room(db, room.id, member.id, owner.id),
+    ]
+    for call in calls:
+        with count_statements(engine) as statements:
+            result = await attempt(call)
+        assert "success" in result.lower(), result
+        assert len(statements) == 1, statements
+
+
+async def test_concurrent_joins_and_adds_create_one_membership(room):
+    room, owner, member = room
+
+    results = await asyncio.gather(
+        *(attempt(lambda db: join_room(db, room.invite_code, member.id)) for _ in range(ATTEMPTS // 2)),
+        *(attempt(lambda db: add_user_to_room(db, room.id, member.id, owner.id)) for _ in range(ATTEMPTS // 2)),
+    )
+
+    successes = [result for result in results if "success" in result.lower()]
+    assert len(successes) == 1, results
+    assert set(results) - set(successes) <= {"409", "User is already a member of this room."}
+    assert await memberships(room.id, member.id) == 1
+
+
+async def test_concurrent_leaves_and_removes_delete_one_membership(room):
+    room, owner, member = room
+    await attempt(lambda db: join_room(db, room.invite_code, member.id))
+
+    results = await asyncio.gather(
+        *(attempt(lambda db: leave_room(db, room.id, member.id)) for _ in range(ATTEMPTS // 2)),
+        *(attempt(lambda db: remove_user_from_room(db, room.id, member.id, owner.id)) for _ in range(ATTEMPTS // 2)),
+    )
+
+    successes = [result for result in results if "success" in result.lower()]
+    assert len(successes) == 1, results
+    assert set(results) - set(successes) <= {"404", "User is not a member of this room."}
+    assert await memberships(room.id, member.id) == 0
+    assert await memberships(room.id, owner.id) == 1
+
+
+async def test_room_is_marked_changed_before_its_members_are_invalidated(room, monkeypatch):
+    room, owner, member = room
+    calls = []
+    bump = room_versions.bump
+
+    async def record_bump(*keys):
+        calls.append("bump")
+        await bump(*keys)
+
+    async def record_invalidate(room_id):
+        # A read reloading the members from now on must already be routed to the primary
+        calls.append("invalidate")
+
+    monkeypatch.setattr(room_versions, "bump", record_bump)
+    monkeypatch.setattr(room_repository, "invalidate_room_members", record_invalidate)
+    monkeypatch.setattr(room_service, "invalidate_room_members", record_invalidate)
+    await attempt(lambda db: join_room(db, room.invite_code, member.id))
+    await attempt(lambda db: remove_user_from_room(db, room.id, member.id, owner.id))
+
+    assert calls == ["bump", "invalidate"] * 2
@@ -0,0 +1,58 @@
+import asyncio
+
+import pytest
+
+from app.bot.room_pages import RoomPages
+from tests.fakes import FakeRoomsApi
+
+pytestmark = pytest.mark.anyio
+
+USER = 100
+
+
+@pytest.fixture
+def api():
+    api = FakeRoomsApi()
+    api.rooms[USER] = [{"id": room_id, "name": f"room {room_id}"} for room_id in range(1, 6)]
+    return api
+
+
+async def test_pages_are_fetched_once_and_back_navigation_uses_the_cache(api):
+    pages = RoomPages(api, page_size=2, ttl=60)
+
+    first = await pages.get(USER, 0)
+    second = await pages.get(USER, 1)
+    assert [room["id"] for room in first["rooms"] + second["rooms"]] == [1, 2, 3, 4]
+    assert await pages.get(USER, 0) is first
+    assert await pages.get(USER, 1) is second
+    assert api.cursors == [None, "2"]
+
+    # A page is only reachable once the cursor leading to it is known
+    assert await pages.get(USER, 3) is None
+    assert [room["id"] for room in (await pages.get(USER, 2))["rooms"]] == [5]
+    assert await pages.get(USER, 3) is None
+    assert api.cursors == [None, "2", "4"]
+
+
+async def test_find_room_looks_in_the_pages_already_seen(api):
+    pages = RoomPages(api, page_size=2, ttl=60)
+    await pages.get(USER, 0)
+
+    assert pages.find_room(USER, 2)["name"] == "room 2"
+    assert pages.find_room(USER, 3) is None
+    assert pages.find_room(USER + 1, 2) is None
+
+
+async def test_invalidated_or_expired_pages_start_again_from_the_first(api):
+    pages = RoomPages(api, page_size=2, ttl=0.05)
+    await pages.get(USER, 0)
+    await pages.get(USER, 1)
+
+    pages.invalidate(USER)
+    assert await pages.get(USER, 1) is None
+    await pages.get(USER, 0)
+    await pages.get(USER, 1)
+    assert api.cursors == [None, "2", None, "2"]
+
+    await asyncio.sleep(0.1)
+    assert await pages.get(USER, 1) is None
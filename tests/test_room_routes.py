@@ -0,0 +1,72 @@
+import json
+import time
+
+import pytest
+
+from app.websockets.manager import websocket_manager
+from tests.factories import create_user
+
+
+def wait_for_seq(client, room_id: int, seq: int):
+    """ Waits until the outbox dispatcher has broadcast the room's events up to `seq`. """
+    deadline = time.monotonic() + 5
+    while client.portal.call(websocket_manager.last_seq, room_id) < seq:
+        assert time.monotonic() < deadline, "the room events were never broadcast"
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def room(client):
+    owner = client.portal.call(create_user)
+    headers = {"telegram-id": str(owner.telegram_id)}
+    room = client.post("/rooms/", json={"name": "kitchen"}, headers=headers).json()
+    return room, headers
+
+
+@pytest.mark.parametrize("body", [{}, {"name": None}, {"name": "kitchen"}])
+def test_update_without_a_new_name_returns_the_room_unchanged(client, room, body):
+    room, headers = room
+    etag = client.get("/rooms/", headers=headers).headers["ETag"]
+
+    response = client.put(f"/rooms/{room['id']}", json=body, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["name"] == "kitchen"
+    # No change was made, so cached copies of the room stay valid
+    assert client.get("/rooms/", headers=headers).headers["ETag"] == etag
+
+
+def test_update_renames_the_room(client, room):
+    room, headers = room
+    response = client.put(f"/rooms/{room['id']}", json={"name": "pantry"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["name"] == "pantry"
+
+
+def test_only_the_owner_can_rename(client, room):
+    room, _ = room
+    outsider = client.portal.call(create_user)
+    response = client.put(f"/rooms/{room['id']}", json={"name": "pantry"},
+                          headers={"telegram-id": str(outsider.telegram_id)})
+    assert response.status_code == 403
+
+
+def test_snapshot_version_and_seq_resume_where_the_snapshot_ends(client, room):
+    room, headers = room
+    client.post("/shopping/", json={"name": "milk", "room_id": room["id"]}, headers=headers)
+    wait_for_seq(client, room["id"], 2)  # room_created, item_added
+
+    snapshot = client.get(f"/rooms/{room['id']}/snapshot", headers=headers).json()
+    assert [item["name"] for item in snapshot["items"]] == ["milk"]
+    assert snapshot["seq"] == 2
+    changes = client.get(f"/shopping/{room['id']}/changes", params={"since": snapshot["version"]}, headers=headers)
+    assert changes.json()["changes"] == []
+
+    client.post("/shopping/", json={"name": "bread", "room_id": room["id"]}, headers=headers)
+    wait_for_seq(client, room["id"], 3)
+
+    changes = client.get(f"/shopping/{room['id']}/changes", params={"since": snapshot["version"]}, headers=headers)
+    assert [item["name"] for item in changes.json()["changes"]] == ["bread"]
+    with client.websocket_connect(f"/ws/{room['id']}?since={snapshot['seq']}", headers=headers) as ws:
+        event = json.loads(ws.receive_text())
+    assert (event["type"], event["seq"], event["item"]["name"]) == ("item_added", 3, "bread")
@@ -0,0 +1,92 @@
+import json
+
+import pytest
+from sqlalchemy import select
+
+from app.models.models import OutboxEvent, ShoppingItem
+from app.repositories.room import create_room
+from app.repositories.shopping import add_items, delete_item, delete_items, update_items
+from app.schemas.shopping import ShoppingItemBulkUpdate, ShoppingItemCreate
+from tests.factories import create_user
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def rooms(db):
+    """ A user with two rooms of two items each, and another user with an item in their own room. """
+    user, outsider = await create_user(), await create_user()
+    first, second = await create_room(db, "bulk one", user.id), await create_room(db, "bulk two", user.id)
+    foreign = await create_room(db, "bulk foreign", outsider.id)
+    items = await add_items(db, [
+        ShoppingItemCreate(name=name, category="Fruit", room_id=room.id)
+        for room in (first, second) for name in ("apples", "pears")
+    ], user.id)
+    [foreign_item] = await add_items(db, [ShoppingItemCreate(name="plums", room_id=foreign.id)], outsider.id)
+    return user, (first, second), [item.id for item in items], (outsider, foreign_item.id)
+
+
+async def events(db, room_id: int, event_type: str):
+    result = await db.execute(select(OutboxEvent.payload).where(OutboxEvent.room_id == room_id))
+    return [payload for payload in map(json.loads, result.scalars()) if payload["type"] == event_type]
+
+
+async def stored(db, item_ids):
+    result = await db.execute(select(ShoppingItem).where(ShoppingItem.id.in_(item_ids)).execution_options(populate_existing=True))
+    return {item.id: item for item in result.scalars()}
+
+
+async def test_one_foreign_item_rolls_back_the_whole_batch(db, rooms):
+    user, _, item_ids, (_, foreign_id) = rooms
+
+    result = await update_items(db, [
+        ShoppingItemBulkUpdate(id=item_ids[0], name="bananas"), ShoppingItemBulkUpdate(id=foreign_id, name="mine"),
+    ], user.id)
+    assert result == {"error": "Access denied."}
+    assert await delete_items(db, [item_ids[1], foreign_id], user.id) == {"error": "Access denied."}
+
+    items = await stored(db, [item_ids[0], item_ids[1], foreign_id])
+    assert [items[item_id].name for item_id in (item_ids[0], item_ids[1], foreign_id)] == ["apples", "pears", "plums"]
+    assert all(item.deleted_at is None for item in items.values())
+
+
+async def test_update_keeps_unset_fields_and_clears_explicit_nulls(db, rooms):
+    user, _, item_ids, _ = rooms
+
+    await update_items(db, [
+        ShoppingItemBulkUpdate(id=item_ids[0], name="bananas"),
+        ShoppingItemBulkUpdate(id=item_ids[1], category=None),
+    ], user.id)
+
+    items = await stored(db, item_ids[:2])
+    assert (items[item_ids[0]].name, items[item_ids[0]].category) == ("bananas", "Fruit")
+    assert (items[item_ids[1]].name, items[item_ids[1]].category) == ("pears", None)
+
+
+async def test_each_room_gets_one_event_per_batch(db, rooms):
+    user, (first, second), item_ids, _ = rooms
+
+    await update_items(db, [ShoppingItemBulkUpdate(id=item_id, category="Veg") for item_id in item_ids], user.id)
+    await delete_items(db, item_ids, user.id)
+
+    for room in (first, second):
+        [added] = await events(db, room.id, "items_added")
+        [updated] = await events(db, room.id, "items_updated")
+        [deleted] = await events(db, room.id, "items_deleted")
+        assert {item["name"] for item in deleted["items"]} == {"apples", "pears"}
+        assert len(added["items"]) == len(updated["items"]) == 2
+
+
+async def test_deleting_already_deleted_items_succeeds(db, rooms):
+    user, (first, _), item_ids, (outsider, foreign_id) = rooms
+    await delete_item(db, item_ids[0], user.id)
+
+    result = await delete_items(db, item_ids[:2], user.id)
+    assert result == {"message": "1 items successfully deleted."}
+    assert await delete_items(db, item_ids[:2], user.id) == {"message": "0 items successfully deleted."}
+    [deleted] = await events(db, first.id, "items_deleted")
+    assert [item["name"] for item in deleted["items"]] == ["pears"]
+
+    # Deleted items of rooms the user is not in are still denied
+    await delete_item(db, foreign_id, outsider.id)
+    assert await delete_items(db, [item_ids[2], foreign_id], user.id) == {"error": "Access denied."}
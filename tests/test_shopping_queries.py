@@ -0,0 +1,63 @@
+import pytest
+
+from app.core.database import engine
+from app.core.dependencies import get_current_user
+from app.repositories.room import create_room
+from app.repositories.shopping import add_item, delete_item, get_items, update_item
+from app.schemas.shopping import ShoppingItemCreate, ShoppingItemUpdate
+from tests.conftest import count_statements
+from tests.factories import create_user
+
+pytestmark = pytest.mark.anyio
+
+# Statements an item endpoint may send, including the current user lookup; the outbox write of a
+# change is part of the same transaction and not counted
+MAX_STATEMENTS = 2
+
+
+@pytest.fixture
+async def member(db):
+    user = await create_user()
+    room = await create_room(db, "query count", user.id)
+    await get_current_user(user.telegram_id, db)  # Warm the user cache as any earlier request would
+    return user, room
+
+
+async def endpoint(db, telegram_id: int, repository_call):
+    """ Runs a repository call the way its route does: resolve the user, then one call. """
+    with count_statements(engine) as statements:
+        user = await get_current_user(telegram_id, db)
+        result = await repository_call(user)
+    assert len(statements) <= MAX_STATEMENTS, statements
+    return result
+
+
+async def test_item_endpoints_take_at_most_two_statements(db, member):
+    user, room = member
+
+    item = await endpoint(db, user.telegram_id, lambda u: add_item(db, ShoppingItemCreate(name="milk", room_id=room.id), u.id))
+    assert item.name == "milk"
+
+    page = await endpoint(db, user.telegram_id, lambda u: get_items(db, room.id, u.id, 50))
+    assert [i.id for i in page["items"]] == [item.id]
+
+    updated = await endpoint(db, user.telegram_id, lambda u: update_item(db, item.id, ShoppingItemUpdate(name="oat milk"), u.id))
+    assert updated.name == "oat milk"
+
+    deleted = await endpoint(db, user.telegram_id, lambda u: delete_item(db, item.id, u.id))
+    assert "error" not in deleted
+
+
+async def test_outsiders_are_denied_in_the_same_statement(db, member):
+    _, room = member
+    outsider = await create_user()
+    await get_current_user(outsider.telegram_id, db)
+    item = await add_item(db, ShoppingItemCreate(name="bread", room_id=room.id), room.owner_id)
+
+    for call in (
+        lambda u: add_item(db, ShoppingItemCreate(name="cake", room_id=room.id), u.id),
+        lambda u: get_items(db, room.id, u.id, 50),
+        lambda u: update_item(db, item.id, ShoppingItemUpdate(name="cake"), u.id),
+        lambda u: delete_item(db, item.id, u.id),
+    ):
+        assert await endpoint(db, outsider.telegram_id, call) == {"error": "Access denied."}
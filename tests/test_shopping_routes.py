@@ -0,0 +1,98 @@
+import pytest
+
+from app.core.database import async_session
+from app.services.tombstones import compact_tombstones
+from tests.factories import create_user
+
+
+@pytest.fixture
+def room(client):
+    owner = client.portal.call(create_user)
+    headers = {"telegram-id": str(owner.telegram_id)}
+    room = client.post("/rooms/", json={"name": "kitchen"}, headers=headers).json()
+    return room["id"], headers
+
+
+def add_item(client, room_id: int, headers: dict, name: str) -> dict:
+    response = client.post("/shopping/", json={"name": name, "room_id": room_id}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_unchanged_list_is_not_modified_only_for_members(client, room):
+    room_id, headers = room
+    add_item(client, room_id, headers, "milk")
+    etag = client.get(f"/shopping/{room_id}", headers=headers).headers["ETag"]
+
+    response = client.get(f"/shopping/{room_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    outsider = client.portal.call(create_user)
+    response = client.get(f"/shopping/{room_id}",
+                          headers={"telegram-id": str(outsider.telegram_id), "If-None-Match": etag})
+    assert response.status_code == 403
+
+
+def test_etag_changes_after_a_mutation(client, room):
+    room_id, headers = room
+    etag = client.get(f"/shopping/{room_id}", headers=headers).headers["ETag"]
+
+    add_item(client, room_id, headers, "milk")
+
+    response = client.get(f"/shopping/{room_id}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert [item["name"] for item in response.json()["items"]] == ["milk"]
+
+
+def changes(client, room_id: int, headers: dict, **params):
+    return client.get(f"/shopping/{room_id}/changes", params=params, headers=headers)
+
+
+def test_first_sync_skips_tombstones_and_later_syncs_include_them(client, room):
+    room_id, headers = room
+    milk = add_item(client, room_id, headers, "milk")
+    bread = add_item(client, room_id, headers, "bread")
+    client.delete(f"/shopping/{bread['id']}", headers=headers)
+
+    first = changes(client, room_id, headers, since=0).json()
+    assert [item["name"] for item in first["changes"]] == ["milk"]
+
+    client.delete(f"/shopping/{milk['id']}", headers=headers)
+    later = changes(client, room_id, headers, since=first["version"]).json()
+    assert [(item["name"], item["deleted_at"] is not None) for item in later["changes"]] == [("milk", True)]
+    assert later["version"] > first["version"]
+
+
+def test_sync_older_than_the_compacted_tombstones_must_resync(client, room):
+    async def compact():
+        async with async_session() as db:
+            await compact_tombstones(db, retention=0)
+
+    room_id, headers = room
+    milk = add_item(client, room_id, headers, "milk")
+    version = changes(client, room_id, headers, since=0).json()["version"]
+    client.delete(f"/shopping/{milk['id']}", headers=headers)
+    client.portal.call(compact)
+
+    assert changes(client, room_id, headers, since=version).status_code == 410
+    assert changes(client, room_id, headers, since=0).json()["changes"] == []
+
+
+def test_changes_page_through_after_id(client, room):
+    room_id, headers = room
+    version = changes(client, room_id, headers, since=0).json()["version"]
+    response = client.post("/shopping/bulk", headers=headers, json={
+        "items": [{"name": name, "room_id": room_id} for name in ("milk", "bread", "eggs")],
+    })
+    assert response.status_code == 200  # One transaction, so every item has the same version
+
+    names, params = [], {"since": version}
+    while True:
+        page = changes(client, room_id, headers, limit=2, **params).json()
+        names += [item["name"] for item in page["changes"]]
+        if not page["has_more"]:
+            break
+        params = {"since": page["version"], "after_id": page["after_id"]}
+    assert sorted(names) == ["bread", "eggs", "milk"]
+    assert changes(client, room_id, headers, since=page["version"]).json()["changes"] == []
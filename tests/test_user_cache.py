@@ -0,0 +1,72 @@
+import time
+
+import pytest
+
+from app.core.cache import TTLCache, invalidation_bus
+from app.core.database import engine
+from app.core.dependencies import get_current_user
+from app.models.models import User
+from app.services.user_cache import UserCache, user_cache
+from tests.conftest import count_statements
+from tests.factories import create_user
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def cache():
+    cache = UserCache(enabled=True, maxsize=2, ttl=60)
+    yield cache
+    invalidation_bus.register(UserCache.NAME, user_cache.local)  # The test cache took over the bus name
+
+
+def test_ttl_cache_expires_and_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)  # Evicts "b", the least recently used
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    time.sleep(0.06)
+    assert cache.get("a") is None
+    assert cache.stats() == {"size": 1, "hits": 3, "misses": 2}
+
+
+async def test_user_cache_hits_until_invalidated(cache):
+    await cache.set(User(id=1, telegram_id=100, username="someone"))
+
+    user = await cache.get(100)
+    assert (user.id, user.username) == (1, "someone")
+    await cache.invalidate(100)
+    assert await cache.get(100) is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+async def test_disabled_user_cache_never_answers():
+    cache = UserCache(enabled=False, maxsize=10, ttl=60)
+    invalidation_bus.register(UserCache.NAME, user_cache.local)
+    await cache.set(User(id=1, telegram_id=100, username="someone"))
+    assert await cache.get(100) is None
+
+
+async def test_redis_tier_is_shared_between_workers():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    first = UserCache(enabled=True, maxsize=10, ttl=60, redis=redis)
+    second = UserCache(enabled=True, maxsize=10, ttl=60, redis=redis)
+    invalidation_bus.register(UserCache.NAME, user_cache.local)
+
+    await first.set(User(id=1, telegram_id=100, username="someone"))
+    assert (await second.get(100)).id == 1
+    assert second.stats()["redis_hits"] == 1
+
+
+async def test_current_user_is_looked_up_once(db):
+    user = await create_user()
+    await user_cache.invalidate(user.telegram_id)
+
+    with count_statements(engine) as statements:
+        first = await get_current_user(user.telegram_id, db)
+        second = await get_current_user(user.telegram_id, db)
+    assert first.id == second.id == user.id
+    assert len(statements) == 1
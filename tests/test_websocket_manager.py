@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+import pytest
+
+from app.websockets.backends import InMemoryBackend
+from app.websockets.connection import DROP_OLDEST, SLOW_CONSUMER_CLOSE_CODE
+from app.websockets.manager import WebSocketManager
+from tests.fakes import FakeWebSocket
+
+pytestmark = pytest.mark.anyio
+
+
+async def settle():
+    """ Lets the writer tasks drain their queues. """
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+async def test_broadcast_does_not_wait_for_slow_clients():
+    manager = WebSocketManager(InMemoryBackend(), queue_size=10)
+    slow, fast = FakeWebSocket(slow=True), FakeWebSocket()
+    await manager.connect(1, slow)
+    await manager.connect(1, fast)
+
+    await asyncio.wait_for(manager.publish(1, '{"type":"item_added"}'), timeout=1)
+    await settle()
+
+    assert [json.loads(message)["seq"] for message in fast.sent] == [1]
+    assert slow.sent == []
+    await manager.shutdown()
+
+
+async def test_overflowing_client_is_disconnected():
+    manager = WebSocketManager(InMemoryBackend(), queue_size=2)
+    slow, fast = FakeWebSocket(slow=True), FakeWebSocket()
+    await manager.connect(1, slow)
+    await manager.connect(1, fast)
+
+    for _ in range(5):
+        await manager.publish(1, "{}")
+        await settle()
+
+    assert slow.close_code == SLOW_CONSUMER_CLOSE_CODE
+    assert list(manager.active_connections[1]) == [fast]
+    assert len(fast.sent) == 5
+    await manager.shutdown()
+
+
+async def test_drop_oldest_keeps_the_latest_events():
+    manager = WebSocketManager(InMemoryBackend(), queue_size=2, overflow_policy=DROP_OLDEST)
+    slow = FakeWebSocket(slow=True)
+    await manager.connect(1, slow)
+
+    for _ in range(5):
+        await manager.publish(1, "{}")
+        await settle()
+    slow.release()
+    await settle()
+
+    # The first event was already being sent, 2 and 3 were dropped for 4 and 5
+    assert [json.loads(message)["seq"] for message in slow.sent] == [1, 4, 5]
+    assert slow.close_code is None
+    await manager.shutdown()
+
+
+async def test_idle_room_logs_are_evicted_unless_someone_is_connected():
+    backend = InMemoryBackend(retention=0)
+    await backend.subscribe(1)
+    await backend.publish(1, "{}")
+    await backend.publish(2, "{}")
+    await asyncio.sleep(0.01)
+
+    await backend.publish(3, "{}")
+
+    assert set(backend.logs) == {1, 3}
+    # A client resuming in the forgotten room is told to resync
+    assert await backend.replay(2, 1) == (0, None)
@@ -0,0 +1,47 @@
+import json
+import time
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.websockets.manager import websocket_manager
+from tests.factories import create_user
+
+
+def wait_for_event(client, room_id: int):
+    """ Waits until the outbox dispatcher has broadcast the room's first event. """
+    deadline = time.monotonic() + 5
+    while client.portal.call(websocket_manager.last_seq, room_id) == 0:
+        assert time.monotonic() < deadline, "the room event was never broadcast"
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def room(client):
+    owner = client.portal.call(create_user)
+    outsider = client.portal.call(create_user)
+    room = client.post("/rooms/", json={"name": "websocket room"}, headers={"telegram-id": str(owner.telegram_id)}).json()
+    wait_for_event(client, room["id"])
+    return room, owner, outsider
+
+
+def test_members_receive_replayed_events(client, room):
+    room, owner, _ = room
+    with client.websocket_connect(f"/ws/{room['id']}?since=0", headers={"telegram-id": str(owner.telegram_id)}) as ws:
+        payload = ws.receive_text()
+    event = json.loads(payload)
+    assert event["type"] == "room_created"
+    assert event["seq"] == 1
+    # The invite code is a credential for joining; it must not reach every subscriber
+    assert "invite_code" not in event["room"]
+    assert room["invite_code"] not in payload
+
+
+@pytest.mark.parametrize("who", ["outsider", "anonymous"])
+def test_non_members_are_rejected_before_replay(client, room, who):
+    room, _, outsider = room
+    headers = {"telegram-id": str(outsider.telegram_id)} if who == "outsider" else {}
+    with pytest.raises(WebSocketDisconnect) as rejected:
+        with client.websocket_connect(f"/ws/{room['id']}?since=0", headers=headers):
+            pass
+    assert rejected.value.code == 1008